@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'portfolio.metrics.RequestMetricsMiddleware',  # the first one, so the queries of the other middleware are counted
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,8 +61,15 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates'), ],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # The compiled templates are kept in memory by the cached loader, also with DEBUG on (the development
+            # server's autoreloader clears them when a template file changes)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -82,9 +90,42 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {'timeout': 20},  # seconds to wait for a lock held by another connection before raising an error
+        # The test database is a file instead of the default in-memory database, so the concurrency tests can use
+        # several connections at once (shared in-memory databases raise 'database table is locked' instead of waiting)
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# The backend is chosen with the PORTFOLIO_CACHE environment variable: 'locmem' (default, memory of each process, needs
+# no other services, also used by the tests), 'file' (a directory shared by the processes of one server) or 'redis'
+# (shared by all servers, needs the redis package). PORTFOLIO_CACHE_LOCATION overrides the directory or the server URL.
+# With more than one worker process use a shared backend: under 'locmem' the other processes do not see the changes of
+# a user's data, so the cached bank summaries and pages are kept only for a few seconds (portfolio/caching.py).
+
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'portfolio'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', BASE_DIR / 'cache'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379'),
+}
+CACHE_BACKEND, CACHE_LOCATION = CACHE_BACKENDS[os.environ.get('PORTFOLIO_CACHE', 'locmem')]
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('PORTFOLIO_CACHE_LOCATION', CACHE_LOCATION),
+        'KEY_PREFIX': 'mysite',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000} if CACHE_BACKEND.endswith(('LocMemCache', 'FileBasedCache')) else {},
     }
 }
 
+# Sessions are read from the cache and written to both the cache and the database, so they survive a cache restart
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -135,3 +176,48 @@ CRISPY_TEMPLATE_PACK = 'bootstrap4'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'portfolio/media')
 
 MEDIA_URL = '/media/'
+
+# The lists of Income and Expenses lines are read page by page with a condition on (date, id) instead of 'OFFSET',
+# links with the 'page' parameter still use the numbered pages (more about it in portfolio/pagination.py)
+KEYSET_PAGINATION = True
+
+# The pre-sized copies of new profile photos are made by a thread pool after the response (portfolio/thumbnails.py),
+# with False they are made right after the commit of the saved profile, in the same thread. The tests which save a
+# profile photo turn it off with override_settings, so no test leaves work in the pool
+THUMBNAILS_ASYNC = True
+
+# The PDF documents of the lines are sent only to their owners (portfolio/downloads.py). None sends them from Django;
+# behind Apache (mod_xsendfile) or lighttpd 'x-sendfile' and behind nginx 'x-accel-redirect' let the web server send
+# the file, with an internal location for PDF_ACCEL_PREFIX, e.g.:
+#     location /protected-media/ { internal; alias /path/to/portfolio/media/; }
+PDF_SENDFILE = os.environ.get('PDF_SENDFILE') or None
+PDF_ACCEL_PREFIX = '/protected-media/'
+
+# The app writes its details (e.g. of the updated lines and archive reports) to the 'portfolio.*' loggers. They are
+# silent by default, only warnings and errors are shown; the loggers named in PORTFOLIO_DEBUG_LOGGERS (separated by
+# commas, e.g. PORTFOLIO_DEBUG_LOGGERS=portfolio.views_ledger) also write their DEBUG messages to the console
+PORTFOLIO_DEBUG_LOGGERS = [name.strip() for name in os.environ.get('PORTFOLIO_DEBUG_LOGGERS', '').split(',')
+                           if name.strip()]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'structured': {'format': 'time=%(asctime)s level=%(levelname)s logger=%(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'structured'},
+    },
+    'loggers': {
+        'portfolio': {'handlers': ['console'], 'propagate': False,
+                      'level': 'DEBUG' if 'portfolio' in PORTFOLIO_DEBUG_LOGGERS else 'WARNING'},
+        **{name: {'level': 'DEBUG'} for name in PORTFOLIO_DEBUG_LOGGERS if name != 'portfolio'},
+    },
+}
+
+# Opt-in measurements of the requests (portfolio/metrics.py), switched on with PORTFOLIO_REQUEST_METRICS=1: latency,
+# number and time of the queries and duplicate queries of every request, sent in the Server-Timing header, shown to
+# staff on the /request_metrics/ page and written as JSON by 'python manage.py request_metrics'. The measurements are
+# written to the database in batches of REQUEST_METRICS_BATCH requests
+REQUEST_METRICS = os.environ.get('PORTFOLIO_REQUEST_METRICS') == '1'
+REQUEST_METRICS_BATCH = 50
@@ -13,6 +13,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import os
 from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
@@ -26,5 +27,6 @@ urlpatterns = [
     path('', RedirectView.as_view(url='portfolio/', permanent=True)),
     path('accounts/', include('django.contrib.auth.urls')),
 
+    # The PDF documents in MEDIA_ROOT are not served here, only by the views checking their owner (views_downloads.py)
 ] + (static(settings.STATIC_URL, document_root=settings.STATIC_ROOT) +
-     static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT))
+     static(settings.MEDIA_URL + 'profile_pics/', document_root=os.path.join(settings.MEDIA_ROOT, 'profile_pics')))
@@ -1,6 +1,7 @@
 # All models are registered on the admin page, all variables of all models except Profile are displayed.
 from django.contrib import admin
-from .models import Profile, Income, Expenses, Bank, IncomeCategory, IncomeSource, ExpensesCategory, Seller
+from .models import Profile, Income, Expenses, Bank, IncomeCategory, IncomeSource, ExpensesCategory, Seller, \
+    MonthlyRollup, BreakdownRollup, BankMovement, BankSnapshot, StoredBlob, RequestMetric
 
 
 class IncomeAdmin(admin.ModelAdmin):
@@ -31,6 +32,34 @@ class SellerAdmin(admin.ModelAdmin):
     list_display = ('client', 'seller')
 
 
+class MonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = ('client', 'kind', 'month', 'bank', 'count', 'total', 'min_amount', 'max_amount')
+    list_filter = ('kind',)
+
+
+class BreakdownRollupAdmin(admin.ModelAdmin):
+    list_display = ('client', 'kind', 'dimension', 'month', 'count', 'total')
+    list_filter = ('kind', 'dimension')
+
+
+class BankMovementAdmin(admin.ModelAdmin):
+    list_display = ('bank', 'created', 'reason', 'balance_delta', 'investment_delta')
+    list_filter = ('reason',)
+
+
+class BankSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('bank', 'created', 'balance', 'investment')
+
+
+class StoredBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'references', 'created')
+
+
+class RequestMetricAdmin(admin.ModelAdmin):
+    list_display = ('url_name', 'created', 'status', 'latency', 'queries', 'sql_time', 'duplicates')
+    list_filter = ('url_name',)
+
+
 admin.site.register(Profile)
 admin.site.register(Income, IncomeAdmin)
 admin.site.register(Expenses, ExpensesAdmin)
@@ -39,3 +68,9 @@ admin.site.register(IncomeCategory, IncomeCategoryAdmin)
 admin.site.register(ExpensesCategory, ExpensesCategoryAdmin)
 admin.site.register(Seller, SellerAdmin)
 admin.site.register(Bank, BankAdmin)
+admin.site.register(MonthlyRollup, MonthlyRollupAdmin)
+admin.site.register(BreakdownRollup, BreakdownRollupAdmin)
+admin.site.register(BankMovement, BankMovementAdmin)
+admin.site.register(BankSnapshot, BankSnapshotAdmin)
+admin.site.register(StoredBlob, StoredBlobAdmin)
+admin.site.register(RequestMetric, RequestMetricAdmin)
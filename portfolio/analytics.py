@@ -0,0 +1,114 @@
+"""
+Monthly trends of the user's Income and Expenses: the totals of every month, their rolling 3- and 12-month averages
+and the changes against the same month of the previous year, the savings (income minus expenses) with the savings rate,
+and a linear forecast of the next months. They are shown on the archive pages (views_ledger.py) and served by the API
+(views_api.py).
+
+The monthly totals of both sides are read with one grouped query from the category rows of the BreakdownRollup table
+(rollups.py), which count every line once in a few rows per month, and put into NumPy arrays. The months become
+positions of an array of consecutive months (months without lines are zeros), and the income, expenses and savings are
+the rows of one 2-D array, so every measurement is calculated for the three series at once with array operations
+instead of Python loops over the months: the rolling averages from cumulative sums, the year-over-year changes by
+shifting the array by 12 months, and the forecast from one least-squares fit of a straight line.
+'python manage.py benchmark_analytics' compares it with a per-line Python loop.
+
+NumPy is an optional dependency. Without it trends() raises AnalyticsUnavailable; the archive pages leave the trends
+out and the API answers with 501 Not Implemented.
+"""
+from datetime import date
+from django.db.models import Sum
+from .models import MonthlyRollup, BreakdownRollup
+from .rollups import month_start
+
+try:
+    import numpy as np  # optional dependency, only needed for the trends
+except ImportError:
+    np = None
+
+SERIES = ('income', 'expenses', 'savings')  # rows of the 2-D array, savings = income - expenses
+WINDOWS = (3, 12)  # months of the rolling averages
+MAX_FORECAST = 24  # months
+
+
+class AnalyticsUnavailable(Exception):
+    pass
+
+
+def _rolling(values, window):  # mean of the last 'window' months, NaN until there are as many months
+    result = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        sums = np.cumsum(values, axis=1)
+        sums[:, window:] = sums[:, window:] - sums[:, :-window]
+        result[:, window - 1:] = sums[:, window - 1:] / window
+    return result
+
+
+def _year_over_year(values):  # change against the same month of the previous year, NaN in the first year
+    result = np.full(values.shape, np.nan)
+    result[:, 12:] = values[:, 12:] - values[:, :-12]
+    return result
+
+
+def _forecast(values, horizon):  # the next months of a straight line fitted to each series
+    months = values.shape[1]
+    if months < 2 or not horizon:
+        return np.zeros((values.shape[0], 0))
+    slopes, intercepts = np.polyfit(np.arange(months), values.T, 1)  # one fit for all the series (columns)
+    return intercepts[:, None] + slopes[:, None] * np.arange(months, months + horizon)
+
+
+def _column(values):  # rounded numbers of a 1-D array, None for NaN
+    return [None if value != value else value for value in np.round(values, 2).tolist()]
+
+
+def trends(user, start=None, end=None, horizon=3):
+    """
+    Returns a dict with the 'months' and the 'forecast' of the user's lines between the months of the start and end
+    dates (by default from the first month with lines to the current month). Every month is a dict with the 'month'
+    ('YYYY-MM') and, for each of SERIES, the total ('income'), the rolling averages ('income_avg_3', 'income_avg_12')
+    and the year-over-year change ('income_yoy'), also the 'savings_rate' in percent of the income. The forecast has
+    the 'month' and the totals of the next 'horizon' months.
+    """
+    if np is None:
+        raise AnalyticsUnavailable('Analytics requires the numpy package.')
+    end = end or date.today()
+    # the months after the end (e.g. of the lines dated in the future) are left out, they are not in the array
+    rows = BreakdownRollup.objects.filter(client=user, dimension=BreakdownRollup.CATEGORY, month__lte=end)
+    if start:
+        rows = rows.filter(month__gte=month_start(start))
+    rows = list(rows.values_list('kind', 'month').annotate(total=Sum('total')).order_by())
+    kinds, months, totals = zip(*rows) if rows else ((), (), ())
+    months = np.array(months, dtype='datetime64[M]')
+    first = np.datetime64(month_start(start), 'M') if start else (months.min() if len(months) else None)
+    last = np.datetime64(end, 'M')
+    if first is None or first > last:
+        return {'months': [], 'forecast': []}
+
+    count = int((last - first).astype(int)) + 1
+    positions = (months - first).astype(int)
+    totals = np.array(totals, dtype=float)
+    income = np.array(kinds) == MonthlyRollup.INCOME
+    values = np.zeros((len(SERIES), count))
+    values[0] = np.bincount(positions[income], weights=totals[income], minlength=count)
+    values[1] = np.bincount(positions[~income], weights=totals[~income], minlength=count)
+    values[2] = values[0] - values[1]
+
+    columns = {'month': [str(month) for month in np.arange(first, last + 1)]}
+    averages = {window: _rolling(values, window) for window in WINDOWS}
+    changes = _year_over_year(values)
+    for row, name in enumerate(SERIES):
+        columns[name] = _column(values[row])
+        for window in WINDOWS:
+            columns[f'{name}_avg_{window}'] = _column(averages[window][row])
+        columns[f'{name}_yoy'] = _column(changes[row])
+    rates = np.full(count, np.nan)
+    np.divide(values[2] * 100, values[0], out=rates, where=values[0] > 0)
+    columns['savings_rate'] = _column(rates)
+
+    predicted = _forecast(values, horizon)
+    predicted[:2] = np.maximum(predicted[:2], 0)  # income and expenses are not negative
+    predicted[2] = predicted[0] - predicted[1]
+    forecast = {'month': [str(month) for month in np.arange(last + 1, last + 1 + predicted.shape[1])]}
+    forecast.update((name, _column(predicted[row])) for row, name in enumerate(SERIES))
+    return {'months': [dict(zip(columns, month)) for month in zip(*columns.values())],
+            'forecast': [dict(zip(forecast, month)) for month in zip(*forecast.values())]}
@@ -0,0 +1,162 @@
+"""
+Read-only JSON API of the user's Income and Expenses lines, banks, categories, sources of income and sellers (the views
+are in views_api.py). Every resource reads its rows with the per-user filtering of the list page's get_queryset()
+(e.g. 'query' searches the lines like the list pages), and only the requested columns are read with values(), so no
+model objects are made:
+
+    /portfolio/api/expenses/?fields=date,amount,seller&limit=100
+    /portfolio/api/expenses/?cursor=bjoyMDIzLTAxLTE1OjQy&fields=date,amount,seller&limit=100
+    /portfolio/api/banks/3
+
+The names of the related objects (e.g. 'category', 'seller', 'bank') are read by a join in the same query. The lines
+are paged by (date, id), newest first, with the cursors of the keyset pagination (pagination.py), the other resources
+by id; 'next' and 'previous' are the URLs of the neighbouring pages. The responses carry an ETag and Last-Modified time
+taken from the user's data version (caching.py), so an unchanged list is answered with 304 without any query.
+
+The only writing endpoint makes a batch of transfers between the user's banks (transfer_batch() in balances.py), the
+JSON body is a list of transfers and an optional 'all_or_nothing' flag, the response has a result for every transfer:
+
+    POST /portfolio/api/transfers/
+    {"transfers": [{"from_bank": 3, "to_bank": 4, "amount": "100.00"}, ...], "all_or_nothing": false}
+
+The monthly trends of the user's lines (analytics.py) are served for an optional period and number of forecast months:
+
+    /portfolio/api/trends/?start=2023-01-01&end=2024-12-31&forecast=6
+"""
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from .analytics import MAX_FORECAST
+from .models import Income, Expenses, Bank, IncomeCategory, IncomeSource, ExpensesCategory, Seller
+from .pagination import decode_cursor, encode_cursor, keyset_page
+from .ledgers import INCOME, EXPENSES, INCOME_CATEGORIES, INCOME_SOURCES, EXPENSES_CATEGORIES, SELLERS
+from .views_ledger import LineListView, CatalogueListView
+
+DEFAULT_LIMIT = 50  # rows of a page without the 'limit' parameter
+MAX_LIMIT = 500
+MAX_TRANSFERS = 500  # transfers of one batch
+
+
+class ApiError(Exception):  # a bad parameter, answered with 400 Bad Request and the message
+    pass
+
+
+class Resource:
+    def __init__(self, model, fields, view=None, view_kwargs=None, owner=None, dated=False):
+        self.model = model
+        self.fields = fields  # name in the JSON: lookup of values()
+        self.view = view  # list view whose get_queryset() filters the user's rows
+        self.view_kwargs = view_kwargs or {}  # given to the view like to as_view(), e.g. {'ledger': INCOME}
+        self.owner = owner  # field of the user, for the resources without such a view
+        self.dated = dated  # paged by (date, id) instead of id
+
+    def get_queryset(self, request):
+        if self.view is None:
+            return self.model.objects.filter(**{self.owner: request.user})
+        view = self.view(**self.view_kwargs)
+        view.setup(request)
+        return view.get_queryset()
+
+    def lookups(self, fields):  # {name: lookup} of the 'fields' parameter, all fields without it
+        if not fields:
+            return dict(self.fields)
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ApiError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(self.fields)}.")
+        return {name: self.fields[name] for name in names}
+
+
+LINE_FIELDS = {'id': 'id', 'date': 'date', 'amount': 'amount', 'category': 'category__definition',
+               'bank': 'bank__name', 'notes': 'notes', 'input_date': 'input_date', 'category_id': 'category_id',
+               'bank_id': 'bank_id'}
+
+RESOURCES = {
+    'income': Resource(Income, dict(LINE_FIELDS, source='source__source', source_id='source_id'),
+                       view=LineListView, view_kwargs={'ledger': INCOME}, dated=True),
+    'expenses': Resource(Expenses, dict(LINE_FIELDS, seller='seller__seller', seller_id='seller_id'),
+                         view=LineListView, view_kwargs={'ledger': EXPENSES}, dated=True),
+    # The list page of the banks reads them from the cached bank summary (a list), so they are filtered here
+    'banks': Resource(Bank, {'id': 'id', 'name': 'name', 'balance': 'balance', 'investment': 'investment'},
+                      owner='owner'),
+    'income_categories': Resource(IncomeCategory, {'id': 'id', 'definition': 'definition'},
+                                  view=CatalogueListView, view_kwargs={'catalogue': INCOME_CATEGORIES}),
+    'income_sources': Resource(IncomeSource, {'id': 'id', 'source': 'source'},
+                               view=CatalogueListView, view_kwargs={'catalogue': INCOME_SOURCES}),
+    'expenses_categories': Resource(ExpensesCategory, {'id': 'id', 'definition': 'definition'},
+                                    view=CatalogueListView, view_kwargs={'catalogue': EXPENSES_CATEGORIES}),
+    'sellers': Resource(Seller, {'id': 'id', 'seller': 'seller'},
+                        view=CatalogueListView, view_kwargs={'catalogue': SELLERS}),
+}
+
+
+def _rename(rows, lookups):  # the rows of values() get the names of the JSON, the helper columns are dropped
+    return [{name: row[lookup] for name, lookup in lookups.items()} for row in rows]
+
+
+def get_limit(value):
+    if not value:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError('The limit must be a number.')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f'The limit must be between 1 and {MAX_LIMIT}.')
+    return limit
+
+
+def list_page(resource, queryset, fields, cursor, limit):
+    """
+    Returns (rows, next cursor, previous cursor, approximate count or None) of the page after (or before) the cursor.
+    """
+    lookups = resource.lookups(fields)
+    columns = list(dict.fromkeys(list(lookups.values()) + ['id'] + (['date'] if resource.dated else [])))
+    if resource.dated:  # the cursors need the date and id of the first and last line
+        page = keyset_page(queryset.values(*columns), cursor, limit)
+        return _rename(page.object_list, lookups), page.next_cursor, page.previous_cursor, page.approximate_count
+    position = decode_cursor(cursor) if cursor else None
+    queryset = queryset.values(*columns).order_by('id')
+    if position and position[0] == 'n' and position[2] is not None:
+        queryset = queryset.filter(id__gt=position[2])
+    rows = list(queryset[:limit + 1])  # one more row tells if there is a next page
+    next_cursor = encode_cursor('n', {'date': None, 'id': rows[limit - 1]['id']}) if len(rows) > limit else None
+    return _rename(rows[:limit], lookups), next_cursor, None, None
+
+
+def detail(resource, queryset, fields, pk):  # the row of the user's object, or None
+    lookups = resource.lookups(fields)
+    row = queryset.filter(pk=pk).values(*dict.fromkeys(lookups.values())).first()
+    return None if row is None else _rename([row], lookups)[0]
+
+
+def parse_transfers(body):  # (transfers as (from_bank_id, to_bank_id, amount) tuples, all_or_nothing) of a JSON body
+    if not isinstance(body, dict) or not isinstance(body.get('transfers'), list):
+        raise ApiError("The body must be an object with a 'transfers' list.")
+    if not 1 <= len(body['transfers']) <= MAX_TRANSFERS:
+        raise ApiError(f'A batch must have between 1 and {MAX_TRANSFERS} transfers.')
+    transfers = []
+    for number, transfer in enumerate(body['transfers']):
+        try:
+            amount = Decimal(str(transfer['amount']))
+            if amount != amount.quantize(Decimal('0.01')):
+                raise ValueError
+            transfers.append((int(transfer['from_bank']), int(transfer['to_bank']), amount))
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            raise ApiError(f"Transfer {number} needs the 'from_bank' and 'to_bank' ids and an amount with at most two "
+                           f"decimal places.")
+    return transfers, bool(body.get('all_or_nothing', False))
+
+
+def parse_trend_parameters(parameters):  # (start date, end date, forecast months) of the query string
+    try:
+        start, end = (date.fromisoformat(parameters[name]) if parameters.get(name) else None
+                      for name in ('start', 'end'))
+    except ValueError:
+        raise ApiError("The 'start' and 'end' dates must be given as YYYY-MM-DD.")
+    try:
+        horizon = int(parameters.get('forecast') or 3)
+    except ValueError:
+        raise ApiError('The forecast must be a number of months.')
+    if not 0 <= horizon <= MAX_FORECAST:
+        raise ApiError(f'The forecast must be between 0 and {MAX_FORECAST} months.')
+    return start, end, horizon
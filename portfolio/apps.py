@@ -11,7 +11,7 @@ AutoField, but it uses a 64-bit integer instead of a 32-bit integer. This means
 than the default AutoField, making it suitable for models with large amounts of data.
 
 The ready() method is a method that is called when the app is ready to run. It is used to set up any necessary
-configurations or connections. In this case, the ready() method imports four signals from the signals.py module of the
+configurations or connections. In this case, the ready() method imports the signals from the signals.py module of the
 'portfolio' app. Read more about those at signals.py.
 """
 from django.apps import AppConfig
@@ -22,5 +22,4 @@ class PortfolioConfig(AppConfig):
     name = 'portfolio'
 
     def ready(self):
-        from .signals import create_profile, save_profile, decrease_bank_balance_on_delete, \
-            increase_bank_balance_on_delete
+        from . import signals  # importing the module registers all the receivers defined in it
@@ -0,0 +1,165 @@
+"""
+Balance service for Bank objects. All changes of bank balances (Income and Expenses lines, their deletion and the
+transfers between banks and accounts) go through the functions below instead of 'bank.balance -= amount; bank.save()'.
+
+Every change is applied in the database with F() expressions ('UPDATE ... SET balance = balance + %s'), so concurrent
+requests can not overwrite each other's changes and only the changed columns are written. Transfers check the available
+funds in the same UPDATE statement (the row is only changed if it still has enough money) inside transaction.atomic(),
+so both banks are changed or none of them. Python Bank objects passed to the functions are not refreshed, call
+refresh_from_db() if the new values are needed.
+
+Every change is also recorded in the bank's journal (a BankMovement row, more about it in journal.py) in the same
+transaction as the UPDATE statement.
+The cached data of the bank's owner (caching.py) is invalidated after every change.
+
+transfer_batch() makes many transfers between the banks of one owner at once: all banks of the batch are read and
+locked with one query, the transfers are checked one after another against the balances in memory, and the changed
+banks are written with one bulk_update() and their movements with one bulk_create(), all in one transaction. The
+written balances and counters of movements are still 'column + net change of the batch', so a line saved at the same
+moment is not lost on databases without row locks (SQLite), and the journal snapshots are taken from the balances read
+back after the update. On such databases another request can also take money from a bank between the read and the
+update, so the batch is rolled back if a debited bank ends up with a negative balance.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from .models import Bank, BankMovement
+from .journal import JournalBatch, record_movement
+from .caching import bank_changed
+
+ACCOUNTS = ('balance', 'investment')
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def _pk(bank):  # functions accept Bank objects as well as their ids
+    return getattr(bank, 'pk', bank)
+
+
+def _add(field, delta):  # balance fields are nullable, a missing value is counted as zero
+    return Coalesce(F(field), Value(0), output_field=Bank._meta.get_field(field)) + delta
+
+
+def _counted():  # the journal's counter of movements is increased in the same UPDATE statement as the balances
+    return {'movements_since_snapshot': F('movements_since_snapshot') + 1}
+
+
+@transaction.atomic
+def apply_delta(bank, balance=0, investment=0, reason=BankMovement.ADJUSTMENT):
+    changes = {field: _add(field, delta) for field, delta in zip(ACCOUNTS, (balance, investment)) if delta}
+    if bank is None or not changes:
+        return
+    if Bank.objects.filter(pk=_pk(bank)).update(**changes, **_counted()):
+        record_movement(_pk(bank), balance, investment, reason, counted=True)
+        bank_changed(bank)
+
+
+@transaction.atomic
+def withdraw(bank, amount, account='balance', deposit_account=None, reason=BankMovement.TRANSFER):
+    # Takes the amount from the account only if the account has enough funds, optionally putting it into another account
+    # of the same bank, all in a single UPDATE statement
+    changes = {account: _add(account, -amount)}
+    if deposit_account:
+        changes[deposit_account] = _add(deposit_account, amount)
+    updated = Bank.objects.filter(pk=_pk(bank), **{f'{account}__gte': amount}).update(**changes, **_counted())
+    if not updated:
+        raise InsufficientFunds(f'Insufficient {account}.')
+    deltas = {field: 0 for field in ACCOUNTS}
+    deltas[account] -= amount
+    if deposit_account:
+        deltas[deposit_account] += amount
+    record_movement(_pk(bank), reason=reason, counted=True, **deltas)
+    bank_changed(bank)
+
+
+@transaction.atomic
+def move_line(sign, previous_bank, previous_amount, bank, amount):
+    # Moves an Income (sign=1) or Expenses (sign=-1) line from its previous bank and amount to the new ones
+    reason = BankMovement.INCOME if sign > 0 else BankMovement.EXPENSES
+    if _pk(previous_bank) == _pk(bank):
+        apply_delta(bank, balance=sign * (amount - previous_amount), reason=reason)
+    else:
+        apply_delta(previous_bank, balance=-sign * previous_amount, reason=reason)
+        apply_delta(bank, balance=sign * amount, reason=reason)
+
+
+@transaction.atomic
+def transfer_between_banks(from_bank, to_bank, amount):
+    withdraw(from_bank, amount)  # raises InsufficientFunds and rolls the transaction back if there is not enough money
+    apply_delta(to_bank, balance=amount, reason=BankMovement.TRANSFER)
+
+
+def transfer_inside_bank(bank, source_account, to_account, amount):
+    withdraw(bank, amount, account=source_account, deposit_account=to_account, reason=BankMovement.INSIDE_TRANSFER)
+
+
+def _transfer_error(banks, from_bank_id, to_bank_id, amount):  # reason the transfer can not be made, None if it can
+    if from_bank_id not in banks or to_bank_id not in banks:
+        return 'One or both of the banks do not exist or are not owned by you.'
+    if from_bank_id == to_bank_id:
+        return 'The source and destination banks must be different.'
+    if amount <= 0:
+        return 'The amount must be positive.'
+    if (banks[from_bank_id].balance or 0) < amount:
+        return 'Insufficient balance.'
+    return None
+
+
+def transfer_batch(owner, transfers, all_or_nothing=False):
+    """
+    Makes the transfers - (from_bank_id, to_bank_id, amount) tuples - between the owner's banks in the given order and
+    returns a result for every transfer: {'from_bank', 'to_bank', 'amount', 'ok', 'error'}. A transfer that can not be
+    made (unknown bank, the same bank, insufficient balance after the earlier transfers) is skipped, the others are
+    made; with all_or_nothing=True no transfer is made if any of them fails. No transfer is made either if another
+    request took the money of a debited bank during the batch.
+    """
+    results = []
+    try:
+        _transfer_batch(owner, list(transfers), all_or_nothing, results)
+    except InsufficientFunds as error:  # the batch was rolled back, none of its transfers is made
+        for result in results:
+            if result['ok']:
+                result.update(ok=False, error=str(error))
+    return results
+
+
+def _transfer_batch(owner, transfers, all_or_nothing, results):  # appends the results of the transfers to the list
+    bank_ids = {bank_id for from_bank_id, to_bank_id, _ in transfers for bank_id in (from_bank_id, to_bank_id)}
+    with transaction.atomic():
+        banks = Bank.objects.select_for_update().filter(owner=owner).in_bulk(bank_ids)  # one query for all banks
+        journal = JournalBatch()
+        changes = defaultdict(Decimal)  # net change of the balance of every changed bank
+        for from_bank_id, to_bank_id, amount in transfers:
+            error = _transfer_error(banks, from_bank_id, to_bank_id, amount)
+            if error is None:
+                for bank_id, delta in ((from_bank_id, -amount), (to_bank_id, amount)):
+                    bank = banks[bank_id]
+                    bank.balance = (bank.balance or 0) + delta
+                    changes[bank_id] += delta
+                    journal.add(bank, BankMovement.TRANSFER, balance=delta)
+            results.append({'from_bank': from_bank_id, 'to_bank': to_bank_id, 'amount': amount, 'ok': error is None,
+                            'error': error})
+
+        if all_or_nothing and not all(result['ok'] for result in results):
+            for result in results:
+                if result['ok']:
+                    result.update(ok=False, error='Not made, another transfer of the batch failed.')
+            return results
+        changed = [banks[bank_id] for bank_id in changes]
+        for bank in changed:  # both columns are written as 'column + change', never as the values in memory
+            bank.balance = _add('balance', changes[bank.pk])
+            bank.movements_since_snapshot = journal.counted(bank)
+        Bank.objects.bulk_update(changed, ['balance', 'movements_since_snapshot'])
+        # The funds were checked against the rows read above, which select_for_update() does not lock on SQLite: a bank
+        # which was debited must still have a balance of at least zero, like after the conditional UPDATE of withdraw()
+        debited = {result['from_bank'] for result in results if result['ok']}
+        if Bank.objects.filter(pk__in=debited, balance__lt=0).exists():
+            raise InsufficientFunds('Not made, the balance of a bank was changed during the batch.')
+        journal.save()
+        if changed:
+            bank_changed(changed[0])  # all banks have the same owner
+    return results
@@ -0,0 +1,133 @@
+"""
+Helpers shared by the benchmark management commands of the 'portfolio' app. The seed_user_data() function fills the
+database with a client, their banks, categories, sellers, sources of income and as many Income and Expenses lines as
+requested. All rows are inserted with bulk_create(), so the signals of the models are not called and the bank balances
+are left as they are; complete_seeded_data() then does once what the signals would have done line by line (bank
+balances and their journal, monthly rollups and search documents). The data looks like real statements: most income is
+a salary paid on the 25th of each month, expenses are more frequent in recent years, at weekends and in December, their
+amounts are mostly small with a few large ones, and a few categories and sellers get most of the lines.
+
+The time_call() function runs a callable several times and returns the median time in milliseconds, so single slow
+runs (e.g. cold cache) do not distort the results. measure_request() does the same for a request of the test client and
+also counts its queries.
+"""
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Sum
+from .models import Bank, IncomeCategory, IncomeSource, ExpensesCategory, Seller, Income, Expenses, BankMovement
+from .journal import record_movement
+from .metrics import QueryRecorder
+from .rollups import rebuild_rollups
+from .search import rebuild_search_index
+
+
+def random_day(rnd, today, days):
+    # Recent days are more likely (the client uses the app more over time), weekends and December even more
+    while True:
+        day = today - timedelta(days=int(days * rnd.random() ** 1.5))
+        weight = (1.5 if day.weekday() >= 5 else 1) * (1.4 if day.month == 12 else 1)
+        if rnd.random() * 2.1 < weight:
+            return day
+
+
+def paydays(today, months):  # the 25th of each of the last months, of the current month only if it has passed
+    for month in range(today.year * 12 + today.month - 1, today.year * 12 + today.month - 1 - months, -1):
+        payday = date(month // 12, month % 12 + 1, 25)
+        if payday <= today:
+            yield payday
+
+
+def skewed_choice(rnd, objects):  # the first objects are chosen most often, as the favourite shop or category
+    return rnd.choices(objects, weights=[1 / (rank + 1) for rank in range(len(objects))])[0]
+
+
+def seed_user_data(username, lines=10000, banks=3, categories=8, parties=20, years=5, batch_size=5000, seed=None):
+    rnd = random.Random(seed)  # separate generator, so the same seed always gives the same data
+    user, _ = User.objects.get_or_create(username=username)
+
+    bank_objects = Bank.objects.bulk_create(
+        [Bank(owner=user, name=f'Bank {number}') for number in range(banks)])
+    income_categories = IncomeCategory.objects.bulk_create(
+        [IncomeCategory(client=user, definition=f'Income category {number}') for number in range(categories)])
+    expenses_categories = ExpensesCategory.objects.bulk_create(
+        [ExpensesCategory(client=user, definition=f'Expenses category {number}') for number in range(categories)])
+    sources = IncomeSource.objects.bulk_create(
+        [IncomeSource(earner=user, source=f'Source {number}') for number in range(parties)])
+    sellers = Seller.objects.bulk_create(
+        [Seller(client=user, seller=f'Seller {number}') for number in range(parties)])
+
+    today = date.today()
+    days = 365 * years
+    # The salary is paid on the 25th of every month of the period, the same source, category and bank every time
+    income_lines = [Income(client=user, date=salary_date, amount=Decimal(rnd.randrange(200000, 260000)) / 100,
+                           category=income_categories[0], source=sources[0], bank=bank_objects[0],
+                           notes=f'Salary {salary_date:%Y-%m}')
+                    for salary_date in paydays(today, years * 12)]
+    expenses_lines = []
+    for number in range(lines):  # lines are split between Income and Expenses, four expenses for every income line
+        line_date = random_day(rnd, today, days)
+        if number % 5 == 0:
+            income_lines.append(Income(client=user, date=line_date, amount=Decimal(rnd.randrange(1000, 30000)) / 100,
+                                       category=skewed_choice(rnd, income_categories),
+                                       source=skewed_choice(rnd, sources), bank=rnd.choice(bank_objects),
+                                       notes=f'Income note {number}'))
+        else:  # log-normal amounts: about 30 on average, rarely more than a few hundred
+            amount = Decimal(str(round(min(rnd.lognormvariate(3, 1), 99999) + 0.5, 2)))
+            expenses_lines.append(Expenses(client=user, date=line_date, amount=amount,
+                                           category=skewed_choice(rnd, expenses_categories),
+                                           seller=skewed_choice(rnd, sellers), bank=skewed_choice(rnd, bank_objects),
+                                           notes=f'Expenses note {number}'))
+        if len(expenses_lines) >= batch_size:  # rows are flushed in batches, so memory use does not grow with lines
+            Expenses.objects.bulk_create(expenses_lines)
+            expenses_lines = []
+        if len(income_lines) >= batch_size:
+            Income.objects.bulk_create(income_lines)
+            income_lines = []
+    Income.objects.bulk_create(income_lines)
+    Expenses.objects.bulk_create(expenses_lines)
+    return user
+
+
+def complete_seeded_data(user):
+    # The balances of the banks are the totals of their lines, recorded in the journal as imported, as the balance
+    # service does for every line. The monthly rollups and the search documents are built from the lines.
+    totals = {bank.pk: Decimal('0') for bank in Bank.objects.filter(owner=user)}
+    for model, sign in ((Income, 1), (Expenses, -1)):
+        for bank_id, total in model.objects.filter(client=user).values_list('bank').annotate(Sum('amount')).order_by():
+            totals[bank_id] += sign * total
+    for bank_id, total in totals.items():
+        Bank.objects.filter(pk=bank_id).update(balance=total)
+        record_movement(bank_id, balance=total, reason=BankMovement.IMPORT)
+    rebuild_rollups(user)
+    rebuild_search_index(user)
+
+
+def time_call(function, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def measure_request(client, method, url, data=None, repeat=5):
+    # Median and slowest time (ms), the number of queries and of duplicate queries of the request (counted as by the
+    # request metrics, see metrics.py); the first, unmeasured request warms up the caches and the session, so every
+    # measured request does the same work
+    send = getattr(client, method.lower())
+    send(url, data)
+    timings = []
+    for _ in range(repeat):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            start = time.perf_counter()
+            response = send(url, data)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {'status': response.status_code, 'median_ms': round(statistics.median(timings), 2),
+            'max_ms': round(max(timings), 2), 'queries': recorder.queries, 'duplicates': recorder.duplicates}
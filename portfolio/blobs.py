@@ -0,0 +1,103 @@
+"""
+Reference counting of the PDF documents in the content-addressed storage (storage.py). Every stored file has a
+StoredBlob row with the number of Income and Expenses lines pointing to it. The storage calls acquire() for every
+uploaded document before it reuses or writes the file, the signals (signals.py) for the document of another line given
+to a saved line, and release() for the replaced document and for the document of a deleted line. When the last line
+releases a file, its row is locked after the commit and the file is deleted with the row only if no line has taken a
+reference meanwhile (a concurrent upload of the same content waits for the lock and then writes the file again).
+
+Files stored before the content-addressed storage (e.g. 'income_pdfs/hello_D7QVNZn.pdf') are not counted. The
+'clean_stored_files' management command moves them into the storage, recounts the references of all files from the
+lines and deletes the files nobody points to (e.g. left by a line whose saving failed after the upload).
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Income, Expenses, StoredBlob
+from .storage import BLOB_DIRECTORY, pdf_storage
+
+GRACE_PERIOD = timedelta(hours=1)  # files younger than this may belong to a line which is being saved
+
+
+def acquire(name, size=None):  # the size of the file is given by the storage, which may not have written it yet
+    if not pdf_storage.is_blob(name):
+        return
+    if not StoredBlob.objects.filter(name=name).update(references=F('references') + 1):
+        size = pdf_storage.size(name) if size is None else size
+        blob, created = StoredBlob.objects.get_or_create(name=name, defaults={'references': 1, 'size': size})
+        if not created:  # created meanwhile by a concurrent request
+            StoredBlob.objects.filter(pk=blob.pk).update(references=F('references') + 1)
+
+
+def _delete_unused(name):
+    with transaction.atomic():  # an upload of the same content waits for the row lock in acquire()
+        blob = StoredBlob.objects.select_for_update().filter(name=name, references=0).first()
+        if blob is not None:  # no line has taken a reference after the release
+            blob.delete()
+            pdf_storage.delete(name)
+
+
+def release(name):
+    if not pdf_storage.is_blob(name):
+        return
+    StoredBlob.objects.filter(name=name, references__gt=0).update(references=F('references') - 1)
+    if StoredBlob.objects.filter(name=name, references=0).exists():  # the last line has released the file
+        transaction.on_commit(lambda: _delete_unused(name))
+
+
+def line_documents():  # names of the documents of all lines, with the number of lines pointing to each
+    counts = {}
+    for model in (Income, Expenses):
+        for name in model.objects.exclude(pdf='').exclude(pdf__isnull=True).values_list('pdf', flat=True).iterator():
+            counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def store_legacy_documents():
+    """
+    Moves the documents stored outside the content-addressed storage into it, returns the number of moved lines. The
+    old files are deleted when no line points to them any more.
+    """
+    moved = 0
+    for model in (Income, Expenses):
+        for line in model.objects.exclude(pdf='').exclude(pdf__isnull=True).exclude(
+                pdf__startswith=BLOB_DIRECTORY + '/').only('pk', 'pdf').iterator():
+            old_name = line.pdf.name
+            if not pdf_storage.exists(old_name):
+                continue
+            with pdf_storage.open(old_name, 'rb') as file:
+                name = pdf_storage.save(old_name, file)
+            model.objects.filter(pk=line.pk).update(pdf=name)  # without the signals, counted by recount_references()
+            moved += 1
+            if not (Income.objects.filter(pdf=old_name).exists() or Expenses.objects.filter(pdf=old_name).exists()):
+                pdf_storage.delete(old_name)
+    return moved
+
+
+def recount_references():
+    """
+    Sets the reference counts of all stored files from the lines, deletes the rows and files without lines (older than
+    GRACE_PERIOD) and returns the number of deleted files.
+    """
+    counts = {name: count for name, count in line_documents().items() if pdf_storage.is_blob(name)}
+    with transaction.atomic():
+        for blob in StoredBlob.objects.select_for_update():
+            if blob.references != counts.get(blob.name, 0):
+                StoredBlob.objects.filter(pk=blob.pk).update(references=counts.get(blob.name, 0))
+        for name, count in counts.items():
+            if pdf_storage.exists(name):
+                StoredBlob.objects.get_or_create(name=name, defaults={'references': count,
+                                                                     'size': pdf_storage.size(name)})
+        StoredBlob.objects.filter(references=0).delete()
+    stored = set(StoredBlob.objects.values_list('name', flat=True))
+    deleted = 0
+    uploaded_before = timezone.now() - GRACE_PERIOD
+    directories, _ = pdf_storage.listdir(BLOB_DIRECTORY) if pdf_storage.exists(BLOB_DIRECTORY) else ([], [])
+    for directory in directories:
+        for file_name in pdf_storage.listdir(f'{BLOB_DIRECTORY}/{directory}')[1]:
+            name = f'{BLOB_DIRECTORY}/{directory}/{file_name}'
+            if name not in stored and pdf_storage.get_modified_time(name) < uploaded_before:
+                pdf_storage.delete(name)
+                deleted += 1
+    return deleted
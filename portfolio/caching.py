@@ -0,0 +1,114 @@
+"""
+Per-user caching helpers. Every user has a data version, a random token kept in the cache. The keys of the user's
+cached data (the bank summary in summaries.py and the pages cached by cache_per_user()) contain the token, so replacing
+the token makes all of them stale at once; the stale entries are never read again and expire after their timeout.
+
+The token is replaced by the signals (signals.py) when the user's banks, lines, categories, sources or sellers are saved
+or deleted, and by the balance service (balances.py) for the balance changes made by UPDATE statements. It is replaced
+right away and once more after the transaction is committed, so the data read by a concurrent request before the commit
+is not kept under the new version. The token starts with the time of the change, the 'Last-Modified' time of the JSON
+API (api.py).
+
+cache_per_user() is a view decorator for read-only pages of logged-in users: the rendered GET responses are kept for
+VIEW_TIMEOUT seconds under a key made of the user, the session (a new login gets new pages with a new CSRF token), the
+user's data version and the full path of the page. Pages of other users' objects (e.g. a category's detail page opened
+by another user) follow only the viewer's data version, so they may be VIEW_TIMEOUT seconds old.
+
+The data version is only seen by the processes sharing the cache. With the memory of each process ('locmem', the
+default cache backend) a change made in one worker process does not replace the version seen by the other processes,
+so cache_timeout() keeps the versioned data there for LOCAL_TIMEOUT seconds at most. A shared backend ('file' or
+'redis', see the settings) keeps it for the full timeouts.
+"""
+import hashlib
+import time
+import uuid
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.messages import get_messages
+from django.db import transaction
+from .models import Bank
+
+VIEW_TIMEOUT = 300  # seconds for which a rendered page is kept
+LOCAL_TIMEOUT = 10  # seconds for which the versioned data is kept in the memory of each process
+
+
+def cache_timeout(timeout):  # the timeout of the versioned data, short if the cache is not shared by the processes
+    backend = settings.CACHES['default']['BACKEND']
+    return min(timeout, LOCAL_TIMEOUT) if backend.endswith('LocMemCache') else timeout
+
+
+def _version_key(user_id):
+    return f'portfolio:data-version:{user_id}'
+
+
+def _new_version(user_id):  # the token starts with the time of the change, e.g. '1681200000.3f9c...'
+    version = f'{int(time.time())}.{uuid.uuid4().hex}'
+    cache.set(_version_key(user_id), version, None)  # the version is kept until it is replaced
+    return version
+
+
+def data_version(user_id):
+    version = cache.get(_version_key(user_id))
+    if not version or not version.partition('.')[0].isdigit():  # also a token kept by an older version of the app
+        version = _new_version(user_id)
+    return version
+
+
+def data_modified(user_id):  # the time (a Unix timestamp) of the user's last change known to the cache
+    return int(data_version(user_id).partition('.')[0])
+
+
+def data_changed(user_id):
+    if user_id is None:
+        return
+    _new_version(user_id)
+    transaction.on_commit(lambda: _new_version(user_id))
+
+
+def bank_changed(bank):  # for the functions which get a Bank object or only its id
+    if isinstance(bank, Bank) or bank is None:
+        owner_id = getattr(bank, 'owner_id', None)
+    else:  # the owner of a bank given by its id is read with one query
+        owner_id = Bank.objects.filter(pk=bank).values_list('owner_id', flat=True).first()
+    data_changed(owner_id)
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'portfolio:page:{request.user.pk}:{request.session.session_key}:{data_version(request.user.pk)}:{path}'
+
+
+def _messages_shown(request):  # a page showing the one-time messages must not be served again
+    storage = getattr(request, '_messages', None)
+    return storage is not None and storage.used
+
+
+def cache_per_user(timeout=VIEW_TIMEOUT):
+    """
+    Decorator for the views (functions or the dispatch() method of class-based views, with method_decorator()) which
+    keeps the rendered GET pages of logged-in users in the cache, see above.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated or \
+                    len(get_messages(request)):  # the waiting messages are shown on a freshly rendered page
+                return view(request, *args, **kwargs)
+            key = _page_key(request)
+            response = cache.get(key)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+
+            def store(response):
+                if response.status_code == 200 and not _messages_shown(request):
+                    cache.set(key, response, cache_timeout(timeout))
+
+            if hasattr(response, 'render') and callable(response.render):  # TemplateResponse of class-based views
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+        return wrapper
+    return decorator
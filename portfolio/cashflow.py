@@ -0,0 +1,96 @@
+"""
+Cash-flow report of the user's banks: the income, expenses and net cash flow of every month and every bank, with the
+account balance of the bank at the end of each month, and the same for all the banks together.
+
+The income and expenses of the months are read with one grouped query from the MonthlyRollup table (rollups.py), both
+sides at once with conditional sums, so the report reads a few rows per bank and month instead of the lines. The lines
+are counted in the month of their date, like in the other reports.
+
+The balances are calculated backwards from the current balances of the banks, read from the Bank rows (a cached
+summary could be older than the rollups): the balance at the end of a month is the current balance minus everything
+that changed the balance later - the net of the lines of the later months and the other movements of the bank's
+journal (journal.py) made after the month, i.e. the opening balances of new banks, transfers and adjustments, which are
+read with one more grouped query. The movements of the lines themselves (including the imported ones) are not read,
+they are already in the rollups. Neither are the JOURNAL_START movements of the banks which existed before the
+journal: their balances were made by the lines saved before, which are in the rollups too, so the months before the
+journal get the balances of those lines instead of zero. So the report never reads the lines nor their movements and
+its cost grows with the number of months, not of the lines.
+"""
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+from django.db.models import Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import Bank, BankMovement, MonthlyRollup
+from .rollups import month_start, next_month
+
+# Movements of the journal that are not made by Income and Expenses lines, nor summed up from them
+OTHER_MOVEMENTS = (BankMovement.OPENING, BankMovement.TRANSFER, BankMovement.INSIDE_TRANSFER, BankMovement.ADJUSTMENT)
+CENT = Decimal('0.01')  # all amounts of the report are rounded to cents
+
+
+def _cents(amount):
+    return None if amount is None else Decimal(amount).quantize(CENT)
+
+
+def _months(first, last):
+    month = first
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+
+def cash_flow(user, start, end):
+    """
+    Returns a list of the reports of the user's banks, ordered by name, then of the lines without a bank (if any) and
+    of all the banks together ('bank' is None and 'total' is True). A report is a dict with the 'bank' and its 'months'
+    between the months of the start and end dates: dicts with the 'month' (the first day), 'income', 'expenses', 'net'
+    and 'balance' (the account balance at the end of the month, None for the lines without a bank).
+    """
+    first, last = month_start(start), month_start(end)
+    banks = list(Bank.objects.filter(owner=user).order_by('name', 'id'))  # the current balances
+    lines = defaultdict(dict)  # bank id: {month: (income, expenses)}, all the months from the first one on
+    rows = MonthlyRollup.objects.filter(client=user, month__gte=first).values_list('bank', 'month').annotate(
+        income=Sum('total', filter=Q(kind=MonthlyRollup.INCOME)),
+        expenses=Sum('total', filter=Q(kind=MonthlyRollup.EXPENSES))).order_by()
+    for bank_id, month, income, expenses in rows:
+        lines[bank_id][month] = (income or 0, expenses or 0)
+    others = defaultdict(dict)  # bank id: {month: change of the balance}
+    if banks:
+        since = timezone.make_aware(datetime.combine(first, time.min))
+        movements = BankMovement.objects.filter(bank__in=banks, reason__in=OTHER_MOVEMENTS, created__gte=since)
+        for bank_id, month, change in movements.annotate(month=TruncMonth('created')).values_list(
+                'bank', 'month').annotate(change=Sum('balance_delta')).order_by():
+            others[bank_id][timezone.localtime(month).date()] = change  # the month in the current time zone
+
+    reports = [(bank, bank.pk, bank.balance or 0) for bank in banks]
+    if None in lines:  # lines of deleted banks or without a bank
+        reports.append((None, None, None))
+    result = []
+    totals = {month: {'month': month, 'income': _cents(0), 'expenses': _cents(0), 'net': _cents(0),
+                      'balance': _cents(0)} for month in _months(first, last)}
+    for bank, bank_id, balance in reports:
+        flows = {month: income - expenses for month, (income, expenses) in lines[bank_id].items()}
+        for month, change in others[bank_id].items():
+            flows[month] = flows.get(month, 0) + change
+        closing = {}  # balance at the end of the months of the report, from the latest month with a change back
+        for month in sorted(set(flows) | set(totals), reverse=True):
+            if month < first:
+                break
+            closing[month] = balance
+            if balance is not None:
+                balance -= flows.get(month, 0)
+        months = []
+        for month, total in totals.items():
+            income, expenses = lines[bank_id].get(month, (0, 0))
+            row = {'month': month, 'income': _cents(income), 'expenses': _cents(expenses),
+                   'net': _cents(income - expenses), 'balance': _cents(closing[month])}
+            months.append(row)
+            for name in ('income', 'expenses', 'net'):
+                total[name] += row[name]
+            if bank is not None:
+                total['balance'] += row['balance']
+        result.append({'bank': bank, 'total': False, 'months': months})
+    result.append({'bank': None, 'total': True, 'months': list(totals.values())})
+    return result
@@ -0,0 +1,39 @@
+"""
+Per-request provider of the choices of the forms: the user's banks, categories, sources of income and sellers. The
+dropdowns of the forms (UserObjectField in forms.py) take their options and check the submitted values against the
+objects of the provider instead of their own querysets, so every model is read at most once per request, only when a
+form is rendered or validated, however many forms and fields show the same objects. E.g. the select-search page shows
+two forms with three dropdowns each and reads three tables, not six; the bank list page shows the cached banks (see
+summaries.py) in both transfer forms without any query.
+
+The views share one provider between all forms of a request with request_choices(request); a form made without one
+gets its own provider, so it still reads every model only once.
+"""
+from .models import Bank, IncomeCategory, IncomeSource, ExpensesCategory, Seller
+
+OWNER_FIELDS = {Bank: 'owner', IncomeCategory: 'client', IncomeSource: 'earner', ExpensesCategory: 'client',
+                Seller: 'client'}
+
+
+class UserChoices:
+    def __init__(self, user):
+        self.user = user
+        self._objects = {}  # model: {pk: object}, in the default ordering of the model
+
+    def provide(self, model, objects):  # objects which were already read, e.g. the banks of the cached bank summary
+        self._objects[model] = {obj.pk: obj for obj in objects}
+
+    def objects(self, model):
+        if model not in self._objects:
+            self.provide(model, model.objects.filter(**{OWNER_FIELDS[model]: self.user}))
+        return self._objects[model].values()
+
+    def get(self, model, pk):  # the user's object, None for an unknown id or an object of another user
+        self.objects(model)
+        return self._objects[model].get(pk)
+
+
+def request_choices(request):  # the provider shared by all forms of the request
+    if not hasattr(request, '_user_choices'):
+        request._user_choices = UserChoices(request.user)
+    return request._user_choices
@@ -0,0 +1,113 @@
+"""
+Serving of the PDF documents attached to Income and Expenses lines. The views (views_downloads.py) check once that the
+line belongs to the logged-in user and then hand the file over to serve_document(), which sends it in one of two ways,
+chosen with the PDF_SENDFILE setting:
+- 'x-sendfile' or 'x-accel-redirect': the response only has a header with the path of the file ('X-Sendfile' for
+  Apache's mod_xsendfile and lighttpd, 'X-Accel-Redirect' with PDF_ACCEL_PREFIX for an internal location of nginx) and
+  the web server sends the file itself (with sendfile(), ranges and all), the Python process is free right away;
+- None (default, e.g. the development server): FileResponse, which the WSGI server can send with sendfile() as well
+  (wsgi.file_wrapper). A 'Range' header is answered with the requested bytes only (206 Partial Content), so the PDF
+  viewers of browsers can open large statements page by page.
+
+Every response has an ETag and Last-Modified header, so a browser asks again with 'If-None-Match' and gets an empty 304
+response if the file is unchanged. The documents in the content-addressed storage (storage.py) never change, their ETag
+is the digest of the content and the browsers may keep them for a year.
+"""
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+CHUNK_SIZE = 65536  # bytes read at once for a range
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # seconds for which the browsers keep a document of the content-addressed storage
+MAX_AGE = 3600  # seconds for the other documents, which may be replaced under the same name
+
+
+def _validators(storage, name):
+    path = storage.path(name)
+    stat = os.stat(path)
+    if storage.is_blob(name):  # the name is made of the content's digest
+        etag = os.path.splitext(os.path.basename(name))[0]
+    else:
+        etag = f'{int(stat.st_mtime)}-{stat.st_size}'
+    return path, stat.st_size, quote_etag(etag), int(stat.st_mtime)
+
+
+def parse_range(header, size):
+    """
+    Returns (first byte, last byte) of a single byte range ('bytes=0-499', 'bytes=500-' or 'bytes=-500'), None if
+    there is no usable range header (the whole file is sent) and False if the range is outside the file.
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', (header or '').strip())
+    if not match or match.groups() == ('', ''):
+        return None  # also several ranges, which are answered with the whole file
+    first, last = match.groups()
+    if first == '':  # the last bytes of the file
+        first, last = max(size - int(last), 0), size - 1
+    else:
+        first, last = int(first), min(int(last), size - 1) if last else size - 1
+    if first > last or first >= size:
+        return False
+    return first, last
+
+
+def _read_range(path, first, last):
+    with open(path, 'rb') as file:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _set_headers(response, storage, name, file_name, etag, modified):
+    response['Content-Type'] = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+    response['Content-Disposition'] = f'inline; filename="{file_name}"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(modified)
+    max_age = IMMUTABLE_MAX_AGE if storage.is_blob(name) else MAX_AGE
+    response['Cache-Control'] = f'private, max-age={max_age}' + (', immutable' if storage.is_blob(name) else '')
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_document(request, field_file, file_name):
+    # Response with the document of the FileField, file_name is the name shown to the user (e.g. 'income_42.pdf')
+    storage, name = field_file.storage, field_file.name
+    path, size, etag, modified = _validators(storage, name)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=modified)
+    if not_modified is not None:  # 304 Not Modified (or 412 for a failed 'If-Match')
+        return _set_headers(not_modified, storage, name, file_name, etag, modified)
+
+    sendfile = getattr(settings, 'PDF_SENDFILE', None)
+    if sendfile == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return _set_headers(response, storage, name, file_name, etag, modified)
+    if sendfile == 'x-accel-redirect':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = getattr(settings, 'PDF_ACCEL_PREFIX', '/protected-media/') + name
+        return _set_headers(response, storage, name, file_name, etag, modified)
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range not in (etag, http_date(modified)):  # the file has changed, the whole file is sent
+        byte_range = None
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range:
+        first, last = byte_range
+        response = StreamingHttpResponse(_read_range(path, first, last), status=206)
+        response['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response['Content-Length'] = last - first + 1
+        return _set_headers(response, storage, name, file_name, etag, modified)
+    response = FileResponse(open(path, 'rb'))  # sent with the WSGI server's file wrapper if it has one
+    return _set_headers(response, storage, name, file_name, etag, modified)
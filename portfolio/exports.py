@@ -0,0 +1,85 @@
+"""
+Export of the found Income and Expenses lines (keyword search, select search and archive report) as CSV or XLSX files.
+
+CSV files are streamed: the response is a StreamingHttpResponse over a generator, which sends the header row before the
+query is run and then writes the lines as they are read from the database with iterator(chunk_size=CHUNK_SIZE), so
+neither the lines nor the file are ever held in memory as a whole. Only the columns of the file are selected
+(values_list() with the names of the related objects joined in the same query), no model instances are created.
+
+XLSX files need the optional openpyxl package. The workbook is written in openpyxl's write-only mode (rows are written
+to a temporary file as they come) and the finished file is sent in chunks with FileResponse.
+"""
+import csv
+import tempfile
+from django.http import FileResponse, Http404, StreamingHttpResponse
+from django.utils import timezone
+from .models import Income, Expenses
+
+CHUNK_SIZE = 2000  # lines read from the database at once
+FORMATS = ('csv', 'xlsx')
+
+# For each model: the columns of the file, (header, field of the line)
+EXPORT_COLUMNS = {
+    Income: (('Date', 'date'), ('Amount', 'amount'), ('Category', 'category__definition'),
+             ('Source', 'source__source'), ('Bank', 'bank__name'), ('Notes', 'notes')),
+    Expenses: (('Date', 'date'), ('Amount', 'amount'), ('Category', 'category__definition'),
+               ('Seller', 'seller__seller'), ('Bank', 'bank__name'), ('Notes', 'notes')),
+}
+
+
+class Echo:  # file-like object for csv.writer, which returns the written row instead of keeping it
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):  # not run as a formula by spreadsheet programs
+        return "'" + value
+    return value
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):  # the header and then one tuple per line, read in chunks
+    columns = EXPORT_COLUMNS[queryset.model]
+    yield tuple(header for header, _ in columns)
+    rows = queryset.values_list(*(field for _, field in columns))
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield tuple(_cell(value) for value in row)
+
+
+def _file_name(name, file_format):
+    return f"{name}_{timezone.localdate().isoformat()}.{file_format}"
+
+
+def stream_csv(queryset, name):
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in export_rows(queryset)),
+                                     content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{_file_name(name, "csv")}"'
+    return response
+
+
+def xlsx_file(queryset, name):
+    try:
+        from openpyxl import Workbook  # optional dependency, only needed for the XLSX files
+    except ImportError:
+        raise Http404('XLSX export requires the openpyxl package.')
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(name[:31])  # longer sheet names are not allowed
+    for row in export_rows(queryset):
+        sheet.append(row)
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(output, as_attachment=True, filename=_file_name(name, 'xlsx'),
+                        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+
+
+def export_lines(queryset, file_format, name):
+    # Response with the lines of the queryset in the file format ('csv' or 'xlsx'), ordered by the queryset's ordering
+    if file_format == 'csv':
+        return stream_csv(queryset, name)
+    if file_format == 'xlsx':
+        return xlsx_file(queryset, name)
+    raise Http404(f'Unknown export format {file_format!r}.')
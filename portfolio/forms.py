@@ -2,6 +2,10 @@ from django.contrib.auth.models import User  # associated built-in model
 # associated models from models.py:
 from .models import Profile, Income, Expenses, IncomeSource, IncomeCategory, ExpensesCategory, Seller, Bank
 from django import forms  # provides a way to define HTML form elements in Python.
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
+from datetime import date
+from .choices import UserChoices
 
 
 # Form used to update a user's information
@@ -43,34 +47,73 @@ super(). This allows the parent class (in this case, forms.ModelForm or forms.Fo
 tasks before the custom initialization code in the __init__() method is executed. """
 
 
+class UserObjectIterator(ModelChoiceIterator):  # options of the dropdown from the objects of the choice provider
+    def __iter__(self):
+        if self.field.provider is None:
+            yield from super().__iter__()
+            return
+        if self.field.empty_label is not None:
+            yield '', self.field.empty_label
+        for obj in self.field.provider.objects(self.queryset.model):
+            yield self.choice(obj)
+
+    def __len__(self):
+        if self.field.provider is None:
+            return super().__len__()
+        return len(self.field.provider.objects(self.queryset.model)) + (self.field.empty_label is not None)
+
+
+# A dropdown of the user's objects (banks, categories, sources or sellers), its options and the check of the submitted
+# value use the objects of a per-request choice provider (more about it in choices.py) instead of queries
+class UserObjectField(forms.ModelChoiceField):
+    provider = None  # set by the form (see use_choices() below), before it is rendered or validated
+    iterator = UserObjectIterator
+
+    def to_python(self, value):
+        if value in self.empty_values or self.provider is None:
+            return super().to_python(value)
+        model = self.queryset.model
+        try:
+            obj = self.provider.get(model, model._meta.pk.to_python(getattr(value, 'pk', value)))
+        except ValidationError:  # not a number
+            obj = None
+        if obj is None:
+            raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice', params={'value': value})
+        return obj
+
+
+def use_choices(form, user, choices, *names):  # the fields get the provider of the view, or their own one
+    choices = choices or UserChoices(user)
+    for name in names:
+        form.fields[name].provider = choices
+
+
 # Form is designed to create Income instance, it is needed to fill fields described in Meta class
 class IncomeCreateForm(forms.ModelForm):  # method is used to customize the form by selecting fields ...
-    def __init__(self, user, *args, **kwargs):
+    def __init__(self, user, *args, choices=None, **kwargs):
         super(IncomeCreateForm, self).__init__(*args, **kwargs)
-        self.fields['category'].queryset = IncomeCategory.objects.filter(client=user)  # ... based on the current user
-        self.fields['source'].queryset = IncomeSource.objects.filter(earner=user)  # this means that user can only ...
-        self.fields['bank'].queryset = Bank.objects.filter(owner=user)  # select those choices that created previously
-        # The user argument is passed to the method and used to filter the objects based on the user's ID.
+        use_choices(self, user, choices, 'category', 'source', 'bank')  # ... based on the current user, this means ...
+        # that user can only select those choices that created previously (the objects of the user's choice provider)
 
     class Meta:
         model = Income
         fields = ['date', 'amount', 'category', 'source', 'bank', 'notes', 'pdf']
         widgets = {'date': DateInput()}  # For date uses custom (previously described) DateInput class
+        field_classes = {'category': UserObjectField, 'source': UserObjectField, 'bank': UserObjectField}
 
 
 # Form is designed to create Expenses instance, it is needed to fill fields described in Meta class
 class ExpensesCreateForm(forms.ModelForm):  # method is used to customize the form by selecting fields ...
-    def __init__(self, user, *args, **kwargs):
+    def __init__(self, user, *args, choices=None, **kwargs):
         super(ExpensesCreateForm, self).__init__(*args, **kwargs)
-        self.fields['category'].queryset = ExpensesCategory.objects.filter(client=user)  # ... based on the current user
-        self.fields['seller'].queryset = Seller.objects.filter(client=user)  # this means that user can only ...
-        self.fields['bank'].queryset = Bank.objects.filter(owner=user)  # select those choices that created previously
-        # The user argument is passed to the method and used to filter the objects based on the user's ID.
+        use_choices(self, user, choices, 'category', 'seller', 'bank')  # ... based on the current user, this means ...
+        # that user can only select those choices that created previously (the objects of the user's choice provider)
 
     class Meta:
         model = Expenses
         fields = ['date', 'amount', 'category', 'seller', 'bank', 'notes', 'pdf']
         widgets = {'date': DateInput()}  # For date uses custom (previously described) DateInput class
+        field_classes = {'category': UserObjectField, 'seller': UserObjectField, 'bank': UserObjectField}
 
 
 class BankCreateForm(forms.ModelForm):
@@ -111,14 +154,14 @@ balance and investment) and one - between banks transfers. A total of eight form
 
 # First form intended for inside transfer, functional usage described at views_banks.py
 class TransferInsideBankForm(forms.Form):
-    bank = forms.ModelChoiceField(queryset=Bank.objects.all(), label='Select bank')  # A dropdown for selecting the bank
+    bank = UserObjectField(queryset=Bank.objects.all(), label='Select bank')  # A dropdown for selecting the bank
     source_account = forms.ChoiceField(choices=[('balance', 'Account'), ('investment', 'Investment')], label='From')
     to_account = forms.ChoiceField(choices=[('balance', 'Account'), ('investment', 'Investment')], label='Into')
     amount = forms.DecimalField(label='Transfer amount', max_digits=10, decimal_places=2)
 
-    def __init__(self, user, *args, **kwargs):  # method is used to customize the form by filtering bank field ...
+    def __init__(self, user, *args, choices=None, **kwargs):  # method is used to customize the form by filtering ...
         super(TransferInsideBankForm, self).__init__(*args, **kwargs)
-        self.fields['bank'].queryset = Bank.objects.filter(owner=user)  # ... based on the current user
+        use_choices(self, user, choices, 'bank')  # ... bank field based on the current user
         # The user argument is passed to the method and used to filter the banks based on the user's ID.
 
 
@@ -134,32 +177,42 @@ class TransferInsideBankForDetailViewForm(forms.Form):
 # Form for transfer between banks, functional usage described at views_banks.py
 class TransferBetweenBanksForm(forms.Form):
     # Two dropdowns for selecting the bank provider and the destination bank ant the transfer amount:
-    from_bank = forms.ModelChoiceField(queryset=Bank.objects.all(), label='From bank')
-    to_bank = forms.ModelChoiceField(queryset=Bank.objects.all(), label='Into bank')
+    from_bank = UserObjectField(queryset=Bank.objects.all(), label='From bank')
+    to_bank = UserObjectField(queryset=Bank.objects.all(), label='Into bank')
     amount = forms.DecimalField(label='Transfer amount', max_digits=10, decimal_places=2)
 
-    def __init__(self, user, *args, **kwargs):  # method is used to customize the form by filtering bank fields ...
+    def __init__(self, user, *args, choices=None, **kwargs):  # method is used to customize the form by filtering ...
         super(TransferBetweenBanksForm, self).__init__(*args, **kwargs)
-        self.fields['from_bank'].queryset = Bank.objects.filter(owner=user)  # ... based on the current user
-        self.fields['to_bank'].queryset = Bank.objects.filter(owner=user)
+        use_choices(self, user, choices, 'from_bank', 'to_bank')  # ... bank fields based on the current user
         # The user argument is passed to the method and used to filter the banks based on the user's ID.
 
 
+# Form for uploading a bank statement (CSV or OFX file), functional usage described at views_import.py and importers.py
+class StatementImportForm(forms.Form):
+    statement = forms.FileField(label='Statement file (CSV or OFX)')
+    file_format = forms.ChoiceField(choices=[('auto', 'By file extension'), ('csv', 'CSV'), ('ofx', 'OFX')],
+                                    label='Format')
+    # The bank of the lines which have no bank in the file, e.g. the CSV files without the 'bank' column
+    bank = UserObjectField(queryset=Bank.objects.all(), label='Default bank', required=False)
+
+    def __init__(self, user, *args, choices=None, **kwargs):  # method is used to customize the form by filtering ...
+        super(StatementImportForm, self).__init__(*args, **kwargs)
+        use_choices(self, user, choices, 'bank')  # ... bank field based on the current user
+
+
 # Form is designed to search for income objects by their variables, selecting them from the dropdowns (except dates)
 class SearchSelectIncomeForm(forms.Form):  # required=False means that fields are not required to be filled out by user
     # There are no a required fields, meaning that the user can choose to leave any of them blank
     start_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     end_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     # Type attribute is set to date, which tells the browser to display a calendar picker for the user to select a date
-    category = forms.ModelChoiceField(queryset=IncomeCategory.objects.all(), required=False)
-    source = forms.ModelChoiceField(queryset=IncomeSource.objects.all(), required=False)
-    bank = forms.ModelChoiceField(queryset=Bank.objects.all(), required=False)
+    category = UserObjectField(queryset=IncomeCategory.objects.all(), required=False)
+    source = UserObjectField(queryset=IncomeSource.objects.all(), required=False)
+    bank = UserObjectField(queryset=Bank.objects.all(), required=False)
 
-    def __init__(self, user, *args, **kwargs):  # method is used to customize the form by filtering fields ...
+    def __init__(self, user, *args, choices=None, **kwargs):  # customizes the form by filtering fields ...
         super(SearchSelectIncomeForm, self).__init__(*args, **kwargs)
-        self.fields['category'].queryset = IncomeCategory.objects.filter(client=user)  # ... based on ...
-        self.fields['source'].queryset = IncomeSource.objects.filter(earner=user)  # ... the current user
-        self.fields['bank'].queryset = Bank.objects.filter(owner=user)
+        use_choices(self, user, choices, 'category', 'source', 'bank')  # ... based on the current user
         # The user argument is passed to the method and used to filter the objects based on the user's ID.
 
 
@@ -167,15 +220,13 @@ class SearchSelectIncomeForm(forms.Form):  # required=False means that fields ar
 class SearchSelectIncomeForComparisonForm(forms.Form):
     start_date_compare = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     end_date_compare = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
-    category_compare = forms.ModelChoiceField(queryset=IncomeCategory.objects.all(), required=False)
-    source_compare = forms.ModelChoiceField(queryset=IncomeSource.objects.all(), required=False)
-    bank_compare = forms.ModelChoiceField(queryset=Bank.objects.all(), required=False)
+    category_compare = UserObjectField(queryset=IncomeCategory.objects.all(), required=False)
+    source_compare = UserObjectField(queryset=IncomeSource.objects.all(), required=False)
+    bank_compare = UserObjectField(queryset=Bank.objects.all(), required=False)
 
-    def __init__(self, user, *args, **kwargs):
+    def __init__(self, user, *args, choices=None, **kwargs):
         super(SearchSelectIncomeForComparisonForm, self).__init__(*args, **kwargs)
-        self.fields['category_compare'].queryset = IncomeCategory.objects.filter(client=user)
-        self.fields['source_compare'].queryset = IncomeSource.objects.filter(earner=user)
-        self.fields['bank_compare'].queryset = Bank.objects.filter(owner=user)
+        use_choices(self, user, choices, 'category_compare', 'source_compare', 'bank_compare')
 
 
 # Form is designed to search for expenses objects by their variables, selecting them from the dropdowns (except dates)
@@ -184,15 +235,13 @@ class SearchSelectExpensesForm(forms.Form):
     start_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     end_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     # Type attribute is set to date, which tells the browser to display a calendar picker for the user to select a date
-    category = forms.ModelChoiceField(queryset=ExpensesCategory.objects.all(), required=False)
-    source = forms.ModelChoiceField(queryset=Seller.objects.all(), required=False)
-    bank = forms.ModelChoiceField(queryset=Bank.objects.all(), required=False)
+    category = UserObjectField(queryset=ExpensesCategory.objects.all(), required=False)
+    source = UserObjectField(queryset=Seller.objects.all(), required=False)
+    bank = UserObjectField(queryset=Bank.objects.all(), required=False)
 
-    def __init__(self, user, *args, **kwargs):  # method is used to customize the form by filtering fields ...
+    def __init__(self, user, *args, choices=None, **kwargs):  # customizes the form by filtering fields ...
         super(SearchSelectExpensesForm, self).__init__(*args, **kwargs)
-        self.fields['category'].queryset = ExpensesCategory.objects.filter(client=user)  # ... based on the current user
-        self.fields['source'].queryset = Seller.objects.filter(client=user)
-        self.fields['bank'].queryset = Bank.objects.filter(owner=user)
+        use_choices(self, user, choices, 'category', 'source', 'bank')  # ... based on the current user
         # The user argument is passed to the method and used to filter the objects based on the user's ID.
 
 
@@ -200,15 +249,13 @@ class SearchSelectExpensesForm(forms.Form):
 class SearchSelectExpensesForComparisonForm(forms.Form):
     start_date_compare = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     end_date_compare = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
-    category_compare = forms.ModelChoiceField(queryset=ExpensesCategory.objects.all(), required=False)
-    source_compare = forms.ModelChoiceField(queryset=Seller.objects.all(), required=False)
-    bank_compare = forms.ModelChoiceField(queryset=Bank.objects.all(), required=False)
+    category_compare = UserObjectField(queryset=ExpensesCategory.objects.all(), required=False)
+    source_compare = UserObjectField(queryset=Seller.objects.all(), required=False)
+    bank_compare = UserObjectField(queryset=Bank.objects.all(), required=False)
 
-    def __init__(self, user, *args, **kwargs):
+    def __init__(self, user, *args, choices=None, **kwargs):
         super(SearchSelectExpensesForComparisonForm, self).__init__(*args, **kwargs)
-        self.fields['category_compare'].queryset = ExpensesCategory.objects.filter(client=user)
-        self.fields['source_compare'].queryset = Seller.objects.filter(client=user)
-        self.fields['bank_compare'].queryset = Bank.objects.filter(owner=user)
+        use_choices(self, user, choices, 'category_compare', 'source_compare', 'bank_compare')
 
 
 # Form is designed to filter out income objects for report, by date, source and category, selecting it from dropdown
@@ -217,13 +264,12 @@ class ArchiveIncomeForm(forms.Form):
     start_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     end_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     # Type attribute is set to date, which tells the browser to display a calendar picker for the user to select a date
-    category = forms.ModelChoiceField(queryset=IncomeCategory.objects.none(), required=False)
-    source = forms.ModelChoiceField(queryset=IncomeSource.objects.none(), required=False)
+    category = UserObjectField(queryset=IncomeCategory.objects.all(), required=False)
+    source = UserObjectField(queryset=IncomeSource.objects.all(), required=False)
 
-    def __init__(self, user, *args, **kwargs):  # method is used to customize the form by filtering fields ...
+    def __init__(self, user, *args, choices=None, **kwargs):  # customizes the form by filtering fields ...
         super(ArchiveIncomeForm, self).__init__(*args, **kwargs)
-        self.fields['category'].queryset = IncomeCategory.objects.filter(client=user)  # ... based on the current user
-        self.fields['source'].queryset = IncomeSource.objects.filter(earner=user)
+        use_choices(self, user, choices, 'category', 'source')  # ... based on the current user
         # The user argument is passed to the method and used to filter the objects based on the user's ID.
 
 
@@ -233,13 +279,12 @@ class ArchiveIncomeByMonthForm(forms.Form):
     start_date_report = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     end_date_report = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     # Type attribute is set to date, which tells the browser to display a calendar picker for the user to select a date
-    category_report = forms.ModelChoiceField(queryset=IncomeCategory.objects.all(), required=False)
-    source_report = forms.ModelChoiceField(queryset=IncomeSource.objects.all(), required=False)
+    category_report = UserObjectField(queryset=IncomeCategory.objects.all(), required=False)
+    source_report = UserObjectField(queryset=IncomeSource.objects.all(), required=False)
 
-    def __init__(self, user, *args, **kwargs):  # method is used to customize the form by filtering fields ...
+    def __init__(self, user, *args, choices=None, **kwargs):  # customizes the form by filtering fields ...
         super(ArchiveIncomeByMonthForm, self).__init__(*args, **kwargs)
-        self.fields['category_report'].queryset = IncomeCategory.objects.filter(client=user)  # ... based on ...
-        self.fields['source_report'].queryset = IncomeSource.objects.filter(earner=user)  # ... the current user
+        use_choices(self, user, choices, 'category_report', 'source_report')  # ... based on the current user
         # The user argument is passed to the method and used to filter the objects based on the user's ID.
 
 
@@ -249,13 +294,12 @@ class ArchiveExpensesForm(forms.Form):
     start_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     end_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     # Type attribute is set to date, which tells the browser to display a calendar picker for the user to select a date
-    category = forms.ModelChoiceField(queryset=ExpensesCategory.objects.all(), required=False)
-    source = forms.ModelChoiceField(queryset=Seller.objects.all(), required=False)
+    category = UserObjectField(queryset=ExpensesCategory.objects.all(), required=False)
+    source = UserObjectField(queryset=Seller.objects.all(), required=False)
 
-    def __init__(self, user, *args, **kwargs):  # method is used to customize the form by filtering fields ...
+    def __init__(self, user, *args, choices=None, **kwargs):  # customizes the form by filtering fields ...
         super(ArchiveExpensesForm, self).__init__(*args, **kwargs)
-        self.fields['category'].queryset = ExpensesCategory.objects.filter(client=user)  # ... based on ...
-        self.fields['source'].queryset = Seller.objects.filter(client=user)  # ... the current user
+        use_choices(self, user, choices, 'category', 'source')  # ... based on the current user
         # The user argument is passed to the method and used to filter the objects based on the user's ID.
 
 
@@ -265,11 +309,35 @@ class ArchiveExpensesByMonthForm(forms.Form):
     start_date_report = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     end_date_report = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
     # Type attribute is set to date, which tells the browser to display a calendar picker for the user to select a date
-    category_report = forms.ModelChoiceField(queryset=ExpensesCategory.objects.all(), required=False)
-    source_report = forms.ModelChoiceField(queryset=Seller.objects.all(), required=False)
+    category_report = UserObjectField(queryset=ExpensesCategory.objects.all(), required=False)
+    source_report = UserObjectField(queryset=Seller.objects.all(), required=False)
 
-    def __init__(self, user, *args, **kwargs):  # method is used to customize the form by filtering fields ...
+    def __init__(self, user, *args, choices=None, **kwargs):  # customizes the form by filtering fields ...
         super(ArchiveExpensesByMonthForm, self).__init__(*args, **kwargs)
-        self.fields['category_report'].queryset = ExpensesCategory.objects.filter(client=user)  # ... based on ...
-        self.fields['source_report'].queryset = Seller.objects.filter(client=user)  # ... the current user
+        use_choices(self, user, choices, 'category_report', 'source_report')  # ... based on the current user
         # The user argument is passed to the method and used to filter the objects based on the user's ID.
+
+
+# Form of the breakdown reports, selects the period and the number of the top categories, sources or sellers shown
+class BreakdownForm(forms.Form):
+    # All fields are not required, the whole history and the top 10 objects are shown by default
+    start_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
+    top = forms.IntegerField(required=False, min_value=1, max_value=50, initial=10, label='Top')
+
+
+class CashFlowForm(forms.Form):
+    # All fields are not required, the last 12 months are shown by default
+    start_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(required=False, widget=DateInput(attrs={'type': 'date'}))
+    max_months = 120  # every month of the period is a row of every bank, so the period is at most 10 years long
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date, end_date = cleaned_data.get('start_date'), cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError('The start date must be before the end date.')
+        end = end_date or date.today()  # the report ends today by default
+        if start_date and (end.year - start_date.year) * 12 + end.month - start_date.month >= self.max_months:
+            raise forms.ValidationError(f'The period can be at most {self.max_months // 12} years long.')
+        return cleaned_data
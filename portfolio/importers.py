@@ -0,0 +1,220 @@
+"""
+Bulk import of bank statements (CSV and OFX files) into Income and Expenses lines, used by the 'import_statement'
+management command and by the upload view. The files are read incrementally, row by row, so the memory use does not
+grow with the size of the statement.
+
+CSV files need a header row. The recognised columns are 'date', 'amount', 'type' ('income' or 'expenses'), 'category',
+'seller' or 'source', 'bank' and 'notes'; only 'date' and 'amount' are required. Without the 'type' column negative
+amounts are expenses and positive amounts are income. OFX files (both the SGML and XML versions) are read transaction
+by transaction ('STMTTRN' blocks), the payee ('NAME') becomes the seller or source and the memo the notes.
+
+The categories, sellers, sources and banks are found by name (case-insensitive) in an in-memory cache, which is filled
+with one query per model on first use; missing objects are created once. Lines are inserted with bulk_create() in
+batches. Every batch is a single transaction, which also applies one net balance change per bank (balances.py) and
+refreshes the monthly rollups (rollups.py) and the search documents (search.py) of the inserted lines, as the signals
+of the models are not called by bulk_create().
+"""
+import csv
+import html
+import re
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .models import Income, Expenses, IncomeCategory, IncomeSource, ExpensesCategory, Seller, Bank, BankMovement
+from .balances import apply_delta
+from .rollups import month_start, refresh_months
+from .search import index_lines
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d.%m.%Y', '%Y%m%d')
+MAX_ERRORS = 100  # number of rejected rows kept for the report
+MAX_AMOUNT = Decimal('1e8')  # the amount fields have 10 digits, 2 of them after the decimal point
+
+
+class StatementError(Exception):  # a file which can not be read at all, rejected rows are only counted
+    pass
+
+
+def parse_date(value):
+    value = value.strip()
+    if re.match(r'\d{8}', value):  # OFX dates may continue with the time, e.g. '20230115120000.000[-5:EST]'
+        value = value[:8]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Unknown date {value!r}.')
+
+
+def parse_amount(value):
+    value = value.replace(' ', '').replace('\xa0', '')
+    if ',' in value and '.' not in value:  # decimal comma, e.g. '12,50'
+        value = value.replace(',', '.')
+    try:
+        amount = Decimal(value.replace(',', ''))
+        if not amount.is_finite():  # 'NaN', 'inf' and 'sNaN' are read by Decimal() too
+            raise InvalidOperation
+        return amount.quantize(Decimal('0.01'))  # too many digits (e.g. '1e400') can not be rounded to cents either
+    except InvalidOperation:
+        raise ValueError(f'Unknown amount {value!r}.')
+
+
+def csv_rows(stream):  # dicts with lower-case column names, read one row at a time
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames or not {'date', 'amount'} <= {name.strip().lower() for name in reader.fieldnames}:
+        raise StatementError('The CSV file must have a header row with "date" and "amount" columns.')
+    for row in reader:
+        row = {(name or '').strip().lower(): (value or '').strip() for name, value in row.items()}
+        row['party'] = row.get('seller') or row.get('source') or ''
+        yield row
+
+
+def _ofx_tags(stream, chunk_size=65536):  # (tag, value) pairs of the OFX file, closing tags have a '/' before the name
+    rest = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        parts = (rest + chunk).split('<')
+        rest = parts.pop() if chunk else ''  # the last part may continue in the next chunk
+        for part in parts:
+            tag, separator, value = part.partition('>')
+            if separator:
+                yield tag.strip().upper(), html.unescape(value.strip())
+        if not chunk:
+            return
+
+
+def ofx_rows(stream):
+    transaction_tags = {'DTPOSTED': 'date', 'TRNAMT': 'amount', 'NAME': 'party', 'PAYEE': 'party', 'MEMO': 'notes'}
+    bank, row = '', None
+    found = False
+    for tag, value in _ofx_tags(stream):
+        if tag == 'ORG':  # name of the financial institution, used as the bank of the lines
+            bank = value
+        elif tag == 'STMTTRN':
+            row, found = {'bank': bank}, True
+        elif tag == '/STMTTRN' and row is not None:
+            yield row
+            row = None
+        elif row is not None and tag in transaction_tags and value:
+            row.setdefault(transaction_tags[tag], value)
+    if not found:
+        raise StatementError('No transactions (STMTTRN) were found in the OFX file.')
+
+
+def statement_rows(stream, file_format):
+    if file_format == 'csv':
+        return csv_rows(stream)
+    if file_format == 'ofx':
+        return ofx_rows(stream)
+    raise StatementError(f'Unknown format {file_format!r}, use "csv" or "ofx".')
+
+
+def guess_format(file_name):
+    return 'ofx' if re.search(r'\.(ofx|qfx)$', file_name or '', re.IGNORECASE) else 'csv'
+
+
+class LookupCache:  # ids of the user's objects by their names, the missing objects are created
+    def __init__(self, model, owner_field, name_field, user):
+        self.model, self.owner_field, self.name_field, self.user = model, owner_field, name_field, user
+        self.ids = None
+        self.created = 0
+
+    def get_id(self, name):
+        name = (name or '').strip()
+        if not name:
+            return None
+        if self.ids is None:  # all objects of the user are read with a single query on the first use
+            objects = self.model.objects.filter(**{self.owner_field: self.user}).values_list(self.name_field, 'id')
+            self.ids = {object_name.lower(): pk for object_name, pk in objects.order_by('-id')}  # first one wins
+        key = name.lower()
+        if key not in self.ids:
+            self.ids[key] = self.model.objects.create(**{self.owner_field: self.user, self.name_field: name}).pk
+            self.created += 1
+        return self.ids[key]
+
+
+class StatementImporter:
+    def __init__(self, user, default_bank=None, batch_size=1000):
+        self.user = user
+        self.default_bank = default_bank  # Bank object for the rows without a bank
+        self.batch_size = batch_size
+        self.caches = {
+            'income_category': LookupCache(IncomeCategory, 'client', 'definition', user),
+            'source': LookupCache(IncomeSource, 'earner', 'source', user),
+            'expenses_category': LookupCache(ExpensesCategory, 'client', 'definition', user),
+            'seller': LookupCache(Seller, 'client', 'seller', user),
+            'bank': LookupCache(Bank, 'owner', 'name', user),
+        }
+        self.pending = {Income: [], Expenses: []}
+        self.counts = {Income: 0, Expenses: 0}
+        self.errors = []  # (row number, message) of the rejected rows
+        self.rejected = 0
+
+    def run(self, rows):
+        for number, row in enumerate(rows, start=1):
+            try:
+                self.add(row)
+            except ValueError as error:
+                self.rejected += 1
+                if len(self.errors) < MAX_ERRORS:
+                    self.errors.append((number, str(error)))
+            if sum(len(lines) for lines in self.pending.values()) >= self.batch_size:
+                self.flush()
+        self.flush()
+        return self
+
+    def add(self, row):
+        line_date = parse_date(row.get('date') or '')
+        if line_date > date.today():  # the same rule as the present_or_past_date validator of the forms
+            raise ValueError(f'Date {line_date} is in the future.')
+        amount = parse_amount(row.get('amount') or '')
+        if abs(amount) >= MAX_AMOUNT:
+            raise ValueError(f'Amount {amount} is too large.')
+        kind = (row.get('type') or '').lower()[:3]  # e.g. 'Income', 'expense' or 'expenses'
+        if kind not in ('inc', 'exp'):
+            kind = 'exp' if amount < 0 else 'inc'
+        bank_id = self.caches['bank'].get_id(row.get('bank')) or getattr(self.default_bank, 'pk', None)
+        values = dict(client=self.user, date=line_date, amount=abs(amount), bank_id=bank_id,
+                      notes=row.get('notes') or 'There are no additional notes')
+        if kind == 'inc':
+            self.pending[Income].append(Income(
+                category_id=self.caches['income_category'].get_id(row.get('category')),
+                source_id=self.caches['source'].get_id(row.get('party')), **values))
+        else:
+            self.pending[Expenses].append(Expenses(
+                category_id=self.caches['expenses_category'].get_id(row.get('category')),
+                seller_id=self.caches['seller'].get_id(row.get('party')), **values))
+
+    def flush(self):
+        if not any(self.pending.values()):
+            return
+        with transaction.atomic():  # lines, balances, rollups and search documents of a batch
+            deltas = defaultdict(Decimal)
+            for model, sign in ((Income, 1), (Expenses, -1)):
+                lines = model.objects.bulk_create(self.pending[model])
+                for line in lines:
+                    deltas[line.bank_id] += sign * line.amount
+                refresh_months(model, self.user.pk, {month_start(line.date) for line in lines})
+                index_lines(model, model.objects.filter(pk__in=[line.pk for line in lines if line.pk]))
+                self.counts[model] += len(lines)
+            for bank_id, delta in deltas.items():  # one balance change per bank for the whole batch
+                apply_delta(bank_id, balance=delta, reason=BankMovement.IMPORT)
+        self.pending = {Income: [], Expenses: []}
+
+    def summary(self):
+        created = ', '.join(f'{cache.created} {name.replace("_", " ")}' for name, cache in self.caches.items()
+                            if cache.created)
+        text = f'{self.counts[Income]} income and {self.counts[Expenses]} expenses lines were imported'
+        text += f' ({created} created)' if created else ''
+        text += f', {self.rejected} rows were rejected.' if self.rejected else '.'
+        return text
+
+
+def import_statement(user, stream, file_format, default_bank=None, batch_size=1000):
+    # The batches saved before a damaged part of the file are kept, the error tells how far the import got
+    importer = StatementImporter(user, default_bank, batch_size)
+    try:
+        return importer.run(statement_rows(stream, file_format))
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise StatementError(f'The file can not be read ({error}). {importer.summary()}')
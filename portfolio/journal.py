@@ -0,0 +1,104 @@
+"""
+Append-only journal of Bank balance changes. Every change of a bank's account or investment balance is recorded as a
+BankMovement row with the changed amounts and the reason of the change: the balance service (balances.py) records the
+changes made by Income and Expenses lines and by transfers, the signals in signals.py record opening balances of new
+banks and the changes made by editing a bank. The banks which existed before the journal start with a JOURNAL_START
+movement of their balances at that moment (migrations 0012 and 0023).
+
+Every SNAPSHOT_INTERVAL movements of a bank a BankSnapshot row with the bank's balances right after the movement is
+written. The counter of movements since the last snapshot is kept on the Bank row, so checking whether a snapshot is due
+costs a single UPDATE. balance_at() finds the latest snapshot before a moment with one indexed query and adds the
+movements made after it (never more than SNAPSHOT_INTERVAL rows), instead of summing up all lines of the bank.
+rebuild_balance() does the same for the current moment, it is used by the 'rebuild_bank_balances' management command to
+check and repair the stored balances. JournalBatch records the movements of many banks changed at once (the batch
+transfers of balances.py) with one bulk_create() call instead of a few queries per movement, and takes the snapshots due
+after the batch from the balances read back from the database.
+"""
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import Bank, BankMovement, BankSnapshot
+
+SNAPSHOT_INTERVAL = 50  # number of movements of a bank between two snapshots
+
+
+def record_movement(bank_id, balance=0, investment=0, reason=BankMovement.ADJUSTMENT, counted=False):
+    # counted=True means the caller has already increased Bank.movements_since_snapshot in its own UPDATE statement
+    if bank_id is None or not (balance or investment):
+        return None
+    with transaction.atomic():
+        movement = BankMovement.objects.create(bank_id=bank_id, reason=reason, balance_delta=balance or 0,
+                                               investment_delta=investment or 0)
+        banks = Bank.objects.filter(pk=bank_id)
+        if not counted:
+            banks.update(movements_since_snapshot=F('movements_since_snapshot') + 1)
+        # The counter is reset only by the request which reached the interval, so exactly one snapshot is taken
+        if banks.filter(movements_since_snapshot__gte=SNAPSHOT_INTERVAL).update(movements_since_snapshot=0):
+            take_snapshot(movement)
+    return movement
+
+
+class JournalBatch:
+    # Movements of locked Bank objects whose balances are changed by the caller with one bulk_update(). The caller also
+    # increases the counters of movements there with counted(), save() then takes the snapshots which became due
+    def __init__(self):
+        self.created = timezone.now()
+        self.movements = []
+        self.last_movements = {}  # the latest movement of every bank of the batch
+        self.counts = defaultdict(int)
+
+    def add(self, bank, reason, balance=0, investment=0):
+        movement = BankMovement(bank=bank, created=self.created, reason=reason, balance_delta=balance or 0,
+                                investment_delta=investment or 0)
+        self.movements.append(movement)
+        self.last_movements[bank.pk] = movement
+        self.counts[bank.pk] += 1
+
+    def counted(self, bank):  # new value of the bank's counter, written in the same UPDATE statement as the balances
+        return F('movements_since_snapshot') + self.counts[bank.pk]
+
+    def save(self):
+        # Called after the caller's update: the counters and balances are read back from the database inside the same
+        # transaction, so changes made by other requests are included, and a snapshot of the balances right after the
+        # latest movement of the batch is taken for every bank which reached the interval
+        BankMovement.objects.bulk_create(self.movements)  # the movements get their ids, the snapshots point to them
+        due = Bank.objects.filter(pk__in=self.last_movements, movements_since_snapshot__gte=SNAPSHOT_INTERVAL)
+        due = list(due.values_list('pk', 'balance', 'investment'))
+        if not due:
+            return
+        Bank.objects.filter(pk__in=[bank_id for bank_id, _, _ in due]).update(movements_since_snapshot=0)
+        BankSnapshot.objects.bulk_create(
+            BankSnapshot(bank_id=bank_id, movement=self.last_movements[bank_id], created=self.created,
+                         balance=balance or 0, investment=investment or 0) for bank_id, balance, investment in due)
+
+
+def take_snapshot(movement):  # balances of the bank right after the movement, in the same transaction as the movement
+    balance, investment = Bank.objects.filter(pk=movement.bank_id).values_list('balance', 'investment').get()
+    return BankSnapshot.objects.create(bank_id=movement.bank_id, movement=movement, created=movement.created,
+                                       balance=balance or 0, investment=investment or 0)
+
+
+def balance_at(bank, moment=None):
+    """
+    Returns the (balance, investment) tuple of the bank at the given datetime (now by default), calculated from the
+    journal. Before the first movement of the bank both balances are zero.
+    """
+    moment = moment or timezone.now()
+    snapshot = BankSnapshot.objects.filter(bank=bank, created__lte=moment).order_by('-created', '-id').first()
+    movements = BankMovement.objects.filter(bank=bank, created__lte=moment)
+    balance = investment = Decimal('0')
+    if snapshot:
+        balance, investment = snapshot.balance, snapshot.investment
+        movements = movements.filter(id__gt=snapshot.movement_id)
+    totals = movements.order_by().aggregate(balance=Sum('balance_delta'), investment=Sum('investment_delta'))
+    return balance + (totals['balance'] or 0), investment + (totals['investment'] or 0)
+
+
+def rebuild_balance(bank, save=False):
+    # Current balances of the bank according to the journal, optionally written into the Bank row
+    balance, investment = balance_at(bank)
+    if save:
+        Bank.objects.filter(pk=getattr(bank, 'pk', bank)).update(balance=balance, investment=investment)
+    return balance, investment
@@ -0,0 +1,66 @@
+"""
+Descriptions of the two sides of the ledger, Income and Expenses, and of the objects their lines are grouped by
+(categories, sources of income and sellers). The generic views (views_ledger.py) take one of these descriptions and
+serve the pages of both sides with the same code, so a query optimisation or a fix of the views applies to both.
+
+The two sides differ only in names: the model, the party of the line (the source of an Income line, the seller of an
+Expenses line), the sign of the balance change, the forms, and the prefix ('income' or 'expenses') of the templates,
+URL names and template variables, e.g. 'user_income_lines.html', 'income-line-pdf' and 'total_income'.
+"""
+from django.urls import reverse_lazy
+from .models import Income, Expenses, IncomeCategory, IncomeSource, ExpensesCategory, Seller, BankMovement
+from .forms import (IncomeCreateForm, ExpensesCreateForm, IncomeCategoryCreateForm, IncomeSourceCreateForm,
+                    ExpensesCategoryCreateForm, SellerCreateForm, SearchSelectIncomeForm,
+                    SearchSelectIncomeForComparisonForm, SearchSelectExpensesForm,
+                    SearchSelectExpensesForComparisonForm, ArchiveIncomeForm, ArchiveIncomeByMonthForm,
+                    ArchiveExpensesForm, ArchiveExpensesByMonthForm)
+
+
+class Ledger:
+    def __init__(self, kind, model, party, sign, reason, line_form, search_forms, archive_forms):
+        self.kind = kind  # 'income' or 'expenses', the prefix of the templates, URL names and template variables
+        self.label = kind.capitalize()  # for the messages, e.g. 'Income item was created successfully.'
+        self.model = model
+        self.party = party  # field of the line's source or seller, selected in the 'source' field of the forms
+        self.sign = sign  # 1 - the lines are added to the balance of their bank, -1 - deducted from it
+        self.reason = reason  # reason of the bank movements made by the lines (see journal.py)
+        self.line_form = line_form
+        self.search_form, self.compare_form = search_forms
+        self.archive_form, self.monthly_form = archive_forms
+
+    def template(self, name):  # e.g. template('user_{kind}_lines') - 'user_income_lines.html'
+        return name.format(kind=self.kind) + '.html'
+
+
+class Catalogue:
+    def __init__(self, model, owner, name, plural, context_object_name, label, form, fields, url_names):
+        self.model = model
+        self.owner = owner  # field of the user the objects belong to ('client' or 'earner')
+        self.name = name  # template prefix of one object, e.g. 'income_category' - 'user_income_category_form.html'
+        self.plural = plural  # template of the list, e.g. 'income_categories' - 'user_income_categories.html'
+        self.context_object_name = context_object_name
+        self.label = label  # for the messages, e.g. 'Income category item was created successfully.'
+        self.form = form  # form of the new objects
+        self.fields = fields  # fields of the updated objects
+        # After a new object is created the form is shown again, after an update or deletion the list of the objects
+        self.new_url, self.list_url = (reverse_lazy(url_name) for url_name in url_names)
+
+
+INCOME = Ledger('income', Income, 'source', 1, BankMovement.INCOME, IncomeCreateForm,
+                (SearchSelectIncomeForm, SearchSelectIncomeForComparisonForm),
+                (ArchiveIncomeForm, ArchiveIncomeByMonthForm))
+EXPENSES = Ledger('expenses', Expenses, 'seller', -1, BankMovement.EXPENSES, ExpensesCreateForm,
+                  (SearchSelectExpensesForm, SearchSelectExpensesForComparisonForm),
+                  (ArchiveExpensesForm, ArchiveExpensesByMonthForm))
+
+INCOME_CATEGORIES = Catalogue(IncomeCategory, 'client', 'income_category', 'income_categories', 'income_categories',
+                              'Income category', IncomeCategoryCreateForm, ['definition'],
+                              ('income-category-new', 'user-income-categories'))
+INCOME_SOURCES = Catalogue(IncomeSource, 'earner', 'income_source', 'income_sources', 'income_sources',
+                           'Income source', IncomeSourceCreateForm, ['source'],
+                           ('income-source-new', 'user-income-sources'))
+EXPENSES_CATEGORIES = Catalogue(ExpensesCategory, 'client', 'expenses_category', 'expenses_categories',
+                                'expenses_categories', 'Expenses category', ExpensesCategoryCreateForm, ['definition'],
+                                ('expenses-category-new', 'user-expenses-categories'))
+SELLERS = Catalogue(Seller, 'client', 'expenses_seller', 'expenses_sellers', 'sellers', 'Seller', SellerCreateForm,
+                    ['seller'], ('seller-new', 'user-sellers'))
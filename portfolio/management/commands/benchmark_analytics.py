@@ -0,0 +1,128 @@
+"""
+Management command that compares the monthly trends of analytics.py (the monthly totals of the rollup table in NumPy
+arrays) with the same trends calculated by a plain Python loop over every Income and Expenses line, the way they would
+be calculated without the rollups and NumPy. Both results are checked to be equal. The client is seeded inside a
+transaction and rolled back at the end, or an existing client is used (e.g. one made by 'generate_data'). Usage:
+
+    python manage.py benchmark_analytics --lines 100000
+    python manage.py benchmark_analytics --user synthetic_0 --repeat 10
+"""
+from datetime import date
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from portfolio.analytics import SERIES, WINDOWS, AnalyticsUnavailable, trends
+from portfolio.benchmarking import complete_seeded_data, seed_user_data, time_call
+from portfolio.models import Income, Expenses
+from portfolio.rollups import month_start, next_month
+
+
+class Rollback(Exception):
+    pass
+
+
+def _rounded(value):
+    return None if value is None else round(value, 2)
+
+
+def naive_trends(user, horizon=3):  # trends() of all the user's lines, one line and one month at a time
+    totals = {}  # month: [income, expenses]
+    for column, model in enumerate((Income, Expenses)):
+        for day, amount in model.objects.filter(client=user, date__isnull=False).values_list('date', 'amount'):
+            month = month_start(day)
+            if month <= date.today():
+                totals.setdefault(month, [0.0, 0.0])[column] += float(amount)
+    if not totals:
+        return {'months': [], 'forecast': []}
+    months = []
+    month = min(totals)
+    while month <= date.today():
+        months.append(month)
+        month = next_month(month)
+    series = {'income': [], 'expenses': [], 'savings': []}
+    for month in months:
+        income, expenses = totals.get(month, [0.0, 0.0])
+        series['income'].append(income)
+        series['expenses'].append(expenses)
+        series['savings'].append(income - expenses)
+
+    result = []
+    for index, month in enumerate(months):
+        row = {'month': month.strftime('%Y-%m')}
+        for name in SERIES:
+            values = series[name]
+            row[name] = _rounded(values[index])
+            for window in WINDOWS:
+                row[f'{name}_avg_{window}'] = _rounded(sum(values[index - window + 1:index + 1]) / window) \
+                    if index >= window - 1 else None
+            row[f'{name}_yoy'] = _rounded(values[index] - values[index - 12]) if index >= 12 else None
+        income = series['income'][index]
+        row['savings_rate'] = _rounded(series['savings'][index] * 100 / income) if income > 0 else None
+        result.append(row)
+
+    forecast = []
+    count = len(months)
+    if count >= 2:
+        mean_x = (count - 1) / 2
+        lines = {}
+        for name in ('income', 'expenses'):  # least squares
+            mean_y = sum(series[name]) / count
+            slope = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(series[name])) / \
+                sum((x - mean_x) ** 2 for x in range(count))
+            lines[name] = (slope, mean_y - slope * mean_x)
+        month = months[-1]
+        for x in range(count, count + horizon):
+            month = next_month(month)
+            income, expenses = (max(slope * x + intercept, 0) for slope, intercept in lines.values())
+            forecast.append({'month': month.strftime('%Y-%m'), 'income': _rounded(income),
+                             'expenses': _rounded(expenses), 'savings': _rounded(income - expenses)})
+    return {'months': result, 'forecast': forecast}
+
+
+def differences(first, second):  # number of values which differ by more than a cent
+    count = 0
+    for part in ('months', 'forecast'):
+        for first_row, second_row in zip(first[part], second[part]):
+            for name, value in first_row.items():
+                other = second_row.get(name)
+                if name == 'month':
+                    count += value != other
+                elif (value is None) != (other is None) or value is not None and abs(value - other) > 0.011:
+                    count += 1
+        count += abs(len(first[part]) - len(second[part]))
+    return count
+
+
+class Command(BaseCommand):
+    help = 'Compares the monthly trends calculated with NumPy arrays with a per-line Python loop.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=100000, help='Number of lines of the seeded client')
+        parser.add_argument('--user', help='Measure an existing client instead of seeding one')
+        parser.add_argument('--repeat', type=int, default=5, help='How many times every calculation is timed')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():  # the seeded lines and their rollups are rolled back at the end
+                if options['user']:
+                    try:
+                        user = User.objects.get(username=options['user'])
+                    except User.DoesNotExist:
+                        raise CommandError(f"User {options['user']} does not exist.")
+                else:
+                    user = seed_user_data('benchmark_analytics', lines=options['lines'], years=10, seed=0)
+                    complete_seeded_data(user)
+                self.measure(user, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, user, repeat):
+        try:
+            vectorised = trends(user)
+        except AnalyticsUnavailable as error:
+            raise CommandError(str(error))
+        naive = naive_trends(user)
+        self.stdout.write(f"  {len(vectorised['months'])} months, {differences(vectorised, naive)} different values")
+        self.stdout.write(f'  {"per-line Python loop":22} {time_call(lambda: naive_trends(user), repeat):9.2f} ms')
+        self.stdout.write(f'  {"rollups and NumPy":22} {time_call(lambda: trends(user), repeat):9.2f} ms')
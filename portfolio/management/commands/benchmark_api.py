@@ -0,0 +1,56 @@
+"""
+Management command that compares the throughput of the JSON API (api.py) with the HTML list pages of Income and
+Expenses lines. The command seeds a client with the requested number of lines inside a transaction, requests the pages
+with Django's test client (the whole request, middleware and rendering included, without the network), prints the
+median time of a page and the number of lines served per second, and rolls the transaction back, so the database is
+left untouched. Usage:
+
+    python manage.py benchmark_api --lines 100000
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from portfolio.benchmarking import seed_user_data, time_call
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Shows timings and throughput of the JSON API compared with the HTML list pages.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=100000, help='Number of lines of the seeded client')
+        parser.add_argument('--repeat', type=int, default=20, help='How many times every page is timed')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                user = seed_user_data('benchmark_api', lines=options['lines'], seed=0)
+                client = Client()
+                client.force_login(user)
+                self.measure(client, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, client, repeat):
+        api = reverse('api-list', args=['expenses'])
+        pages = [  # (label, URL, lines on the page)
+            ('HTML list page', reverse('user-expenses-lines'), 10),
+            ('API, all fields', f'{api}?limit=10', 10),
+            ('API, 3 fields', f'{api}?limit=10&fields=date,amount,seller', 10),
+            ('API, all fields', f'{api}?limit=500', 500),
+            ('API, 3 fields', f'{api}?limit=500&fields=date,amount,seller', 500),
+        ]
+        for label, url, lines in pages:
+            response = client.get(url)
+            assert response.status_code == 200, f'{url} answered with {response.status_code}'
+            milliseconds = time_call(lambda: client.get(url).content, repeat)
+            throughput = lines * 1000 / milliseconds
+            self.stdout.write(f'  {label:16} {lines:4} lines {milliseconds:9.2f} ms {throughput:10.0f} lines/s')
+        etag = client.get(f'{api}?limit=500')['ETag']
+        milliseconds = time_call(lambda: client.get(f'{api}?limit=500', HTTP_IF_NONE_MATCH=etag), repeat)
+        self.stdout.write(f'  {"API, unchanged":16} {"304":>4}       {milliseconds:9.2f} ms')
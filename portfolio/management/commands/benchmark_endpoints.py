@@ -0,0 +1,120 @@
+"""
+Management command that measures the main pages of the app the way a browser uses them: the lists of lines, the keyword
+and select searches, the archive reports and the transfers, requested with Django's test client (the whole request,
+middleware and rendering included, without the network). For every page the median and slowest time and the number of
+queries are written to a JSON baseline. A later run compared with the baseline fails if a page makes more queries or
+is slower than the tolerance allows, so regressions are found locally before they reach the server.
+
+The measured client is seeded inside a transaction with realistic data (benchmarking.py), or an existing client is
+used (e.g. one made by 'generate_data'); everything, including the transfers, is rolled back at the end. Usage:
+
+    python manage.py benchmark_endpoints --lines 100000 --output baseline.json
+    python manage.py benchmark_endpoints --lines 100000 --compare baseline.json
+    python manage.py benchmark_endpoints --user synthetic_0 --repeat 10
+"""
+import json
+from datetime import date, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from portfolio.benchmarking import complete_seeded_data, measure_request, seed_user_data
+from portfolio.models import Bank, Seller, Expenses, Income
+
+
+class Rollback(Exception):
+    pass
+
+
+def endpoints(user):  # (label, method, URL, data) of the measured pages
+    first_bank, second_bank = Bank.objects.filter(owner=user).order_by('id')[:2]
+    seller = Seller.objects.filter(client=user).order_by('id').first()
+    lines = Expenses.objects.filter(client=user).count() + Income.objects.filter(client=user).count()
+    year_ago = (date.today() - timedelta(days=365)).isoformat()
+    archive = {'start_date': year_ago, 'start_date_report': year_ago}
+    return lines, [
+        ('Expenses list', 'GET', reverse('user-expenses-lines'), None),
+        ('Income list', 'GET', reverse('user-income-lines'), None),
+        ('Expenses keyword search', 'GET', reverse('search-expenses-key'), {'keywords': seller.seller}),
+        ('Income keyword search', 'GET', reverse('search-income-key'), {'keywords': 'Salary'}),
+        ('Expenses select search', 'POST', reverse('search-expenses-select'), {'start_date': year_ago}),
+        ('Income select search', 'POST', reverse('search-income-select'), {'start_date': year_ago}),
+        ('Expenses archive', 'POST', reverse('archive-expenses'), archive),
+        ('Income archive', 'POST', reverse('archive-income'), archive),
+        ('Transfer between banks', 'POST', reverse('transfer-between_banks'),
+         {'from_bank': first_bank.pk, 'to_bank': second_bank.pk, 'amount': '1'}),
+        ('Transfer inside bank', 'POST', reverse('transfer-inside_bank'),
+         {'bank': first_bank.pk, 'source_account': 'balance', 'to_account': 'investment', 'amount': '1'}),
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Measures the list, search, archive and transfer pages and compares them with a JSON baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=100000, help='Number of lines of the seeded client')
+        parser.add_argument('--user', help='Measure an existing client instead of seeding one')
+        parser.add_argument('--repeat', type=int, default=5, help='How many times every page is requested')
+        parser.add_argument('--output', help='File the measurements are written to as a JSON baseline')
+        parser.add_argument('--compare', help='JSON baseline the measurements are compared with')
+        parser.add_argument('--tolerance', type=float, default=1.5,
+                            help='A page is a regression if its median time grows more than this many times')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as baseline_file:
+                baseline = json.load(baseline_file)
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=['testserver']):
+                if options['user']:
+                    try:
+                        user = User.objects.get(username=options['user'])
+                    except User.DoesNotExist:
+                        raise CommandError(f"User {options['user']} does not exist.")
+                else:
+                    user = seed_user_data('benchmark_endpoints', lines=options['lines'], seed=0)
+                    complete_seeded_data(user)
+                results = self.measure(user, options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
+                output.write('\n')
+            self.stdout.write(f"The baseline was written to {options['output']}.")
+        if baseline is not None:
+            self.compare(results, baseline, options['tolerance'])
+
+    def measure(self, user, repeat):
+        client = Client()
+        client.force_login(user)
+        lines, pages = endpoints(user)
+        results = {'lines': lines, 'repeat': repeat, 'pages': {}}
+        for label, method, url, data in pages:
+            result = measure_request(client, method, url, data, repeat)
+            results['pages'][label] = result
+            self.stdout.write(f"  {label:24} {result['status']} {result['median_ms']:9.2f} ms "
+                              f"(max {result['max_ms']:9.2f} ms) {result['queries']:5} queries "
+                              f"({result['duplicates']} duplicates)")
+        return results
+
+    def compare(self, results, baseline, tolerance):
+        if baseline.get('lines') != results['lines']:
+            self.stdout.write(self.style.WARNING(f"The baseline was measured with {baseline.get('lines')} lines, "
+                                                 f"this run with {results['lines']}."))
+        regressions = []
+        for label, result in results['pages'].items():
+            before = baseline['pages'].get(label)
+            if before is None:
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f"{label}: {before['queries']} -> {result['queries']} queries")
+            if result['median_ms'] > before['median_ms'] * tolerance:
+                regressions.append(f"{label}: {before['median_ms']} -> {result['median_ms']} ms")
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n  ' + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
@@ -0,0 +1,90 @@
+"""
+Management command that shows the query plans and timings of the main Income and Expenses queries before and after the
+composite (client, date) indexes are created. The command seeds a database with several clients inside a transaction,
+drops the indexes, measures the queries, creates the indexes again, measures the queries once more and finally rolls
+the transaction back, so the database is left untouched. Usage:
+
+    python manage.py benchmark_indexes --lines 200000 --clients 5
+"""
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q, Sum, Avg, Max, Min, Count
+from portfolio.benchmarking import seed_user_data, time_call
+from portfolio.models import Income, Expenses
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Shows query plans and timings of Income and Expenses queries with and without the composite indexes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=100000, help='Number of lines for each seeded client')
+        parser.add_argument('--clients', type=int, default=5, help='Number of seeded clients')
+        parser.add_argument('--repeat', type=int, default=5, help='How many times every query is timed')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():  # everything, including the index changes, is rolled back at the end
+                clients = [seed_user_data(f'benchmark_indexes_{number}', lines=options['lines'], seed=number)
+                           for number in range(options['clients'])]
+                user = clients[0]
+                queries = self.get_queries(user)
+                self.set_indexes(create=False)
+                before = self.measure(queries, options['repeat'])
+                self.set_indexes(create=True)
+                after = self.measure(queries, options['repeat'])
+                self.report(queries, before, after)
+                raise Rollback
+        except Rollback:
+            pass
+
+    @staticmethod
+    def get_queries(user):  # the same filters as used by the list, search and archive views
+        expenses_line = Expenses.objects.filter(client=user).first()
+        income_line = Income.objects.filter(client=user).first()
+        year_ago = date.today() - timedelta(days=365)
+        stats = dict(count=Count('id'), total=Sum('amount'), avg=Avg('amount'), max=Max('amount'), min=Min('amount'))
+        return [
+            ('Expenses list page', lambda: Expenses.objects.filter(client=user)[:10]),
+            ('Income list page', lambda: Income.objects.filter(client=user)[:10]),
+            ('Expenses stats, last year', lambda: Expenses.objects.filter(
+                client=user, date__range=[year_ago, date.today()]).values('client').annotate(**stats)),
+            ('Expenses by category', lambda: Expenses.objects.filter(
+                Q(client=user, category=expenses_line.category_id)).order_by('-date')[:10]),
+            ('Expenses by bank', lambda: Expenses.objects.filter(
+                client=user, bank=expenses_line.bank_id).values('client').annotate(**stats)),
+            ('Expenses by seller', lambda: Expenses.objects.filter(
+                client=user, seller=expenses_line.seller_id).values('client').annotate(**stats)),
+            ('Income by source', lambda: Income.objects.filter(
+                client=user, source=income_line.source_id).values('client').annotate(**stats)),
+        ]
+
+    @staticmethod
+    def set_indexes(create):  # the statements are executed directly, SQLite does not allow the schema editor here
+        editor = connection.schema_editor()
+        with connection.cursor() as cursor:
+            for model in (Income, Expenses):
+                for index in model._meta.indexes:
+                    statement = index.create_sql(model, editor) if create else index.remove_sql(model, editor)
+                    cursor.execute(str(statement))
+            if connection.vendor in ('sqlite', 'postgresql'):
+                cursor.execute('ANALYZE')  # refreshes the statistics used by the query planner
+
+    @staticmethod
+    def measure(queries, repeat):
+        results = []
+        for label, build in queries:
+            results.append((build().explain(), time_call(lambda: list(build()), repeat)))
+        return results
+
+    def report(self, queries, before, after):
+        for (label, _), (plan_before, ms_before), (plan_after, ms_after) in zip(queries, before, after):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            self.stdout.write(f'  without indexes: {ms_before:9.2f} ms')
+            self.stdout.write('    ' + plan_before.replace('\n', '\n    '))
+            self.stdout.write(f'  with indexes:    {ms_after:9.2f} ms')
+            self.stdout.write('    ' + plan_after.replace('\n', '\n    '))
@@ -0,0 +1,61 @@
+"""
+Management command that compares the keyword search of Expenses lines with 'icontains' conditions over the joined
+tables (the search before the full-text index) with the search in the full-text index. The command seeds a client
+with the requested number of lines inside a transaction, indexes them, measures the searches and rolls the transaction
+back, so the database is left untouched. Usage:
+
+    python manage.py benchmark_search --lines 1000000
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from portfolio.benchmarking import seed_user_data, time_call
+from portfolio.models import Expenses
+from portfolio.search import keyword_filter, rebuild_search_index, search_lines
+
+
+class Rollback(Exception):
+    pass
+
+
+def icontains_filter(keywords):  # the keyword filter used by the search views before the full-text index
+    query = Q()
+    for keyword in keywords:
+        query |= (Q(category__definition__icontains=keyword) | Q(seller__seller__icontains=keyword) |
+                  Q(amount__icontains=keyword) | Q(notes__icontains=keyword) | Q(bank__name__icontains=keyword))
+    return query
+
+
+class Command(BaseCommand):
+    help = 'Shows timings of the keyword search with icontains conditions and with the full-text index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=100000, help='Number of lines of the seeded client')
+        parser.add_argument('--repeat', type=int, default=5, help='How many times every search is timed')
+        parser.add_argument('--keywords', nargs='+', default=['Seller 7', 'note 4242', 'Expenses category 3, Bank 1'],
+                            help='Searched keywords, several keywords in one search are separated with a comma')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():  # the seeded lines and their search documents are rolled back at the end
+                user = seed_user_data('benchmark_search', lines=options['lines'], seed=0)
+                rebuild_search_index(user)
+                for keywords in options['keywords']:
+                    self.measure(user, keywords.split(', '), options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def measure(self, user, keywords, repeat):
+        lines = Expenses.objects.filter(client=user)
+        searches = [
+            ('icontains, count', lambda: lines.filter(icontains_filter(keywords)).count()),
+            ('full-text, count', lambda: search_lines(lines, keywords).count()),
+            ('icontains, first page', lambda: list(lines.filter(icontains_filter(keywords)).order_by('-date')[:10])),
+            ('full-text, first page', lambda: list(search_lines(lines, keywords)[:10])),
+        ]
+        self.stdout.write(self.style.MIGRATE_HEADING(', '.join(keywords)))
+        found = lines.filter(keyword_filter(Expenses, keywords)).count()
+        self.stdout.write(f'  {found} lines found')
+        for label, search in searches:
+            self.stdout.write(f'  {label:22} {time_call(search, repeat):9.2f} ms')
@@ -0,0 +1,23 @@
+"""
+Management command that moves the PDF documents stored before the content-addressed storage into it, recounts the
+references of the stored files from the lines and deletes the files no line points to (more about it in blobs.py).
+Usage:
+
+    python manage.py clean_stored_files
+    python manage.py clean_stored_files --skip-legacy    # only recounts the references and deletes orphaned files
+"""
+from django.core.management.base import BaseCommand
+from portfolio.blobs import recount_references, store_legacy_documents
+
+
+class Command(BaseCommand):
+    help = 'Deduplicates the PDF documents of the lines and deletes the files no line points to.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-legacy', action='store_true', help='Do not move the old documents into the storage')
+
+    def handle(self, *args, **options):
+        moved = 0 if options['skip_legacy'] else store_legacy_documents()
+        deleted = recount_references()
+        self.stdout.write(self.style.SUCCESS(f'{moved} documents were moved into the storage, {deleted} orphaned files '
+                                             f'were deleted.'))
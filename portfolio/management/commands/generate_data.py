@@ -0,0 +1,46 @@
+"""
+Management command that fills the database with synthetic clients for load tests: every client gets banks, categories,
+sellers, sources of income and the requested number of Income and Expenses lines with realistic dates and amounts (more
+about the data in benchmarking.py). The lines are inserted with bulk_create() in batches, then the bank balances, their
+journal, the monthly rollups and the search documents are built once for every client. Unlike the benchmark commands,
+the data is kept. The same seed always gives the same data. Usage:
+
+    python manage.py generate_data --users 5 --lines 1000000
+    python manage.py generate_data --prefix load --password secret-password    # the clients can log in
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from portfolio.benchmarking import complete_seeded_data, seed_user_data
+
+
+class Command(BaseCommand):
+    help = 'Generates synthetic clients with banks, categories, sellers, sources and Income and Expenses lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1, help='Number of generated clients')
+        parser.add_argument('--lines', type=int, default=100000, help='Number of lines of every client')
+        parser.add_argument('--banks', type=int, default=3, help='Number of banks of every client')
+        parser.add_argument('--categories', type=int, default=8, help='Number of categories of every type')
+        parser.add_argument('--parties', type=int, default=20, help='Number of sellers and of sources of income')
+        parser.add_argument('--years', type=int, default=5, help='The lines are dated within the last years')
+        parser.add_argument('--prefix', default='synthetic', help='Usernames are <prefix>_<number>')
+        parser.add_argument('--password', help='Password of the clients, without it they cannot log in')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the first client, the next ones get +1')
+
+    def handle(self, *args, **options):
+        usernames = [f"{options['prefix']}_{number}" for number in range(options['users'])]
+        existing = User.objects.filter(username__in=usernames).values_list('username', flat=True)
+        if existing:
+            raise CommandError(f"Users {', '.join(existing)} already exist, choose another --prefix.")
+        for number, username in enumerate(usernames):
+            with transaction.atomic():  # one transaction for every client, much faster on SQLite
+                user = seed_user_data(username, lines=options['lines'], banks=options['banks'],
+                                      categories=options['categories'], parties=options['parties'],
+                                      years=options['years'], seed=options['seed'] + number)
+                if options['password']:
+                    user.set_password(options['password'])
+                    user.save(update_fields=['password'])
+                complete_seeded_data(user)
+            self.stdout.write(f'{username}: {options["lines"]} lines')
+        self.stdout.write(self.style.SUCCESS(f'{len(usernames)} clients were generated.'))
@@ -0,0 +1,42 @@
+"""
+Management command that imports the Income and Expenses lines of a bank statement (a CSV or OFX file) for a user, more
+about the formats in importers.py. The file is read row by row and saved in batches, so large statements can be imported
+without loading them into memory. Usage:
+
+    python manage.py import_statement statement.csv --user Mantas86 --bank Swedbank
+    python manage.py import_statement statement.ofx --user Mantas86 --batch-size 5000
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from portfolio.importers import StatementError, guess_format, import_statement
+from portfolio.models import Bank
+
+
+class Command(BaseCommand):
+    help = 'Imports the Income and Expenses lines of a CSV or OFX bank statement.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the statement file')
+        parser.add_argument('--user', required=True, help='Username whose lines are imported')
+        parser.add_argument('--format', choices=['csv', 'ofx'], help='Format of the file, by its extension by default')
+        parser.add_argument('--bank', help='Name of the bank for the lines without a bank, created if missing')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of lines saved in one transaction')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+        bank = None
+        if options['bank']:
+            bank = Bank.objects.filter(owner=user, name__iexact=options['bank']).first() or \
+                Bank.objects.create(owner=user, name=options['bank'])
+        file_format = options['format'] or guess_format(options['path'])
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                importer = import_statement(user, stream, file_format, bank, options['batch_size'])
+        except (OSError, StatementError) as error:
+            raise CommandError(str(error))
+        for number, error in importer.errors:
+            self.stderr.write(f'Row {number}: {error}')
+        self.stdout.write(self.style.SUCCESS(importer.summary()))
@@ -0,0 +1,35 @@
+"""
+Management command that makes the missing pre-sized copies of the profile photos (more about them in thumbnails.py),
+e.g. for the profiles created before the copies were introduced. The photos are processed one by one in this process.
+Usage:
+
+    python manage.py process_profile_photos
+    python manage.py process_profile_photos --user Mantas86
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+from portfolio.models import Profile
+from portfolio.thumbnails import process_photo
+
+
+class Command(BaseCommand):
+    help = 'Makes the missing pre-sized copies of the profile photos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose photo is processed, all users by default')
+
+    def handle(self, *args, **options):
+        profiles = Profile.objects.exclude(photo_processed=F('photo')).order_by('id')
+        if options['user']:
+            profiles = profiles.filter(user__username=options['user'])
+            if not Profile.objects.filter(user__username=options['user']).exists():
+                raise CommandError(f"User {options['user']} does not exist.")
+        processed = made = 0
+        for profile_id in profiles.values_list('id', flat=True):
+            try:
+                made += process_photo(profile_id)
+            except OSError as error:  # e.g. a missing or damaged file
+                self.stderr.write(f'Profile {profile_id}: {error}')
+            else:
+                processed += 1
+        self.stdout.write(self.style.SUCCESS(f'{processed} photos were processed, {made} copies were made.'))
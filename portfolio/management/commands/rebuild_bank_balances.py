@@ -0,0 +1,37 @@
+"""
+Management command that compares the stored balances of banks with the balances calculated from their journals (the
+latest snapshot plus the movements made after it, more about it in journal.py) and optionally writes the journal's
+balances into the banks. Usage:
+
+    python manage.py rebuild_bank_balances                      # only reports the differences, for all users
+    python manage.py rebuild_bank_balances --user Mantas86 --fix
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from portfolio.journal import rebuild_balance
+from portfolio.models import Bank
+
+
+class Command(BaseCommand):
+    help = 'Compares bank balances with their journals and optionally rebuilds the balances from the journals.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose banks are checked, all users by default')
+        parser.add_argument('--fix', action='store_true', help='Write the balances calculated from the journals')
+
+    def handle(self, *args, **options):
+        banks = Bank.objects.select_related('owner').order_by('id')
+        if options['user']:
+            try:
+                banks = banks.filter(owner=User.objects.get(username=options['user']))
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+        different = 0
+        for bank in banks:
+            balance, investment = rebuild_balance(bank, save=options['fix'])
+            if (balance, investment) != (bank.balance or 0, bank.investment or 0):
+                different += 1
+                self.stdout.write(f'{bank.owner} / {bank}: stored {bank.balance} / {bank.investment}, '
+                                  f'journal {balance} / {investment}')
+        action = 'rebuilt' if options['fix'] else 'found'
+        self.stdout.write(self.style.SUCCESS(f'{different} banks with different balances were {action}.'))
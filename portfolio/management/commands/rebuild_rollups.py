@@ -0,0 +1,28 @@
+"""
+Management command that rebuilds the MonthlyRollup table from the Income and Expenses lines, and the BreakdownRollup
+table from it. The tables are maintained by signals, the command is needed after lines were changed without signals
+(e.g. with bulk_create() or update()) or after the tables were first created. Usage:
+
+    python manage.py rebuild_rollups              # for all users
+    python manage.py rebuild_rollups --user Mantas86
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from portfolio.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the monthly and breakdown rollups of Income and Expenses lines from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose rollups are rebuilt, all users by default')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+        created = rebuild_rollups(user)
+        self.stdout.write(self.style.SUCCESS(f'{created} monthly rollup rows were created.'))
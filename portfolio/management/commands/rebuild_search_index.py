@@ -0,0 +1,28 @@
+"""
+Management command that rebuilds the search documents of Income and Expenses lines, used by the keyword search. The
+documents are maintained by signals, the command is needed after lines were changed without signals (e.g. with
+bulk_create() or update()). Usage:
+
+    python manage.py rebuild_search_index              # for all users
+    python manage.py rebuild_search_index --user Mantas86
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from portfolio.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search documents of Income and Expenses lines from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username whose lines are indexed, all users by default')
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User {options['user']} does not exist.")
+        indexed = rebuild_search_index(user)
+        self.stdout.write(self.style.SUCCESS(f'{indexed} lines were indexed.'))
@@ -0,0 +1,39 @@
+"""
+Management command that writes the p50, p95 and p99 of the recorded request metrics (latency, number of queries, time
+of the queries and duplicate queries) per URL name as JSON, more about the metrics in metrics.py. The output can be
+kept and compared with a later run to spot regressions, e.g. a view that starts to repeat its queries. Usage:
+
+    python manage.py request_metrics                               # all recorded requests, to the standard output
+    python manage.py request_metrics --days 1 --output metrics.json
+    python manage.py request_metrics --clear                       # deletes the reported requests after the report
+"""
+import json
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from portfolio.metrics import report
+from portfolio.models import RequestMetric
+
+
+class Command(BaseCommand):
+    help = 'Writes the percentiles of the recorded request metrics per URL name as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Only the requests of the last days')
+        parser.add_argument('--output', help='File of the JSON report, the standard output by default')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete the reported requests after the report (with --days those of the last days)')
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        data = json.dumps(report(since=since), indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                output.write(data + '\n')
+        else:
+            self.stdout.write(data)
+        if options['clear']:  # the same requests as in the report
+            metrics = RequestMetric.objects.all()
+            if since is not None:
+                metrics = metrics.filter(created__gte=since)
+            metrics.delete()
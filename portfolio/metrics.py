@@ -0,0 +1,136 @@
+"""
+Opt-in instrumentation of the requests. When REQUEST_METRICS is on (settings.py), RequestMetricsMiddleware measures
+every request: the latency, the number of SQL queries, their total time and the number of duplicate queries (the same
+SQL with the same parameters run again in one request, e.g. an aggregate repeated by a view). The measurements are:
+- sent back in the Server-Timing header of the response, so they are visible in the network tab of the browser;
+- kept in memory and written to the RequestMetric table in batches of REQUEST_METRICS_BATCH rows with one
+  bulk_create(). The batch is written when the server closes a finished request (the request_finished signal), after
+  the response has been sent, so the write neither delays the response nor is counted in the measurements;
+- summarized per URL name (p50, p95 and p99 of every measurement) by report(), shown to staff on the request metrics
+  page (views_metrics.py) and written as JSON by 'python manage.py request_metrics'.
+
+The rows kept in memory by other processes (less than one batch per process) are not in the reports until written,
+at the latest when the process exits (if the database can still be reached then).
+"""
+import atexit
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import request_finished
+from django.db import DatabaseError, connections
+from .models import RequestMetric
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENTS = ('latency', 'queries', 'sql_time', 'duplicates')
+PERCENTILES = (50, 95, 99)
+
+_pending = []  # measured requests of this process, not written yet
+_lock = threading.Lock()
+
+
+class QueryRecorder:  # execute wrapper of the database connections, counts and times the queries of one request
+    def __init__(self):
+        self.queries = 0
+        self.duplicates = 0
+        self.sql_time = 0.0  # seconds
+        self.seen = set()
+
+    def __call__(self, execute, sql, params, many, context):
+        key = (sql, repr(params))
+        if key in self.seen:
+            self.duplicates += 1
+        self.seen.add(key)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed  # Django leaves the middleware out of the chain
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        latency = (time.perf_counter() - start) * 1000
+        sql_time = recorder.sql_time * 1000
+        response['Server-Timing'] = (f'app;dur={latency:.1f}, db;dur={sql_time:.1f};'
+                                     f'desc="{recorder.queries} queries, {recorder.duplicates} duplicates"')
+        match = request.resolver_match
+        record(RequestMetric(url_name=match.view_name if match else '(unresolved)', status=response.status_code,
+                             latency=latency, queries=recorder.queries, sql_time=sql_time,
+                             duplicates=recorder.duplicates))
+        return response
+
+
+def record(metric):
+    with _lock:
+        _pending.append(metric)
+
+
+def flush():  # writes the measured requests of this process to the database
+    with _lock:
+        metrics = _pending[:]
+        del _pending[:]
+    if metrics:
+        RequestMetric.objects.bulk_create(metrics)
+
+
+def _flush_full_batch(**kwargs):  # after the response of a request has been sent
+    if len(_pending) >= settings.REQUEST_METRICS_BATCH:
+        flush()
+
+
+def _flush_at_exit():  # the last, incomplete batch of the process
+    count = len(_pending)
+    try:
+        flush()
+    except DatabaseError:  # e.g. the database has already been shut down, the measurements are lost
+        logger.warning('The measurements of %s requests could not be written.', count)
+
+
+request_finished.connect(_flush_full_batch)
+atexit.register(_flush_at_exit)
+
+
+def percentile(values, percent):  # nearest-rank percentile of sorted values
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def summarize(rows):
+    # rows - (url_name, latency, queries, sql_time, duplicates), the URL names are sorted by p95 of the latency
+    columns = defaultdict(lambda: [[] for _ in MEASUREMENTS])
+    for url_name, *values in rows:
+        for column, value in zip(columns[url_name], values):
+            column.append(value)
+    summary = {}
+    for url_name, values in columns.items():
+        summary[url_name] = {'requests': len(values[0])}
+        for measurement, column in zip(MEASUREMENTS, values):
+            column.sort()
+            summary[url_name][measurement] = {f'p{percent}': round(percentile(column, percent), 2)
+                                              for percent in PERCENTILES}
+    return dict(sorted(summary.items(), key=lambda item: -item[1]['latency']['p95']))
+
+
+def report(since=None):  # summary of the requests recorded after 'since' (all if None)
+    flush()
+    metrics = RequestMetric.objects.all()
+    if since is not None:
+        metrics = metrics.filter(created__gte=since)
+    return summarize(metrics.values_list('url_name', *MEASUREMENTS).iterator())
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0009_alter_expenses_date_alter_income_date'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expenses',
+            index=models.Index(fields=['client', '-date', 'amount'], name='expenses_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenses',
+            index=models.Index(fields=['client', 'category', 'date', 'amount'], name='expenses_client_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenses',
+            index=models.Index(fields=['client', 'bank', 'date', 'amount'], name='expenses_client_bank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expenses',
+            index=models.Index(fields=['client', 'seller', 'date', 'amount'], name='expenses_client_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['client', '-date', 'amount'], name='income_client_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['client', 'category', 'date', 'amount'], name='income_client_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['client', 'bank', 'date', 'amount'], name='income_client_bank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['client', 'source', 'date', 'amount'], name='income_client_source_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Sum, Max, Min
+from django.db.models.functions import TruncMonth
+
+
+def fill_rollups(apps, schema_editor):  # existing lines are rolled up once, later the signals keep the table updated
+    MonthlyRollup = apps.get_model('portfolio', 'MonthlyRollup')
+    dimensions = [
+        ('Income', 'income', {'category': 'income_category', 'source': 'income_source', 'bank': 'bank'}),
+        ('Expenses', 'expenses', {'category': 'expenses_category', 'seller': 'seller', 'bank': 'bank'}),
+    ]
+    for model_name, kind, fields in dimensions:
+        lines = apps.get_model('portfolio', model_name).objects.filter(client__isnull=False, date__isnull=False)
+        grouped = lines.annotate(month=TruncMonth('date')).values('client', 'month', *fields).annotate(
+            count=Count('id'), total=Sum('amount'), min_amount=Min('amount'), max_amount=Max('amount')).order_by()
+        MonthlyRollup.objects.bulk_create([MonthlyRollup(
+            client_id=row['client'], kind=kind, month=row['month'], count=row['count'], total=row['total'],
+            min_amount=row['min_amount'], max_amount=row['max_amount'],
+            **{f'{fields[field]}_id': row[field] for field in fields}) for row in grouped], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0010_income_expenses_client_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('income', 'Income'), ('expenses', 'Expenses')], max_length=8, verbose_name='Type of lines')),
+                ('month', models.DateField(verbose_name='Month')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Number of lines')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total amount')),
+                ('min_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Min. amount')),
+                ('max_amount', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Max. amount')),
+                ('bank', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.bank', verbose_name='Bank')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Client')),
+                ('expenses_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.expensescategory', verbose_name='Expenses category')),
+                ('income_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.incomecategory', verbose_name='Income category')),
+                ('income_source', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.incomesource', verbose_name='Income source')),
+                ('seller', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.seller', verbose_name='Company or seller')),
+            ],
+            options={
+                'verbose_name': 'Monthly rollup',
+                'verbose_name_plural': 'Monthly rollups',
+                'ordering': ['month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='monthlyrollup',
+            index=models.Index(fields=['client', 'kind', 'month'], name='rollup_client_kind_month_idx'),
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def open_journals(apps, schema_editor):  # the current balances of existing banks are the opening movements and snapshots
+    Bank = apps.get_model('portfolio', 'Bank')
+    BankMovement = apps.get_model('portfolio', 'BankMovement')
+    BankSnapshot = apps.get_model('portfolio', 'BankSnapshot')
+    now = django.utils.timezone.now()
+    for bank in Bank.objects.all():
+        movement = BankMovement.objects.create(bank=bank, created=now, reason='opening',
+                                               balance_delta=bank.balance or 0, investment_delta=bank.investment or 0)
+        BankSnapshot.objects.create(bank=bank, movement=movement, created=now, balance=bank.balance or 0,
+                                    investment=bank.investment or 0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0011_monthlyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Time of movement')),
+                ('reason', models.CharField(choices=[('opening', 'Opening balance'), ('income', 'Income'), ('expenses', 'Expenses'), ('transfer', 'Transfer between banks'), ('inside', 'Transfer inside bank'), ('adjustment', 'Adjustment')], max_length=10, verbose_name='Reason')),
+                ('balance_delta', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Change of account balance')),
+                ('investment_delta', models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Change of investment balance')),
+            ],
+            options={
+                'verbose_name': 'Bank movement',
+                'verbose_name_plural': 'Bank movements',
+                'ordering': ['created', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bank',
+            name='movements_since_snapshot',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='BankSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(verbose_name='Time of snapshot')),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Account balance')),
+                ('investment', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Investment balance')),
+                ('bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='portfolio.bank', verbose_name='Bank')),
+                ('movement', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='portfolio.bankmovement', verbose_name='Last included movement')),
+            ],
+            options={
+                'verbose_name': 'Bank snapshot',
+                'verbose_name_plural': 'Bank snapshots',
+                'ordering': ['created', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='bankmovement',
+            name='bank',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='portfolio.bank', verbose_name='Bank'),
+        ),
+        migrations.AddIndex(
+            model_name='banksnapshot',
+            index=models.Index(fields=['bank', 'created'], name='snapshot_bank_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bankmovement',
+            index=models.Index(fields=['bank', 'created'], name='movement_bank_created_idx'),
+        ),
+        migrations.RunPython(open_journals, migrations.RunPython.noop),
+    ]
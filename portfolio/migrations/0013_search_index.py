@@ -0,0 +1,93 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import portfolio.models
+
+SQLITE_INDEX = [  # FTS5 table over the search documents and the triggers which copy every change of a document into it
+    "CREATE VIRTUAL TABLE portfolio_searchindex USING fts5(body, id UNINDEXED, content='portfolio_searchdocument', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER portfolio_searchdocument_ai AFTER INSERT ON portfolio_searchdocument BEGIN "
+    "INSERT INTO portfolio_searchindex(rowid, body, id) VALUES (new.id, new.body, new.id); END",
+    "CREATE TRIGGER portfolio_searchdocument_ad AFTER DELETE ON portfolio_searchdocument BEGIN "
+    "INSERT INTO portfolio_searchindex(portfolio_searchindex, rowid, body, id) "
+    "VALUES ('delete', old.id, old.body, old.id); END",
+    "CREATE TRIGGER portfolio_searchdocument_au AFTER UPDATE ON portfolio_searchdocument BEGIN "
+    "INSERT INTO portfolio_searchindex(portfolio_searchindex, rowid, body, id) "
+    "VALUES ('delete', old.id, old.body, old.id); "
+    "INSERT INTO portfolio_searchindex(rowid, body, id) VALUES (new.id, new.body, new.id); END",
+]
+SQLITE_DROP = ['DROP TRIGGER portfolio_searchdocument_ai', 'DROP TRIGGER portfolio_searchdocument_ad',
+               'DROP TRIGGER portfolio_searchdocument_au', 'DROP TABLE portfolio_searchindex']
+
+
+def postgres_index():
+    from django.contrib.postgres.indexes import GinIndex  # requires psycopg2, imported only on PostgreSQL
+    from django.contrib.postgres.search import SearchVector
+    return GinIndex(SearchVector('body', config='simple'), name='searchdocument_body_gin')
+
+
+def create_search_index(apps, schema_editor):
+    SearchDocument = apps.get_model('portfolio', 'SearchDocument')
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_INDEX:
+            schema_editor.execute(statement)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(SearchDocument, postgres_index())
+    # existing lines are indexed once, later the signals keep the documents updated
+    lines = [
+        ('Income', 'income', ('category__definition', 'source__source', 'bank__name', 'amount', 'notes')),
+        ('Expenses', 'expenses', ('category__definition', 'seller__seller', 'bank__name', 'amount', 'notes')),
+    ]
+    for model_name, field, text_fields in lines:
+        rows = apps.get_model('portfolio', model_name).objects.values_list('pk', 'client_id', *text_fields)
+        SearchDocument.objects.bulk_create([SearchDocument(
+            client_id=row[1], body=' '.join(str(value) for value in row[2:] if value not in (None, '')),
+            **{f'{field}_id': row[0]}) for row in rows.iterator()], batch_size=1000)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_DROP:
+            schema_editor.execute(statement)
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('portfolio', 'SearchDocument'), postgres_index())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0012_bank_journal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('body', models.TextField(blank=True, verbose_name='Searchable text')),
+                ('client', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Client')),
+                ('expenses', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='portfolio.expenses', verbose_name='Line of expenses')),
+                ('income', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='portfolio.income', verbose_name='Line of income')),
+            ],
+            options={
+                'verbose_name': 'Search document',
+                'verbose_name_plural': 'Search documents',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchIndex',
+            fields=[
+                ('document', models.OneToOneField(db_column='id', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='index', serialize=False, to='portfolio.searchdocument')),
+                ('body', portfolio.models.FullTextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'portfolio_searchindex',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
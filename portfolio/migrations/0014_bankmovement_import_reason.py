@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0013_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bankmovement',
+            name='reason',
+            field=models.CharField(choices=[('opening', 'Opening balance'), ('income', 'Income'), ('expenses', 'Expenses'), ('transfer', 'Transfer between banks'), ('inside', 'Transfer inside bank'), ('adjustment', 'Adjustment'), ('import', 'Statement import')], max_length=10, verbose_name='Reason'),
+        ),
+    ]
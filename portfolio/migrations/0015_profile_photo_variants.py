@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0014_bankmovement_import_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='photo_digest',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='photo_processed',
+            field=models.CharField(blank=True, editable=False, max_length=100),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-18 04:55
+
+from django.db import migrations, models
+import portfolio.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0015_profile_photo_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('size', models.PositiveBigIntegerField(default=0)),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Stored file',
+                'verbose_name_plural': 'Stored files',
+            },
+        ),
+        migrations.AlterField(
+            model_name='expenses',
+            name='pdf',
+            field=models.FileField(blank=True, null=True, storage=portfolio.storage.ContentAddressedStorage(), upload_to='expenses_pdfs', verbose_name='PDF document'),
+        ),
+        migrations.AlterField(
+            model_name='income',
+            name='pdf',
+            field=models.FileField(blank=True, null=True, storage=portfolio.storage.ContentAddressedStorage(), upload_to='income_pdfs', verbose_name='PDF document'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0016_stored_blobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url_name', models.CharField(max_length=200, verbose_name='URL name')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('status', models.PositiveSmallIntegerField(verbose_name='Status code')),
+                ('latency', models.FloatField(verbose_name='Latency (ms)')),
+                ('queries', models.PositiveIntegerField(verbose_name='Number of queries')),
+                ('sql_time', models.FloatField(verbose_name='Time of the queries (ms)')),
+                ('duplicates', models.PositiveIntegerField(verbose_name='Duplicate queries')),
+            ],
+            options={
+                'verbose_name': 'Request metric',
+                'verbose_name_plural': 'Request metrics',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='requestmetric',
+            index=models.Index(fields=['created'], name='requestmetric_created_idx'),
+        ),
+    ]
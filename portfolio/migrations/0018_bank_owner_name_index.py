@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0017_request_metrics'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bank',
+            index=models.Index(fields=['owner', 'name'], name='bank_owner_name_idx'),
+        ),
+    ]
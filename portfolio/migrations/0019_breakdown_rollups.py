@@ -0,0 +1,41 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:27
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('portfolio', '0018_bank_owner_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BreakdownRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('income', 'Income'), ('expenses', 'Expenses')], max_length=8, verbose_name='Type of lines')),
+                ('dimension', models.CharField(choices=[('category', 'Category'), ('source', 'Source of income'), ('seller', 'Seller')], max_length=8, verbose_name='Grouped by')),
+                ('month', models.DateField(verbose_name='Month')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Number of lines')),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Total amount')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Client')),
+                ('expenses_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.expensescategory', verbose_name='Expenses category')),
+                ('income_category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.incomecategory', verbose_name='Income category')),
+                ('income_source', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.incomesource', verbose_name='Income source')),
+                ('seller', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='portfolio.seller', verbose_name='Company or seller')),
+            ],
+            options={
+                'verbose_name': 'Breakdown rollup',
+                'verbose_name_plural': 'Breakdown rollups',
+                'ordering': ['month'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='breakdownrollup',
+            index=models.Index(fields=['client', 'kind', 'dimension', 'month'], name='breakdown_client_month_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0019_breakdown_rollups'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bankmovement',
+            index=models.Index(fields=['bank', 'reason', 'created'], name='movement_bank_reason_idx'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 4.1.7 on 2026-10-18 05:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db.models import Count, Sum, Max, Min
+
+
+def merge_duplicate_rows(apps, schema_editor):  # rows of the same bucket, left by deleted objects, are summed up
+    objects = ['income_category', 'income_source', 'expenses_category', 'seller']
+    tables = [
+        ('MonthlyRollup', ['client', 'kind', 'month', *objects, 'bank'],
+         {'count': Sum('count'), 'total': Sum('total'), 'min_amount': Min('min_amount'),
+          'max_amount': Max('max_amount')}),
+        ('BreakdownRollup', ['client', 'kind', 'dimension', 'month', *objects],
+         {'count': Sum('count'), 'total': Sum('total')}),
+    ]
+    for model_name, key, sums in tables:
+        model = apps.get_model('portfolio', model_name)
+        duplicates = model.objects.values(*key).annotate(rows=Count('id'), **sums).filter(rows__gt=1).order_by()
+        for row in list(duplicates):
+            bucket = {field: row[field] for field in key}
+            model.objects.filter(**bucket).delete()
+            values = {field if field in ('kind', 'dimension', 'month') else f'{field}_id': value
+                      for field, value in bucket.items()}  # the foreign keys are set by their ids
+            model.objects.create(**values, **{field: row[field] for field in sums})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0020_bank_movement_reason_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='breakdownrollup',
+            name='expenses_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.expensescategory', verbose_name='Expenses category'),
+        ),
+        migrations.AlterField(
+            model_name='breakdownrollup',
+            name='income_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.incomecategory', verbose_name='Income category'),
+        ),
+        migrations.AlterField(
+            model_name='breakdownrollup',
+            name='income_source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.incomesource', verbose_name='Income source'),
+        ),
+        migrations.AlterField(
+            model_name='breakdownrollup',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.seller', verbose_name='Company or seller'),
+        ),
+        migrations.AlterField(
+            model_name='monthlyrollup',
+            name='bank',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.bank', verbose_name='Bank'),
+        ),
+        migrations.AlterField(
+            model_name='monthlyrollup',
+            name='expenses_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.expensescategory', verbose_name='Expenses category'),
+        ),
+        migrations.AlterField(
+            model_name='monthlyrollup',
+            name='income_category',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.incomecategory', verbose_name='Income category'),
+        ),
+        migrations.AlterField(
+            model_name='monthlyrollup',
+            name='income_source',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.incomesource', verbose_name='Income source'),
+        ),
+        migrations.AlterField(
+            model_name='monthlyrollup',
+            name='seller',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.seller', verbose_name='Company or seller'),
+        ),
+        migrations.RunPython(merge_duplicate_rows, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='breakdownrollup',
+            constraint=models.UniqueConstraint(models.F('client'), models.F('kind'), models.F('dimension'), models.F('month'), django.db.models.functions.comparison.Coalesce('income_category', models.Value(0)), django.db.models.functions.comparison.Coalesce('income_source', models.Value(0)), django.db.models.functions.comparison.Coalesce('expenses_category', models.Value(0)), django.db.models.functions.comparison.Coalesce('seller', models.Value(0)), name='breakdown_row_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='monthlyrollup',
+            constraint=models.UniqueConstraint(models.F('client'), models.F('kind'), models.F('month'), django.db.models.functions.comparison.Coalesce('income_category', models.Value(0)), django.db.models.functions.comparison.Coalesce('income_source', models.Value(0)), django.db.models.functions.comparison.Coalesce('expenses_category', models.Value(0)), django.db.models.functions.comparison.Coalesce('seller', models.Value(0)), django.db.models.functions.comparison.Coalesce('bank', models.Value(0)), name='rollup_bucket_unique'),
+        ),
+    ]
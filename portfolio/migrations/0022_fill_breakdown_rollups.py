@@ -0,0 +1,34 @@
+# Generated by Django 4.1.7 on 2026-10-18 07:10
+
+from django.db import migrations
+from django.db.models import Sum
+
+
+def fill_breakdowns(apps, schema_editor):
+    # The breakdown rows of the months rolled up before 0019 are summed up from their MonthlyRollup rows once, later the
+    # signals keep the table updated. The rows written since 0019 are replaced, so the table is filled the same way.
+    MonthlyRollup = apps.get_model('portfolio', 'MonthlyRollup')
+    BreakdownRollup = apps.get_model('portfolio', 'BreakdownRollup')
+    dimensions = [
+        ('income', {'category': 'income_category', 'source': 'income_source'}),
+        ('expenses', {'category': 'expenses_category', 'seller': 'seller'}),
+    ]
+    BreakdownRollup.objects.all().delete()
+    for kind, fields in dimensions:
+        for dimension, field in fields.items():
+            grouped = MonthlyRollup.objects.filter(kind=kind).values('client', 'month', field).annotate(
+                count=Sum('count'), total=Sum('total')).order_by()
+            BreakdownRollup.objects.bulk_create([BreakdownRollup(
+                client_id=row['client'], kind=kind, dimension=dimension, month=row['month'], count=row['count'],
+                total=row['total'], **{f'{field}_id': row[field]}) for row in grouped], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0021_rollup_bucket_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_breakdowns, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.1.7 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+def mark_journal_starts(apps, schema_editor):
+    # The opening movements written by 0012 for the banks which existed before the journal (the only ones with a
+    # snapshot of the same movement) hold the balances of the lines saved before, unlike the openings of new banks
+    BankMovement = apps.get_model('portfolio', 'BankMovement')
+    BankMovement.objects.filter(reason='opening', snapshot__isnull=False).update(reason='journal')
+
+
+def unmark_journal_starts(apps, schema_editor):
+    BankMovement = apps.get_model('portfolio', 'BankMovement')
+    BankMovement.objects.filter(reason='journal').update(reason='opening')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0022_fill_breakdown_rollups'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bankmovement',
+            name='reason',
+            field=models.CharField(choices=[('opening', 'Opening balance'), ('income', 'Income'), ('expenses', 'Expenses'), ('transfer', 'Transfer between banks'), ('inside', 'Transfer inside bank'), ('adjustment', 'Adjustment'), ('import', 'Statement import'), ('journal', 'Balance when the journal was started')], max_length=10, verbose_name='Reason'),
+        ),
+        migrations.RunPython(mark_journal_starts, unmark_journal_starts),
+    ]
@@ -9,31 +9,53 @@ about this in the signals.py file.
 """
 
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
-from PIL import Image
 from django.core.validators import MinValueValidator
+from django.utils import timezone
 from .custom_functions import present_or_past_date
+from .storage import pdf_storage
 
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)  # Profile object will be deleted along with User object
     photo = models.ImageField(default="profile_pics/default.png", upload_to="profile_pics")
+    # The pre-sized copies of the photo are made in the background (more about it in thumbnails.py), these fields tell
+    # from which photo file they were made and the SHA-256 digest of its content, which is a part of their paths
+    photo_processed = models.CharField(max_length=100, blank=True, editable=False)
+    photo_digest = models.CharField(max_length=64, blank=True, editable=False)
+
+    PHOTO_SIZES = (40, 200, 300)  # the longer side of the pre-sized copies in pixels
 
     def __str__(self):
         return f"{self.user} profile"
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)  # calls the parent class's 'save' method to save the instance to the database
-        # Resizing the profile picture if it is larger than 300x300 pixels
-        img = Image.open(self.photo.path)  # function from the Pillow library opens the image
-        if img.height > 300 or img.width > 300:  # conditions and parameters
-            output_size = (300, 300)
-            img.thumbnail(output_size)  # if so, resizes the image using thumbnail() function from the Pillow library
-            img.save(self.photo.path)  # saves the resized image to the same path using function from the Pillow
+    def photo_variant_name(self, size):  # e.g. 'profile_pics/sized/3f/3f9c...e1_200.jpg'
+        extension = 'png' if self.photo_processed.lower().endswith(('.png', '.gif', '.webp')) else 'jpg'
+        return f"profile_pics/sized/{self.photo_digest[:2]}/{self.photo_digest}_{size}.{extension}"
+
+    def photo_variant_url(self, size):  # the original photo is shown until its copies are made
+        if self.photo_digest and self.photo_processed == self.photo.name:
+            return self.photo.storage.url(self.photo_variant_name(size))
+        return self.photo.url
+
+    @property
+    def photo_40_url(self):
+        return self.photo_variant_url(40)
+
+    @property
+    def photo_200_url(self):
+        return self.photo_variant_url(200)
+
+    @property
+    def photo_300_url(self):
+        return self.photo_variant_url(300)
 
 
 """ This model represents a user profile and contains a one-to-one relationship with the built-in User model provided by 
-Django. It also includes an image field for the user's profile picture. """
+Django. It also includes an image field for the user's profile picture and the pre-sized copies of the picture, which
+are shown on the pages instead of the uploaded picture. """
 
 
 class Bank(models.Model):
@@ -45,6 +67,8 @@ class Bank(models.Model):
                                   validators=[MinValueValidator(0)])  # Validation against entering a negative amount
     investment = models.DecimalField('Investment balance', max_digits=10, decimal_places=2, default=0, null=True,
                                      validators=[MinValueValidator(0)])  # Validation against entering a negative amount
+    # Number of journal movements since the last BankSnapshot, maintained by the journal (more about it in journal.py)
+    movements_since_snapshot = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
@@ -53,6 +77,8 @@ class Bank(models.Model):
         verbose_name = 'Bank'
         verbose_name_plural = 'Banks'
         ordering = ['name']
+        # The banks of a user are listed and looked up by name (e.g. by the statement import)
+        indexes = [models.Index(fields=['owner', 'name'], name='bank_owner_name_idx')]
 
 
 """ This model represents a bank accounts and includes information about the checking account balance and investment 
@@ -131,6 +157,17 @@ class Seller(models.Model):
 relationship with the built-in User model. """
 
 
+class LineQuerySet(models.QuerySet):
+    # The list and search pages show the category, source (or seller) and bank of every line and the client's profile
+    # photo, so these foreign keys are joined in the same query instead of one extra query per line and field
+    def with_related(self):
+        return self.select_related('category', 'source' if self.model is Income else 'seller', 'bank',
+                                   'client__profile')
+
+
+""" The query set is used as the manager of Income and Expenses models (Income.objects, Expenses.objects). """
+
+
 class Income(models.Model):
     client = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, verbose_name='Client')
     input_date = models.DateTimeField('Date of data input', auto_now_add=True, null=True, blank=True)  # auto-input date
@@ -144,7 +181,10 @@ class Income(models.Model):
                                verbose_name='Income source')
     bank = models.ForeignKey('Bank', on_delete=models.SET_NULL, null=True, blank=False, verbose_name='Income bank')
     notes = models.TextField('Client notes', max_length=2000, default='There are no additional notes', blank=True)
-    pdf = models.FileField(upload_to='income_pdfs', null=True, blank=True, verbose_name='PDF document')
+    pdf = models.FileField(upload_to='income_pdfs', storage=pdf_storage, null=True, blank=True,
+                           verbose_name='PDF document')  # stored once per content, see storage.py
+
+    objects = LineQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.category} - {self.source}: {self.bank}'
@@ -153,6 +193,14 @@ class Income(models.Model):
         verbose_name = "Line of income"
         verbose_name_plural = 'Lines of income'
         ordering = ['-date']
+        # Composite indexes for the list, search and archive views, which always filter by client and sort or range
+        # on date. Amount is the trailing column, so the Sum/Avg/Max/Min statistics can be read from the index alone
+        indexes = [
+            models.Index(fields=['client', '-date', 'amount'], name='income_client_date_idx'),
+            models.Index(fields=['client', 'category', 'date', 'amount'], name='income_client_category_idx'),
+            models.Index(fields=['client', 'bank', 'date', 'amount'], name='income_client_bank_idx'),
+            models.Index(fields=['client', 'source', 'date', 'amount'], name='income_client_source_idx'),
+        ]
 
 
 """ This model represents a single instance of Income and includes information about: the date when the income line was 
@@ -175,7 +223,10 @@ class Expenses(models.Model):
                                verbose_name='Company or seller')
     bank = models.ForeignKey('Bank', on_delete=models.SET_NULL, null=True, blank=False, verbose_name='Expenses bank')
     notes = models.TextField('Client notes', max_length=2000, default='There are no additional notes', blank=True)
-    pdf = models.FileField(upload_to='expenses_pdfs', null=True, blank=True, verbose_name='PDF document')
+    pdf = models.FileField(upload_to='expenses_pdfs', storage=pdf_storage, null=True, blank=True,
+                           verbose_name='PDF document')  # stored once per content, see storage.py
+
+    objects = LineQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.category} - {self.seller}: {self.bank}'
@@ -184,6 +235,13 @@ class Expenses(models.Model):
         verbose_name = 'Line of expenses'
         verbose_name_plural = 'Lines of expenses'
         ordering = ['-date']
+        # The same composite indexes as for the Income model, seller takes the place of the source of income
+        indexes = [
+            models.Index(fields=['client', '-date', 'amount'], name='expenses_client_date_idx'),
+            models.Index(fields=['client', 'category', 'date', 'amount'], name='expenses_client_category_idx'),
+            models.Index(fields=['client', 'bank', 'date', 'amount'], name='expenses_client_bank_idx'),
+            models.Index(fields=['client', 'seller', 'date', 'amount'], name='expenses_client_seller_idx'),
+        ]
 
 
 """ This model represents a single instance of Expenses and includes information about: the date when the expenses line 
@@ -191,3 +249,254 @@ was created; the date of expenses were made; amount, category, seller, and bank
 also includes a text field for any notes and a file field for attaching a PDF document. Category, seller, and bank 
 variables are based on ForeignKey relationships with corresponding models. The expenses lines will be listed in order 
 of date of receipt, starting with the most recent occurrence. """
+
+
+class StoredBlob(models.Model):
+    name = models.CharField(max_length=100, unique=True)  # path of the file in the storage, made of its digest
+    size = models.PositiveBigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)  # number of Income and Expenses lines pointing to the file
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.name} ({self.references})'
+
+    class Meta:
+        verbose_name = 'Stored file'
+        verbose_name_plural = 'Stored files'
+
+
+""" This model counts the lines which point to every PDF document stored in the content-addressed storage (storage.py).
+The file is deleted together with its row when the count drops to zero, more about it in blobs.py. """
+
+
+class MonthlyRollup(models.Model):
+    INCOME = 'income'
+    EXPENSES = 'expenses'
+    KIND_CHOICES = [(INCOME, 'Income'), (EXPENSES, 'Expenses')]
+
+    client = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Client')
+    kind = models.CharField('Type of lines', max_length=8, choices=KIND_CHOICES)
+    month = models.DateField('Month')  # the first day of the month
+    income_category = models.ForeignKey('IncomeCategory', on_delete=models.CASCADE, null=True, blank=True,
+                                        related_name='+', verbose_name='Income category')
+    income_source = models.ForeignKey('IncomeSource', on_delete=models.CASCADE, null=True, blank=True,
+                                      related_name='+', verbose_name='Income source')
+    expenses_category = models.ForeignKey('ExpensesCategory', on_delete=models.CASCADE, null=True, blank=True,
+                                          related_name='+', verbose_name='Expenses category')
+    seller = models.ForeignKey('Seller', on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                               verbose_name='Company or seller')
+    bank = models.ForeignKey('Bank', on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                             verbose_name='Bank')
+    count = models.PositiveIntegerField('Number of lines', default=0)
+    total = models.DecimalField('Total amount', max_digits=14, decimal_places=2, default=0)
+    min_amount = models.DecimalField('Min. amount', max_digits=10, decimal_places=2, default=0)
+    max_amount = models.DecimalField('Max. amount', max_digits=10, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f'{self.client} {self.kind} {self.month:%Y-%m}: {self.total}'
+
+    class Meta:
+        verbose_name = 'Monthly rollup'
+        verbose_name_plural = 'Monthly rollups'
+        ordering = ['month']
+        indexes = [models.Index(fields=['client', 'kind', 'month'], name='rollup_client_kind_month_idx')]
+        # One row per bucket, also for the lines without a category, source, seller or bank (null is counted as 0)
+        constraints = [models.UniqueConstraint(
+            'client', 'kind', 'month', *(Coalesce(field, Value(0)) for field in (
+                'income_category', 'income_source', 'expenses_category', 'seller', 'bank')),
+            name='rollup_bucket_unique')]
+
+
+""" This model holds precomputed monthly statistics of Income and Expenses lines, one row for every combination of 
+client, month, category, source (or seller) and bank. The rows are maintained by signals when lines are created, updated
+or deleted (more about this in the rollups.py file) and are used by the archival reports, so a report for many years 
+reads only a few rows per month instead of every line. The rows of deleted categories, sources, sellers and banks are
+deleted with them and their months are recalculated, so the lines merge into the rows of the lines without them. """
+
+
+class BreakdownRollup(models.Model):
+    CATEGORY = 'category'
+    SOURCE = 'source'
+    SELLER = 'seller'
+    DIMENSION_CHOICES = [(CATEGORY, 'Category'), (SOURCE, 'Source of income'), (SELLER, 'Seller')]
+
+    client = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Client')
+    kind = models.CharField('Type of lines', max_length=8, choices=MonthlyRollup.KIND_CHOICES)
+    dimension = models.CharField('Grouped by', max_length=8, choices=DIMENSION_CHOICES)
+    month = models.DateField('Month')  # the first day of the month
+    # Only the field of the row's dimension is set, null in it means lines without a category, source or seller
+    income_category = models.ForeignKey('IncomeCategory', on_delete=models.CASCADE, null=True, blank=True,
+                                        related_name='+', verbose_name='Income category')
+    income_source = models.ForeignKey('IncomeSource', on_delete=models.CASCADE, null=True, blank=True,
+                                      related_name='+', verbose_name='Income source')
+    expenses_category = models.ForeignKey('ExpensesCategory', on_delete=models.CASCADE, null=True, blank=True,
+                                          related_name='+', verbose_name='Expenses category')
+    seller = models.ForeignKey('Seller', on_delete=models.CASCADE, null=True, blank=True, related_name='+',
+                               verbose_name='Company or seller')
+    count = models.PositiveIntegerField('Number of lines', default=0)
+    total = models.DecimalField('Total amount', max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f'{self.client} {self.kind} by {self.dimension} {self.month:%Y-%m}: {self.total}'
+
+    class Meta:
+        verbose_name = 'Breakdown rollup'
+        verbose_name_plural = 'Breakdown rollups'
+        ordering = ['month']
+        indexes = [models.Index(fields=['client', 'kind', 'dimension', 'month'], name='breakdown_client_month_idx')]
+        constraints = [models.UniqueConstraint(
+            'client', 'kind', 'dimension', 'month', *(Coalesce(field, Value(0)) for field in (
+                'income_category', 'income_source', 'expenses_category', 'seller')),
+            name='breakdown_row_unique')]
+
+
+""" This model holds the monthly number and total of Income and Expenses lines of every category, source of income and
+seller of a client, one row per client, dimension, month and object. The rows are summed up from the MonthlyRollup rows
+of the object whenever they change (more about this in the rollups.py file) and are used by the breakdown reports, so
+the top categories, sources and sellers of many years are found in the few rows of every month instead of the lines. """
+
+
+class BankMovement(models.Model):
+    OPENING = 'opening'
+    INCOME = 'income'
+    EXPENSES = 'expenses'
+    TRANSFER = 'transfer'
+    INSIDE_TRANSFER = 'inside'
+    ADJUSTMENT = 'adjustment'
+    IMPORT = 'import'
+    JOURNAL_START = 'journal'  # balance of a bank which existed before the journal, the lines saved before included
+    REASON_CHOICES = [(OPENING, 'Opening balance'), (INCOME, 'Income'), (EXPENSES, 'Expenses'),
+                      (TRANSFER, 'Transfer between banks'), (INSIDE_TRANSFER, 'Transfer inside bank'),
+                      (ADJUSTMENT, 'Adjustment'), (IMPORT, 'Statement import'),
+                      (JOURNAL_START, 'Balance when the journal was started')]
+
+    bank = models.ForeignKey('Bank', on_delete=models.CASCADE, related_name='movements', verbose_name='Bank')
+    created = models.DateTimeField('Time of movement', default=timezone.now)
+    reason = models.CharField('Reason', max_length=10, choices=REASON_CHOICES)
+    balance_delta = models.DecimalField('Change of account balance', max_digits=12, decimal_places=2, default=0)
+    investment_delta = models.DecimalField('Change of investment balance', max_digits=12, decimal_places=2,
+                                           default=0)
+
+    def __str__(self):
+        return f'{self.bank} {self.get_reason_display()}: {self.balance_delta} / {self.investment_delta}'
+
+    def save(self, *args, **kwargs):  # the journal is append-only, existing movements can not be changed
+        if not self._state.adding:
+            raise ValueError('Bank movements can not be changed.')
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError('Bank movements can not be deleted.')
+
+    class Meta:
+        verbose_name = 'Bank movement'
+        verbose_name_plural = 'Bank movements'
+        ordering = ['created', 'id']
+        indexes = [models.Index(fields=['bank', 'created'], name='movement_bank_created_idx'),
+                   # the transfers and other movements not made by lines, without the many movements of the lines
+                   models.Index(fields=['bank', 'reason', 'created'], name='movement_bank_reason_idx')]
+
+
+""" This model is an append-only journal of all changes of Bank balances: every change of the account or investment 
+balance made by Income and Expenses lines, transfers or by editing the bank is recorded as a movement. It contains a 
+ForeignKey relationship with the Bank model, the movements are deleted only together with the bank. """
+
+
+class BankSnapshot(models.Model):
+    bank = models.ForeignKey('Bank', on_delete=models.CASCADE, related_name='snapshots', verbose_name='Bank')
+    movement = models.OneToOneField('BankMovement', on_delete=models.CASCADE, related_name='snapshot',
+                                    verbose_name='Last included movement')
+    created = models.DateTimeField('Time of snapshot')  # the same as the time of the last included movement
+    balance = models.DecimalField('Account balance', max_digits=12, decimal_places=2)
+    investment = models.DecimalField('Investment balance', max_digits=12, decimal_places=2)
+
+    def __str__(self):
+        return f'{self.bank} {self.created:%Y-%m-%d %H:%M}: {self.balance} / {self.investment}'
+
+    class Meta:
+        verbose_name = 'Bank snapshot'
+        verbose_name_plural = 'Bank snapshots'
+        ordering = ['created', 'id']
+        indexes = [models.Index(fields=['bank', 'created'], name='snapshot_bank_created_idx')]
+
+
+""" This model holds the balances of a bank right after one of its movements. Snapshots are taken periodically (every 
+few dozen movements of the bank), so the balance at any past moment is the balance of the latest snapshot before it 
+plus the bounded number of movements made after the snapshot. """
+
+
+class SearchDocument(models.Model):
+    client = models.ForeignKey(User, on_delete=models.CASCADE, null=True, verbose_name='Client')
+    income = models.OneToOneField('Income', on_delete=models.CASCADE, null=True, blank=True,
+                                  related_name='search_document', verbose_name='Line of income')
+    expenses = models.OneToOneField('Expenses', on_delete=models.CASCADE, null=True, blank=True,
+                                    related_name='search_document', verbose_name='Line of expenses')
+    body = models.TextField('Searchable text', blank=True)
+
+    def __str__(self):
+        return f'{self.income or self.expenses}'
+
+    class Meta:
+        verbose_name = 'Search document'
+        verbose_name_plural = 'Search documents'
+
+
+""" This model holds the searchable text of a single Income or Expenses line: the names of its category, source (or 
+seller) and bank, the amount and the notes, joined into one text. The rows are maintained by signals when lines, 
+categories, sources, sellers or banks are saved (more about this in the search.py file). The full-text index over the 
+text is created by the migration: an FTS5 table on SQLite (see SearchIndex below) or a GIN index on PostgreSQL. """
+
+
+class FullTextField(models.TextField):
+    pass
+
+
+@FullTextField.register_lookup
+class Match(models.Lookup):  # 'body__match' lookup, translated into the 'MATCH' operator of the SQLite FTS5 tables
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class SearchIndex(models.Model):
+    # The unindexed copy of the document's id is used for the joins instead of the rowid, so SQLite always starts the
+    # query with the full-text match instead of running the match once for every line
+    document = models.OneToOneField('SearchDocument', on_delete=models.DO_NOTHING, primary_key=True, db_column='id',
+                                    related_name='index')
+    body = FullTextField()
+    rank = models.FloatField()  # hidden column of FTS5 tables, the relevance of a match (lower is better)
+
+    class Meta:
+        managed = False  # the virtual table and its triggers are created by the migration, only on SQLite
+        db_table = 'portfolio_searchindex'
+
+
+""" This model represents the SQLite FTS5 table over the text of search documents. It is never written by Django, the 
+triggers created together with the table copy every inserted, updated or deleted search document into it. It is used 
+only in filters ('document__index__body__match') and ordering by rank, on other databases the table does not exist. """
+
+
+class RequestMetric(models.Model):
+    url_name = models.CharField('URL name', max_length=200)  # name of the resolved URL, e.g. 'search-expenses-key'
+    created = models.DateTimeField(auto_now_add=True)
+    status = models.PositiveSmallIntegerField('Status code')
+    latency = models.FloatField('Latency (ms)')
+    queries = models.PositiveIntegerField('Number of queries')
+    sql_time = models.FloatField('Time of the queries (ms)')
+    duplicates = models.PositiveIntegerField('Duplicate queries')  # queries with the same SQL and parameters
+
+    def __str__(self):
+        return f'{self.url_name} {self.status}: {self.latency:.1f} ms, {self.queries} queries'
+
+    class Meta:
+        verbose_name = 'Request metric'
+        verbose_name_plural = 'Request metrics'
+        indexes = [models.Index(fields=['created'], name='requestmetric_created_idx')]
+
+
+""" This model holds the measurements of a single request, recorded by the opt-in RequestMetricsMiddleware: the name of 
+the resolved URL, the status code, the latency, the number and time of the SQL queries and how many of them repeated an 
+earlier query of the request. The rows are written in batches, more about it in the metrics.py file. """
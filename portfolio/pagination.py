@@ -0,0 +1,148 @@
+"""
+Keyset (seek) pagination for the lists of Income and Expenses lines. Django's Paginator counts all found lines and reads
+a page with 'OFFSET', so the later pages of a long history get slower. In the keyset mode the lines are ordered by date
+and id (newest first) and every page is read with a range condition on these two columns, which starts right after the
+last line of the previous page (or before the first line of the next page), e.g.
+
+    WHERE client_id = 1 AND date <= '2023-01-15' AND (date < '2023-01-15' OR id < 4242) ORDER BY date DESC, id DESC
+
+This is a range scan of the composite (client, date) index, the same for the first and the thousandth page. The
+position is kept in the 'cursor' GET parameter of the page links. The number of found lines is only shown as an
+approximation: it is counted once and kept in the cache for COUNT_TIMEOUT seconds.
+
+The mode is switched on with the KEYSET_PAGINATION setting. Links with the 'page' parameter are still served by
+Django's Paginator, so the numbered pages keep working. The lines found by search keywords are ordered by relevance,
+not by date, so they are always read with the numbered pages.
+"""
+import base64
+import hashlib
+from datetime import date
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+COUNT_TIMEOUT = 300  # seconds for which the number of found lines is cached
+
+
+def encode_cursor(direction, line):  # 'n' - the page after the line, 'p' - the page before the line
+    # The line is an object or a dictionary of values() with its 'date' and 'id' (e.g. the lines of the JSON API)
+    day, pk = (line['date'], line['id']) if isinstance(line, dict) else (line.date, line.pk)
+    value = f"{direction}:{day.isoformat() if day else ''}:{pk}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_cursor(cursor):  # returns (direction, date, id), or None for the first page and for damaged cursors
+    if cursor == 'last':
+        return 'p', None, None
+    try:
+        direction, day, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return (direction, date.fromisoformat(day) if day else None, int(pk)) if direction in ('n', 'p') else None
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def _segments(queryset, position, forward):
+    # The descending order has two parts: lines with a date by (date, id) and then lines without a date by id. Every
+    # part is read with its own range condition, so the date condition can use the index (no 'OR date IS NULL')
+    dated = queryset.filter(date__isnull=False)
+    undated = queryset.filter(date__isnull=True)
+    day, pk = position[1:] if position else (None, None)
+    if forward:
+        if position is None:
+            return [dated.order_by('-date', '-id'), undated.order_by('-id')]
+        if day is None:
+            return [undated.filter(id__lt=pk).order_by('-id')]
+        after = dated.filter(Q(date__lt=day) | Q(id__lt=pk), date__lte=day)
+        return [after.order_by('-date', '-id'), undated.order_by('-id')]
+    if pk is None:  # the last page
+        return [undated.order_by('id'), dated.order_by('date', 'id')]
+    if day is None:
+        return [undated.filter(id__gt=pk).order_by('id'), dated.order_by('date', 'id')]
+    return [dated.filter(Q(date__gt=day) | Q(id__gt=pk), date__gte=day).order_by('date', 'id')]
+
+
+def _read(segments, limit):  # the next part is read only if the previous one did not fill the page
+    lines = []
+    for segment in segments:
+        lines += segment[:limit - len(lines)]
+        if len(lines) >= limit:
+            break
+    return lines
+
+
+class CursorPage:
+    is_keyset = True  # lets the templates choose between the cursor and the numbered page links
+
+    def __init__(self, object_list, next_cursor, previous_cursor, approximate_count):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.approximate_count = approximate_count
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def approximate_count(queryset):
+    key = 'portfolio:count:' + hashlib.md5(str(queryset.query).encode()).hexdigest()  # the SQL includes the filters
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, COUNT_TIMEOUT)
+    return count
+
+
+def keyset_page(queryset, cursor, page_size):
+    count = approximate_count(queryset)  # all found lines, before the condition of the page is added
+    position = decode_cursor(cursor) if cursor else None
+    forward = position is None or position[0] == 'n'  # first page or the page after a line
+    lines = _read(_segments(queryset, position, forward), page_size + 1)  # one more line tells if there is more
+    more = len(lines) > page_size
+    if forward:
+        lines = lines[:page_size]
+        has_next, has_previous = more, position is not None
+    else:  # the page before a line is read in the ascending order and reversed
+        lines = lines[:page_size][::-1]
+        has_next, has_previous = position[2] is not None, more
+    return CursorPage(lines, encode_cursor('n', lines[-1]) if lines and has_next else None,
+                      encode_cursor('p', lines[0]) if lines and has_previous else None, count)
+
+
+class KeysetPaginationMixin:
+    """
+    Mixin for ListView classes ordered by date: with the KEYSET_PAGINATION setting on, the page is read with a keyset
+    condition on (date, id) instead of 'OFFSET' and 'page_obj' is a CursorPage. The lines found by the keywords of the
+    'keyword_kwarg' GET parameter are ordered by relevance and read with the numbered pages.
+    """
+    cursor_kwarg = 'cursor'
+    keyword_kwarg = None
+
+    def uses_keyset(self):
+        if not getattr(settings, 'KEYSET_PAGINATION', False) or self.page_kwarg in self.request.GET:
+            return False
+        return not (self.keyword_kwarg and self.request.GET.get(self.keyword_kwarg, '').strip())
+
+    def get_context_data(self, **kwargs):  # the other GET parameters (e.g. search keywords) are kept in the page links
+        context = super().get_context_data(**kwargs)
+        parameters = self.request.GET.copy()
+        for name in (self.cursor_kwarg, self.page_kwarg):
+            parameters.pop(name, None)
+        context['page_query'] = parameters.urlencode()
+        return context
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_keyset():
+            return super().paginate_queryset(queryset, page_size)
+        page = keyset_page(queryset, self.request.GET.get(self.cursor_kwarg), page_size)
+        return None, page, page.object_list, page.has_next or page.has_previous
@@ -0,0 +1,261 @@
+"""
+Maintenance and reading of the MonthlyRollup table, which holds precomputed monthly statistics of Income and Expenses
+lines (number of lines, total, min. and max. amount) for every combination of client, month, category, source or seller
+and bank.
+
+A combination is called a bucket. When a line is created, updated or deleted, refresh_bucket() recalculates the bucket
+of the line from the lines of that single month (an indexed query), and updates or creates the rollup row in place
+(a unique constraint keeps one row per bucket, also when two lines of the bucket are saved at the same time).
+Recalculation is used instead of adding and subtracting amounts, because min. and max. amounts can not be restored
+after a deletion otherwise. The signals that call it are in signals.py. The rows of a deleted category, source, seller
+or bank are deleted with it, refresh_deleted() then recalculates their months, so the lines that pointed to it merge
+into the rows of the lines without it. rebuild_rollups() recalculates the whole table (or the rows of one user) in
+a grouped query per model, it is used by the 'rebuild_rollups' management command. refresh_months() does the same for
+a few months of one client, it is used after bulk imports of lines (importers.py).
+
+monthly_report() is used by the archival reports. Complete months of the selected period are read from the rollup table,
+while the days of incomplete months at the beginning and at the end of the period are calculated from the lines.
+
+The BreakdownRollup table holds the monthly number and total of the lines of every category, source of income and
+seller (the BREAKDOWNS of each model). Its rows are summed up from the MonthlyRollup rows of the same month and object,
+so they are kept up to date by the same functions: refresh_bucket() refreshes the rows of the line's category and
+source or seller, refresh_months() and rebuild_rollups() the rows of their months. breakdown() is used by the breakdown
+reports, it finds the top categories, sources and sellers of a period the same way as monthly_report(). The rows of
+the months rolled up before the table existed are filled from MonthlyRollup by migration 0022.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date
+from django.db import transaction
+from django.db.models import Q, Count, Sum, Max, Min
+from django.db.models.functions import TruncMonth
+from .models import MonthlyRollup, BreakdownRollup, Income, Expenses, IncomeCategory, IncomeSource, ExpensesCategory, \
+    Seller, Bank
+
+# For each model: the kind of rollup rows and the names of the rollup fields that mirror the line's dimensions
+DIMENSIONS = {
+    Income: (MonthlyRollup.INCOME, {'category': 'income_category', 'source': 'income_source', 'bank': 'bank'}),
+    Expenses: (MonthlyRollup.EXPENSES, {'category': 'expenses_category', 'seller': 'seller', 'bank': 'bank'}),
+}
+# For each model: the dimensions of the breakdown rows, the line's fields are also the BreakdownRollup.dimension values
+BREAKDOWNS = {
+    Income: (BreakdownRollup.CATEGORY, BreakdownRollup.SOURCE),
+    Expenses: (BreakdownRollup.CATEGORY, BreakdownRollup.SELLER),
+}
+# The rollup field of the objects which the lines point to
+ROLLUP_FIELDS = {IncomeCategory: 'income_category', IncomeSource: 'income_source',
+                 ExpensesCategory: 'expenses_category', Seller: 'seller', Bank: 'bank'}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+
+
+def bucket_of(line):  # the bucket of a line, as a tuple of the client, month and ids of the dimensions
+    if line.date is None:  # lines without a date do not belong to any month
+        return None
+    _, fields = DIMENSIONS[type(line)]
+    return (line.client_id, month_start(line.date)) + tuple(getattr(line, f'{field}_id') for field in fields)
+
+
+def refresh_bucket(model, bucket):
+    kind, fields = DIMENSIONS[model]
+    client_id, month = bucket[:2]
+    dimension_ids = dict(zip(fields, bucket[2:]))
+    values = model.objects.filter(  # filter by None is translated by Django into 'IS NULL'
+        client_id=client_id, date__gte=month, date__lt=next_month(month),
+        **{f'{field}_id': value for field, value in dimension_ids.items()}
+    ).aggregate(count=Count('id'), total=Sum('amount'), min_amount=Min('amount'), max_amount=Max('amount'))
+    rollup_filter = {f'{fields[field]}_id': value for field, value in dimension_ids.items()}
+    if client_id is None:  # lines without a client are not rolled up
+        return
+    with transaction.atomic():
+        if values['count']:
+            MonthlyRollup.objects.update_or_create(client_id=client_id, kind=kind, month=month, **rollup_filter,
+                                                   defaults=values)
+        else:
+            MonthlyRollup.objects.filter(client_id=client_id, kind=kind, month=month, **rollup_filter).delete()
+        _refresh_breakdowns(model, bucket)
+
+
+def _refresh_breakdowns(model, bucket):  # the breakdown rows of the bucket's category and source or seller
+    kind, fields = DIMENSIONS[model]
+    client_id, month = bucket[:2]
+    dimension_ids = dict(zip(fields, bucket[2:]))
+    for dimension in BREAKDOWNS[model]:
+        key = {f'{fields[dimension]}_id': dimension_ids[dimension]}
+        values = MonthlyRollup.objects.filter(client_id=client_id, kind=kind, month=month, **key).aggregate(
+            count=Sum('count'), total=Sum('total'))
+        if values['count']:
+            BreakdownRollup.objects.update_or_create(client_id=client_id, kind=kind, dimension=dimension, month=month,
+                                                     **key, defaults=values)
+        else:
+            BreakdownRollup.objects.filter(client_id=client_id, kind=kind, dimension=dimension, month=month,
+                                           **key).delete()
+
+
+def _grouped_rollups(model, lines):  # MonthlyRollup objects calculated with one grouped query over the lines
+    kind, fields = DIMENSIONS[model]
+    grouped = lines.filter(client__isnull=False, date__isnull=False).annotate(month=TruncMonth('date')).values(
+        'client', 'month', *fields).annotate(
+        count=Count('id'), total=Sum('amount'), min_amount=Min('amount'), max_amount=Max('amount')).order_by()
+    for row in grouped.iterator():
+        yield MonthlyRollup(
+            client_id=row['client'], kind=kind, month=row['month'], count=row['count'], total=row['total'],
+            min_amount=row['min_amount'], max_amount=row['max_amount'],
+            **{f'{fields[field]}_id': row[field] for field in fields})
+
+
+def _grouped_breakdowns(model, rollups):  # BreakdownRollup objects summed up from the model's MonthlyRollup rows
+    kind, fields = DIMENSIONS[model]
+    for dimension in BREAKDOWNS[model]:
+        field = fields[dimension]
+        grouped = rollups.filter(kind=kind).values('client', 'month', field).annotate(
+            count=Sum('count'), total=Sum('total')).order_by()
+        for row in grouped.iterator():
+            yield BreakdownRollup(client_id=row['client'], kind=kind, dimension=dimension, month=row['month'],
+                                  count=row['count'], total=row['total'], **{f'{field}_id': row[field]})
+
+
+def _create_rollups(rollups, batch_size, model=MonthlyRollup):
+    created = 0
+    batch = []
+    for rollup in rollups:
+        batch.append(rollup)
+        if len(batch) >= batch_size:
+            created += len(model.objects.bulk_create(batch))
+            batch = []
+    return created + len(model.objects.bulk_create(batch))
+
+
+def rebuild_rollups(user=None, batch_size=1000):  # returns the number of the MonthlyRollup rows
+    rollups = MonthlyRollup.objects.all() if user is None else MonthlyRollup.objects.filter(client=user)
+    breakdowns = BreakdownRollup.objects.all() if user is None else BreakdownRollup.objects.filter(client=user)
+    with transaction.atomic():
+        rollups.delete()
+        breakdowns.delete()
+        created = 0
+        for model in DIMENSIONS:
+            lines = model.objects.all() if user is None else model.objects.filter(client=user)
+            created += _create_rollups(_grouped_rollups(model, lines), batch_size)
+        for model in BREAKDOWNS:
+            _create_rollups(_grouped_breakdowns(model, rollups), batch_size, BreakdownRollup)
+    return created
+
+
+def refresh_months(model, client_id, months, batch_size=1000):
+    # Recalculates all buckets of the client's months at once, e.g. after many lines were inserted with bulk_create()
+    kind, _ = DIMENSIONS[model]
+    months = sorted(set(months))
+    if not months:
+        return 0
+    month_filter = Q()
+    for month in months:
+        month_filter |= Q(date__gte=month, date__lt=next_month(month))
+    rollups = MonthlyRollup.objects.filter(client_id=client_id, kind=kind, month__in=months)
+    with transaction.atomic():
+        rollups.delete()
+        BreakdownRollup.objects.filter(client_id=client_id, kind=kind, month__in=months).delete()
+        created = _create_rollups(_grouped_rollups(model, model.objects.filter(month_filter, client_id=client_id)),
+                                  batch_size)
+        _create_rollups(_grouped_breakdowns(model, rollups), batch_size, BreakdownRollup)
+    return created
+
+
+def deleted_months(instance):  # (model, client id, month) of the rollup rows of a category, source, seller or bank
+    field = ROLLUP_FIELDS[type(instance)]
+    kinds = {kind: model for model, (kind, _) in DIMENSIONS.items()}
+    rows = MonthlyRollup.objects.filter(**{field: instance}).values_list('kind', 'client', 'month').distinct()
+    return [(kinds[kind], client_id, month) for kind, client_id, month in rows]
+
+
+def refresh_deleted(months):  # recalculates the months of deleted_months() after the rows were deleted with the object
+    grouped = defaultdict(list)
+    for model, client_id, month in months:
+        grouped[model, client_id].append(month)
+    for (model, client_id), client_months in grouped.items():
+        refresh_months(model, client_id, client_months)
+
+
+def _period_parts(start_date, end_date):
+    # Complete months of the period are [first_full, after_full), the remaining days (the edges, a condition of the
+    # lines) are calculated from the lines
+    first_full = start_date if start_date.day == 1 else next_month(start_date)
+    last_day = calendar.monthrange(end_date.year, end_date.month)[1]
+    after_full = next_month(end_date) if end_date.day == last_day else month_start(end_date)
+    if first_full >= after_full:
+        return first_full, after_full, Q(date__range=[start_date, end_date])
+    edges = Q()  # days before the first and after the last complete month, if any
+    if start_date < first_full:
+        edges |= Q(date__gte=start_date, date__lt=first_full)
+    if after_full <= end_date:
+        edges |= Q(date__gte=after_full, date__lte=end_date)
+    return first_full, after_full, edges
+
+
+def monthly_report(model, user, start_date, end_date, **dimensions):
+    """
+    Returns a list of dicts with 'month', 'count', 'total', 'min' and 'max' keys, ordered by month. The dimensions are
+    the line's field names with selected objects, e.g. category=<ExpensesCategory>, seller=<Seller>.
+    """
+    kind, fields = DIMENSIONS[model]
+    dimensions = {field: value for field, value in dimensions.items() if value}  # empty selections mean 'all'
+    first_full, after_full, edges = _period_parts(start_date, end_date)
+
+    months = {}
+    if first_full < after_full:
+        rows = MonthlyRollup.objects.filter(
+            client=user, kind=kind, month__gte=first_full, month__lt=after_full,
+            **{fields[field]: value for field, value in dimensions.items()}
+        ).values('month').annotate(count=Sum('count'), total=Sum('total'), min=Min('min_amount'),
+                                   max=Max('max_amount')).order_by()
+        months.update((row['month'], row) for row in rows)
+    if edges:
+        rows = model.objects.filter(edges, client=user, **dimensions).annotate(month=TruncMonth('date')).values(
+            'month').annotate(count=Count('id'), total=Sum('amount'), min=Min('amount'), max=Max('amount')).order_by()
+        months.update((row['month'], row) for row in rows)
+    return [months[month] for month in sorted(months)]
+
+
+def breakdown(model, user, start_date, end_date, top=10):
+    """
+    Returns a dict with a report for every dimension of BREAKDOWNS[model], e.g. {'category': ..., 'seller': ...}. The
+    report is a dict with the 'count' and 'total' of all the lines of the period, the 'rows' of the top objects by
+    total amount (dicts with 'object', 'count', 'total' and 'share' keys, the object is None for the lines without it)
+    and the 'count' and 'total' of the remaining objects ('other').
+    """
+    kind, fields = DIMENSIONS[model]
+    first_full, after_full, edges = _period_parts(start_date, end_date)
+    report = {}
+    for dimension in BREAKDOWNS[model]:
+        field = fields[dimension]
+        parts = []
+        if first_full < after_full:
+            parts.append(BreakdownRollup.objects.filter(
+                client=user, kind=kind, dimension=dimension, month__gte=first_full, month__lt=after_full
+            ).values_list(field).annotate(count=Sum('count'), total=Sum('total')).order_by())
+        if edges:
+            parts.append(model.objects.filter(edges, client=user).values_list(dimension).annotate(
+                count=Count('id'), total=Sum('amount')).order_by())
+        totals = defaultdict(lambda: [0, 0])  # object id: [count, total]
+        for rows in parts:
+            for object_id, count, total in rows:
+                totals[object_id][0] += count
+                totals[object_id][1] += total
+        ranked = sorted(totals.items(), key=lambda item: -item[1][1])
+        count = sum(values[0] for values in totals.values())
+        total = sum(values[1] for values in totals.values())
+        objects = model._meta.get_field(dimension).related_model.objects.in_bulk(
+            [object_id for object_id, _ in ranked[:top] if object_id is not None])
+        report[dimension] = {
+            'count': count, 'total': total,
+            'rows': [{'object': objects.get(object_id), 'count': values[0], 'total': values[1],
+                      'share': values[1] / total * 100 if total else 0} for object_id, values in ranked[:top]],
+            'other': {'count': sum(values[0] for _, values in ranked[top:]),
+                      'total': sum(values[1] for _, values in ranked[top:])},
+        }
+    return report
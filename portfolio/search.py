@@ -0,0 +1,158 @@
+"""
+Full-text keyword search over Income and Expenses lines. The searchable text of every line (the names of its category,
+source or seller and bank, the amount and the notes) is kept in a SearchDocument row, so a keyword search reads a
+single full-text index instead of matching five 'icontains' conditions over joined tables for every line.
+
+The index depends on the database:
+- SQLite: an FTS5 table (the SearchIndex model), filled by triggers on the search document table;
+- PostgreSQL: a GIN index over to_tsvector('simple', body);
+- other databases: a plain 'icontains' search over the search documents (one column, but not indexed).
+Both tables are created by the migration. Every keyword matches the lines that contain its words, the last word as a
+prefix (e.g. 'shop' matches 'shopping'), several keywords (separated with a comma) are joined with OR. Found lines are
+ordered by relevance (bm25 on SQLite, ts_rank on PostgreSQL) and then by date.
+
+The documents are refreshed by signals (signals.py) when a line is saved and when a category, source, seller or bank
+of the lines is renamed or deleted; they are deleted together with their lines. Lines created without signals (e.g. with
+bulk_create()) are indexed by the 'rebuild_search_index' management command.
+"""
+import re
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import Income, Expenses, IncomeCategory, IncomeSource, ExpensesCategory, Seller, Bank, SearchDocument, \
+    SearchIndex
+
+# For each model: the name of the search document's field pointing to the line and the fields with the line's text
+DOCUMENT_FIELDS = {
+    Income: ('income', ('category__definition', 'source__source', 'bank__name', 'amount', 'notes')),
+    Expenses: ('expenses', ('category__definition', 'seller__seller', 'bank__name', 'amount', 'notes')),
+}
+# For the related models: the field with the name shown in the documents and the lines (model, field) that show it
+NAMED_RELATIONS = {
+    IncomeCategory: ('definition', [(Income, 'category')]),
+    IncomeSource: ('source', [(Income, 'source')]),
+    ExpensesCategory: ('definition', [(Expenses, 'category')]),
+    Seller: ('seller', [(Expenses, 'seller')]),
+    Bank: ('name', [(Income, 'bank'), (Expenses, 'bank')]),
+}
+
+
+def keyword_terms(keywords):  # ['weekly shop', '12.50'] -> [['weekly', 'shop'], ['12', '50']], as the index splits
+    terms = [re.findall(r'\w+', keyword.lower()) for keyword in keywords]
+    return [words for words in terms if words]
+
+
+def fts_expression(terms):  # FTS5 query: every keyword is a phrase with a prefix, e.g. '"weekly shop"* OR "12 50"*'
+    return ' OR '.join('"{}"*'.format(' '.join(words)) for words in terms)
+
+
+def tsquery_expression(terms):  # PostgreSQL tsquery with the same meaning, e.g. "('weekly' <-> 'shop':*) | ..."
+    phrases = []
+    for words in terms:
+        quoted = [f"'{word}'" for word in words]
+        quoted[-1] += ':*'
+        phrases.append('({})'.format(' <-> '.join(quoted)))
+    return ' | '.join(phrases)
+
+
+def _postgres_search(terms):
+    from django.contrib.postgres.search import SearchQuery, SearchVector  # requires psycopg2, used only on PostgreSQL
+    return SearchVector('body', config='simple'), SearchQuery(tsquery_expression(terms), search_type='raw',
+                                                               config='simple')
+
+
+def keyword_filter(model, keywords):
+    """
+    Returns a Q object with the lines that match any of the keywords, usable in filter() and in the conditions of the
+    statistics (stats.py). Q() (all lines) is returned if there are no words in the keywords.
+    """
+    field, _ = DOCUMENT_FIELDS[model]
+    terms = keyword_terms(keywords)
+    if not terms:
+        return Q()
+    if connection.vendor == 'sqlite':
+        documents = SearchIndex.objects.filter(body__match=fts_expression(terms)).values(f'document__{field}')
+    elif connection.vendor == 'postgresql':
+        vector, query = _postgres_search(terms)
+        documents = SearchDocument.objects.annotate(vector=vector).filter(vector=query).values(field)
+    else:
+        condition = Q()
+        for words in terms:
+            keyword_condition = Q()
+            for word in words:
+                keyword_condition &= Q(body__icontains=word)
+            condition |= keyword_condition
+        documents = SearchDocument.objects.filter(condition).values(field)
+    return Q(pk__in=documents)
+
+
+def search_lines(queryset, keywords, ranked=True):
+    # Filters the lines of the queryset by the keywords and orders them by relevance, or keeps the queryset's ordering
+    terms = keyword_terms(keywords)
+    if not terms:
+        return queryset
+    if not ranked:  # e.g. for pages which are read in the order of the queryset
+        return queryset.filter(keyword_filter(queryset.model, keywords))
+    if connection.vendor == 'sqlite':  # lower rank means a better match
+        return queryset.filter(search_document__index__body__match=fts_expression(terms)).order_by(
+            'search_document__index__rank', '-date')
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchRank, SearchVector
+        _, query = _postgres_search(terms)
+        vector = SearchVector('search_document__body', config='simple')
+        return queryset.annotate(search_vector=vector, search_rank=SearchRank(vector, query)).filter(
+            search_vector=query).order_by('-search_rank', '-date')
+    return queryset.filter(keyword_filter(queryset.model, keywords)).order_by('-date')
+
+
+def document_body(values):
+    return ' '.join(str(value) for value in values if value not in (None, ''))
+
+
+def _replace_documents(field, documents):
+    with transaction.atomic():  # the documents of the lines are replaced, the triggers keep the FTS5 table in sync
+        SearchDocument.objects.filter(**{f'{field}_id__in': [getattr(document, f'{field}_id')
+                                                             for document in documents]}).delete()
+        SearchDocument.objects.bulk_create(documents)
+    return len(documents)
+
+
+def index_lines(model, lines, batch_size=1000):  # (re)creates the search documents of the lines of the queryset
+    field, text_fields = DOCUMENT_FIELDS[model]
+    rows = lines.order_by().values_list('pk', 'client_id', *text_fields)
+    indexed = 0
+    batch = []
+    for row in rows.iterator(chunk_size=batch_size):
+        batch.append(SearchDocument(client_id=row[1], body=document_body(row[2:]), **{f'{field}_id': row[0]}))
+        if len(batch) >= batch_size:
+            indexed += _replace_documents(field, batch)
+            batch = []
+    return indexed + _replace_documents(field, batch)
+
+
+def index_related_lines(instance, line_ids=None):
+    # Refreshes the documents of the lines showing a renamed category, source, seller or bank. After a deletion the
+    # lines no longer point to the object, so the ids of the lines remembered before the deletion are used instead
+    _, relations = NAMED_RELATIONS[type(instance)]
+    for model, relation in relations:
+        if line_ids is None:
+            lines = model.objects.filter(**{relation: instance})
+        else:
+            lines = model.objects.filter(pk__in=line_ids.get(model, []))
+        index_lines(model, lines)
+
+
+def related_line_ids(instance):
+    _, relations = NAMED_RELATIONS[type(instance)]
+    return {model: list(model.objects.filter(**{relation: instance}).values_list('pk', flat=True))
+            for model, relation in relations}
+
+
+def rebuild_search_index(user=None, batch_size=1000):
+    documents = SearchDocument.objects.all() if user is None else SearchDocument.objects.filter(client=user)
+    with transaction.atomic():
+        documents.delete()
+        indexed = 0
+        for model in DOCUMENT_FIELDS:
+            lines = model.objects.all() if user is None else model.objects.filter(client=user)
+            indexed += index_lines(model, lines, batch_size)
+    return indexed
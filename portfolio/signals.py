@@ -1,12 +1,31 @@
 """
 Signals are used in Django to notify other parts of the app when certain actions occur. In this case, the signals are
-used to create a profile, save a profile, decrease the bank balance on Income object deletion, and increase the bank
-balance on Expenses object deletion. All four signal are imported into the apps.py file.
+used to create a profile, save a profile, make the pre-sized copies of a new profile photo in the background (more
+about this in the thumbnails.py file), decrease the bank balance on Income object deletion, and increase the bank
+balance on Expenses object deletion. All signals are imported into the apps.py file.
+The next five signals keep the MonthlyRollup and BreakdownRollup tables up to date when Income and Expenses objects are
+saved or deleted, and when the categories, sources, sellers and banks of the lines are deleted, more about this in the
+rollups.py file.
+The next two signals record the opening balances of a new bank and the changes made by editing a bank in the bank's
+journal, more about this in the journal.py file.
+The next signals count the lines pointing to every stored PDF document, more about this in the blobs.py file.
+The next signals invalidate the cached data (the bank summary and the cached pages) of the user whose banks, lines,
+categories, sources or sellers have changed, more about this in the caching.py file.
+The last signals keep the search documents of Income and Expenses lines up to date when the lines are saved, and when
+the categories, sources, sellers and banks shown in them are renamed or deleted, more about this in the search.py file.
 """
 from django.contrib.auth.models import User  # associated built-in model
-from .models import Profile, Income, Expenses  # associated models from models.py
-from django.db.models.signals import post_save, post_delete  # different types of signals (by circumstances)
+from .models import Profile, Income, Expenses, Bank, BankMovement, IncomeCategory, IncomeSource, ExpensesCategory, \
+    Seller  # associated models from models.py
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete  # types of signals (by circumstances)
 from django.dispatch import receiver  # receiver is a decorator (additional function)
+from .rollups import bucket_of, refresh_bucket, deleted_months, refresh_deleted
+from .balances import apply_delta
+from .journal import record_movement
+from .search import NAMED_RELATIONS, index_lines, index_related_lines, related_line_ids
+from .caching import data_changed
+from .blobs import acquire, release
+from .thumbnails import schedule_photo
 
 
 # After creating a user, a profile is automatically created
@@ -16,27 +35,198 @@ def create_profile(sender, instance, created, **kwargs):  # 'instance' is the ne
         Profile.objects.create(user=instance)
 
 
-# After update of user details, user profile will be also saved
+# After update of user details, user profile will be also saved (but not after the update of the last login time,
+# which is saved on every login)
 @receiver(post_save, sender=User)
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_profile(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        instance.profile.save()
+
+
+# After saving of a profile with a new photo, the pre-sized copies of the photo are made in the background
+@receiver(post_save, sender=Profile)
+def process_new_photo(sender, instance, **kwargs):
+    if instance.photo and instance.photo.name != instance.photo_processed:
+        schedule_photo(instance.pk)
 
 
 # After deleting of Income object, bank balance associated with the income line will be decreased by amount of
 # income amount
 @receiver(post_delete, sender=Income)
-def decrease_bank_balance_on_delete(sender, instance, **kwargs):
-    bank = instance.bank
-    if bank:
-        bank.balance -= instance.amount
-        bank.save()
+def decrease_bank_balance_on_delete(sender, instance, **kwargs):  # changed in the database, see balances.py
+    apply_delta(instance.bank_id, balance=-instance.amount, reason=BankMovement.INCOME)
 
 
 # After deleting of Expenses object, bank balance associated with the expenses line will be increased by amount of
 # expenses amount
 @receiver(post_delete, sender=Expenses)
 def increase_bank_balance_on_delete(sender, instance, **kwargs):
-    bank = instance.bank
-    if bank:
-        bank.balance += instance.amount
-        bank.save()
+    apply_delta(instance.bank_id, balance=instance.amount, reason=BankMovement.EXPENSES)
+
+
+# Before saving of Income or Expenses object, the rollup bucket of the stored line is remembered, so both the old and
+# the new buckets can be recalculated after the save (e.g. when the date or the category of the line has changed).
+# The stored PDF document is remembered too, so it can be released when the line gets another one
+@receiver(pre_save, sender=Income)
+@receiver(pre_save, sender=Expenses)
+def remember_rollup_bucket(sender, instance, **kwargs):
+    previous = sender.objects.filter(pk=instance.pk).first() if instance.pk else None
+    instance._previous_rollup_bucket = bucket_of(previous) if previous else None
+    instance._previous_pdf = previous.pdf.name if previous and previous.pdf else ''
+    # an uploaded document is counted by the storage when it is saved (see storage.py)
+    instance._pdf_uploaded = bool(instance.pdf) and not instance.pdf._committed
+
+
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expenses)
+def refresh_rollups_on_save(sender, instance, **kwargs):
+    buckets = {bucket_of(instance), getattr(instance, '_previous_rollup_bucket', None)} - {None}
+    for bucket in buckets:
+        refresh_bucket(sender, bucket)
+
+
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expenses)
+def refresh_rollups_on_delete(sender, instance, **kwargs):
+    bucket = bucket_of(instance)
+    if bucket:
+        refresh_bucket(sender, bucket)
+
+
+# Before deleting of a category, source, seller or bank, the months of its rollup rows are remembered, as the rows are
+# deleted with it; afterwards the months are recalculated, so its lines are rolled up as lines without it
+@receiver(pre_delete, sender=IncomeCategory)
+@receiver(pre_delete, sender=IncomeSource)
+@receiver(pre_delete, sender=ExpensesCategory)
+@receiver(pre_delete, sender=Seller)
+@receiver(pre_delete, sender=Bank)
+def remember_rollup_months(sender, instance, **kwargs):
+    instance._rollup_months = deleted_months(instance)
+
+
+@receiver(post_delete, sender=IncomeCategory)
+@receiver(post_delete, sender=IncomeSource)
+@receiver(post_delete, sender=ExpensesCategory)
+@receiver(post_delete, sender=Seller)
+@receiver(post_delete, sender=Bank)
+def refresh_rollups_of_deleted_object(sender, instance, **kwargs):
+    refresh_deleted(getattr(instance, '_rollup_months', []))
+
+
+# Before saving of Bank object, the stored balances are remembered, so the change made by editing the bank (e.g. in
+# the update view or on the admin page) can be recorded in the journal
+@receiver(pre_save, sender=Bank)
+def remember_bank_balances(sender, instance, **kwargs):
+    previous = sender.objects.filter(pk=instance.pk).values('balance', 'investment').first() if instance.pk else None
+    instance._previous_balances = previous or {'balance': 0, 'investment': 0}
+
+
+@receiver(post_save, sender=Bank)
+def record_bank_balances(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_balances', {'balance': 0, 'investment': 0})
+    record_movement(instance.pk, balance=(instance.balance or 0) - (previous['balance'] or 0),
+                    investment=(instance.investment or 0) - (previous['investment'] or 0),
+                    reason=BankMovement.OPENING if created else BankMovement.ADJUSTMENT)
+
+
+# After saving of Income or Expenses object with a new PDF document, the new document is counted and the replaced one
+# is released; the document of a deleted line is released as well (the file is deleted with its last line, see blobs.py)
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expenses)
+def count_pdf_references(sender, instance, **kwargs):
+    name = instance.pdf.name if instance.pdf else ''
+    previous = getattr(instance, '_previous_pdf', '')
+    uploaded = getattr(instance, '_pdf_uploaded', False)
+    if name != previous or uploaded:  # the same content uploaded again was counted twice
+        if not uploaded:
+            acquire(name)
+        release(previous)
+
+
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expenses)
+def release_pdf_on_delete(sender, instance, **kwargs):
+    if instance.pdf:
+        release(instance.pdf.name)
+
+
+# After saving or deleting of a user's object, the cached data of the user is invalidated
+@receiver(post_save, sender=Bank)
+@receiver(post_delete, sender=Bank)
+def invalidate_cache_of_owner(sender, instance, **kwargs):
+    data_changed(instance.owner_id)
+
+
+@receiver(post_save, sender=Profile)  # the profile photo is shown on the pages, saved also after the user's changes
+def invalidate_cache_of_user(sender, instance, **kwargs):
+    data_changed(instance.user_id)
+
+
+@receiver(post_save, sender=IncomeSource)
+@receiver(post_delete, sender=IncomeSource)
+def invalidate_cache_of_earner(sender, instance, **kwargs):
+    data_changed(instance.earner_id)
+
+
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expenses)
+@receiver(post_save, sender=IncomeCategory)
+@receiver(post_save, sender=ExpensesCategory)
+@receiver(post_save, sender=Seller)
+@receiver(post_delete, sender=Income)
+@receiver(post_delete, sender=Expenses)
+@receiver(post_delete, sender=IncomeCategory)
+@receiver(post_delete, sender=ExpensesCategory)
+@receiver(post_delete, sender=Seller)
+def invalidate_cache_of_client(sender, instance, **kwargs):
+    data_changed(instance.client_id)
+
+
+@receiver(post_save, sender=Income)
+@receiver(post_save, sender=Expenses)
+def index_line_on_save(sender, instance, **kwargs):  # the document is deleted together with the line
+    index_lines(sender, sender.objects.filter(pk=instance.pk))
+
+
+# Before saving of a category, source, seller or bank, its stored name is remembered, so the documents of its lines are
+# refreshed only when the name has changed
+@receiver(pre_save, sender=IncomeCategory)
+@receiver(pre_save, sender=IncomeSource)
+@receiver(pre_save, sender=ExpensesCategory)
+@receiver(pre_save, sender=Seller)
+@receiver(pre_save, sender=Bank)
+def remember_search_name(sender, instance, **kwargs):
+    field, _ = NAMED_RELATIONS[sender]
+    previous = sender.objects.filter(pk=instance.pk).values_list(field, flat=True).first() if instance.pk else None
+    instance._previous_search_name = previous
+
+
+@receiver(post_save, sender=IncomeCategory)
+@receiver(post_save, sender=IncomeSource)
+@receiver(post_save, sender=ExpensesCategory)
+@receiver(post_save, sender=Seller)
+@receiver(post_save, sender=Bank)
+def index_lines_on_rename(sender, instance, created, **kwargs):
+    field, _ = NAMED_RELATIONS[sender]
+    if not created and getattr(instance, '_previous_search_name', None) != getattr(instance, field):
+        index_related_lines(instance)
+
+
+# The lines of a deleted category, source, seller or bank are remembered before the deletion, as their reference to it
+# is set to null by the database
+@receiver(pre_delete, sender=IncomeCategory)
+@receiver(pre_delete, sender=IncomeSource)
+@receiver(pre_delete, sender=ExpensesCategory)
+@receiver(pre_delete, sender=Seller)
+@receiver(pre_delete, sender=Bank)
+def remember_search_lines(sender, instance, **kwargs):
+    instance._search_line_ids = related_line_ids(instance)
+
+
+@receiver(post_delete, sender=IncomeCategory)
+@receiver(post_delete, sender=IncomeSource)
+@receiver(post_delete, sender=ExpensesCategory)
+@receiver(post_delete, sender=Seller)
+@receiver(post_delete, sender=Bank)
+def index_lines_on_delete(sender, instance, **kwargs):
+    index_related_lines(instance, getattr(instance, '_search_line_ids', {}))
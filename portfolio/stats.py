@@ -0,0 +1,39 @@
+"""
+Shared statistics helpers for Income and Expenses querysets, used by the search and comparison views.
+
+line_stats() returns the number of lines and the total, average, max. and min. amount of a queryset, all calculated in
+a single aggregate() query instead of one query per value. subset_line_stats() does the same for several subsets of one
+queryset at once: every subset is described by a Q object and its values are calculated with conditional aggregation
+(the 'filter' argument of the aggregation functions), so e.g. the main and comparison sets of the search page, together
+with the number of all lines, come back from the database in one query.
+"""
+from django.db.models import Count, Sum, Avg, Max, Min
+
+STATS = ('count', 'total', 'avg', 'max', 'min')
+
+
+def stats_expressions(prefix='', condition=None):  # condition is a Q object, None means all lines of the queryset
+    return {
+        f'{prefix}count': Count('id', filter=condition),
+        f'{prefix}total': Sum('amount', filter=condition),
+        f'{prefix}avg': Avg('amount', filter=condition),
+        f'{prefix}max': Max('amount', filter=condition),
+        f'{prefix}min': Min('amount', filter=condition),
+    }
+
+
+def _collect(values, prefix=''):  # Zero is in case no lines found, the aggregation returns None for an empty set
+    return {name: values[f'{prefix}{name}'] or 0 for name in STATS}
+
+
+def line_stats(queryset):
+    values = queryset.order_by().aggregate(**stats_expressions())  # ordering is not needed for the aggregation
+    return _collect(values)
+
+
+def subset_line_stats(queryset, **subsets):
+    expressions = {}
+    for name, condition in subsets.items():
+        expressions.update(stats_expressions(f'{name}__', condition))
+    values = queryset.order_by().aggregate(**expressions)
+    return {name: _collect(values, f'{name}__') for name in subsets}
@@ -0,0 +1,64 @@
+"""
+Content-addressed storage of the PDF documents attached to Income and Expenses lines. Every uploaded file is written in
+chunks into a temporary file while its SHA-256 digest is calculated, and then moved to a path made of the digest, e.g.
+'blobs/3f/3f9c...e1.pdf'. A file with the same content which is already stored is not written again: the temporary file
+is dropped and the line points to the stored file, so a statement attached to many lines is kept on the disk only once.
+
+The number of lines pointing to every stored file is counted in the StoredBlob model (more about it in blobs.py), which
+deletes the file when its last line is deleted or gets another file. The storage takes the reference of the line being
+saved before it reuses a stored file, so the file can not be deleted meanwhile by the release of its last other line;
+the file is written again if it was deleted before the reference was taken.
+"""
+import hashlib
+import os
+import tempfile
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+BLOB_DIRECTORY = 'blobs'
+CHUNK_SIZE = 65536  # bytes written and hashed at once
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def blob_name(self, digest, extension):
+        return f'{BLOB_DIRECTORY}/{digest[:2]}/{digest}{extension.lower()}'
+
+    def is_blob(self, name):
+        return bool(name) and name.startswith(BLOB_DIRECTORY + '/')
+
+    def get_available_name(self, name, max_length=None):  # the final name is only known after the content is hashed
+        return name
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1]
+        directory = self.path(BLOB_DIRECTORY)
+        os.makedirs(directory, exist_ok=True)
+        from .blobs import acquire  # blobs.py uses the storage of the models, which use this module
+        digest = hashlib.sha256()
+        size = 0
+        # The temporary file is in the same file system as the blobs, so it is moved into place without copying
+        with tempfile.NamedTemporaryFile(dir=directory, suffix='.upload', delete=False) as temporary:
+            try:
+                for chunk in content.chunks(CHUNK_SIZE):
+                    if isinstance(chunk, str):
+                        chunk = chunk.encode()
+                    digest.update(chunk)
+                    temporary.write(chunk)
+                    size += len(chunk)
+            except BaseException:
+                os.unlink(temporary.name)
+                raise
+        name = self.blob_name(digest.hexdigest(), extension)
+        acquire(name, size)  # the reference of the saved line, counted before the stored file is reused
+        if self.exists(name):  # the same content is already stored
+            os.unlink(temporary.name)
+            return name
+        os.makedirs(os.path.dirname(self.path(name)), exist_ok=True)
+        os.replace(temporary.name, self.path(name))
+        if self.file_permissions_mode is not None:
+            os.chmod(self.path(name), self.file_permissions_mode)
+        return name
+
+
+pdf_storage = ContentAddressedStorage()
@@ -0,0 +1,32 @@
+"""
+Per-user cache of the bank summary shown on the bank list page: the user's banks (also used as the choices of the
+transfer forms) and the totals of their account and investment balances. A cached summary is read without any query.
+
+The cache key of a user's summary contains the user's data version (caching.py), which is replaced when any of the
+user's banks or lines change, so the next page view finds no summary under the new key and reads it again from the
+database. The old summaries are never read again and expire after SUMMARY_TIMEOUT seconds (after a few seconds with
+the memory of each process as the cache, which does not see the changes made in the other processes, see caching.py).
+"""
+from django.core.cache import cache
+from .models import Bank
+from .caching import cache_timeout, data_version
+
+SUMMARY_TIMEOUT = 3600  # seconds for which an unchanged summary is kept
+
+
+def bank_summary(user):
+    """
+    Returns a dict with the user's banks ('banks', a list of Bank objects ordered by name) and the totals of their
+    balances ('total_balance' and 'total_investment', None if the user has no banks).
+    """
+    key = f'portfolio:bank-summary:{user.pk}:{data_version(user.pk)}'
+    summary = cache.get(key)
+    if summary is None:
+        banks = list(Bank.objects.filter(owner=user).order_by('name', 'id'))
+        summary = {
+            'banks': banks,
+            'total_balance': sum(bank.balance or 0 for bank in banks) if banks else None,
+            'total_investment': sum(bank.investment or 0 for bank in banks) if banks else None,
+        }
+        cache.set(key, summary, cache_timeout(SUMMARY_TIMEOUT))
+    return summary
@@ -1,3 +1,1248 @@
-from django.test import TestCase
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.db.models import Q
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import skipIf
+from unittest.mock import patch
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image as PILImage
+from .models import Profile, Bank, ExpensesCategory, Seller, Expenses, IncomeCategory, IncomeSource, Income, \
+    MonthlyRollup, BreakdownRollup, BankMovement, BankSnapshot, SearchDocument, StoredBlob, RequestMetric
+from .rollups import monthly_report, rebuild_rollups, breakdown, bucket_of, refresh_bucket
+from .stats import line_stats, subset_line_stats
+from .balances import InsufficientFunds, apply_delta, move_line, transfer_between_banks, transfer_batch
+from . import balances, journal
+from .search import keyword_filter, rebuild_search_index, search_lines
+from .importers import StatementError, import_statement
+from .thumbnails import process_photo
+from .storage import pdf_storage
+from .blobs import recount_references, store_legacy_documents
+from .metrics import QueryRecorder, percentile
+from .benchmarking import paydays
+from .caching import LOCAL_TIMEOUT, cache_timeout
+from .summaries import SUMMARY_TIMEOUT
+from .forms import SearchSelectExpensesForm
+from . import analytics
+from .analytics import trends
+from .cashflow import cash_flow
 
-# Create your tests here.
+
+# Common data for the tests: a client with one bank, categories, sellers, sources and a few lines of each type
+class PortfolioTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='client', password='secret-password')
+        cls.other_user = User.objects.create_user(username='other', password='secret-password')
+        cls.bank = Bank.objects.create(owner=cls.user, name='SEB', balance=Decimal('1000'), investment=Decimal('0'))
+        cls.groceries = ExpensesCategory.objects.create(client=cls.user, definition='Groceries')
+        cls.rent = ExpensesCategory.objects.create(client=cls.user, definition='Rent')
+        cls.maxima = Seller.objects.create(client=cls.user, seller='Maxima')
+        cls.salary = IncomeCategory.objects.create(client=cls.user, definition='Salary')
+        cls.university = IncomeSource.objects.create(earner=cls.user, source='University')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create_expenses(self, amount, line_date=date(2023, 1, 15), **kwargs):
+        values = dict(client=self.user, date=line_date, amount=Decimal(amount), category=self.groceries,
+                      seller=self.maxima, bank=self.bank)
+        values.update(kwargs)
+        return Expenses.objects.create(**values)
+
+    def create_income(self, amount, line_date=date(2023, 1, 15), **kwargs):
+        values = dict(client=self.user, date=line_date, amount=Decimal(amount), category=self.salary,
+                      source=self.university, bank=self.bank)
+        values.update(kwargs)
+        return Income.objects.create(**values)
+
+
+class StatsTests(PortfolioTestCase):
+    def test_line_stats_of_empty_queryset_are_zero(self):
+        self.assertEqual(line_stats(Expenses.objects.none()), {'count': 0, 'total': 0, 'avg': 0, 'max': 0, 'min': 0})
+
+    def test_subsets_are_calculated_in_one_query(self):
+        self.create_expenses('10')
+        self.create_expenses('30', category=self.rent)
+        self.create_expenses('5', category=None)
+        with self.assertNumQueries(1):
+            stats = subset_line_stats(Expenses.objects.filter(client=self.user), all=None,
+                                      found=Q(category=self.groceries), compare=Q(category__definition='Rent'))
+        self.assertEqual(stats['all']['count'], 3)
+        self.assertEqual(stats['found']['total'], Decimal('10'))
+        self.assertEqual(stats['compare']['max'], Decimal('30'))
+
+    def test_select_search_page_statistics(self):
+        self.create_expenses('10')
+        self.create_expenses('30', category=self.rent)
+        response = self.client.post(reverse('search-expenses-select'), {'category': self.groceries.pk,
+                                                                         'category_compare': self.rent.pk})
+        self.assertEqual(response.context['all_expenses_lines'], 2)
+        self.assertEqual(response.context['num_expenses_lines'], 1)
+        self.assertEqual(response.context['amount_difference'], '-20.00')
+
+    def test_keyword_search_counts_only_users_lines(self):
+        self.create_expenses('10', notes='weekly shopping')
+        self.create_expenses('20', category=None, notes='cinema')
+        Expenses.objects.create(client=self.other_user, date=date(2023, 1, 1), amount=Decimal('1'))
+        response = self.client.get(reverse('search-expenses-key'), {'keywords': 'shopping'})
+        self.assertEqual(response.context['num_expenses_lines'], 1)
+        self.assertEqual(response.context['all_expenses_lines'], 2)
+        self.assertEqual(response.context['total_expenses'], '10.00')
+
+
+class MonthlyRollupTests(PortfolioTestCase):
+    def rollup_rows(self):
+        return sorted(MonthlyRollup.objects.values_list(
+            'kind', 'month', 'expenses_category', 'seller', 'income_category', 'income_source', 'bank', 'count',
+            'total', 'min_amount', 'max_amount'))
+
+    def test_rollups_follow_created_updated_and_deleted_lines(self):
+        first = self.create_expenses('10')
+        second = self.create_expenses('30', line_date=date(2023, 1, 20))
+        self.create_income('100', line_date=date(2023, 2, 1))
+        second.date = date(2023, 3, 1)
+        second.category = self.rent
+        second.save()
+        first.delete()
+        incremental = self.rollup_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollup_rows())
+        self.assertEqual(len(incremental), 2)
+
+    def test_deleted_category_merges_into_empty_bucket(self):
+        self.create_expenses('10', category=self.rent)
+        self.create_expenses('20', category=None)
+        self.rent.delete()  # the rows of the category are deleted with it and its lines merge into the other row
+        self.assertEqual(MonthlyRollup.objects.get().count, 2)
+        report = monthly_report(Expenses, self.user, date(2023, 1, 1), date(2023, 1, 31))
+        self.assertEqual((report[0]['count'], report[0]['total']), (2, Decimal('30')))
+        self.create_expenses('5', category=None)
+        self.assertEqual(MonthlyRollup.objects.get().count, 3)
+
+    def test_bucket_has_one_row(self):
+        line = self.create_expenses('10', category=None)
+        rollup = MonthlyRollup.objects.get()
+        refresh_bucket(Expenses, bucket_of(line))  # updated in place
+        self.assertEqual(MonthlyRollup.objects.get().pk, rollup.pk)
+        rollup.pk = None
+        with self.assertRaises(IntegrityError), transaction.atomic():  # also for the lines without a category
+            rollup.save()
+
+    def test_report_combines_rollups_with_incomplete_months(self):
+        self.create_expenses('10', line_date=date(2023, 1, 5))
+        self.create_expenses('20', line_date=date(2023, 1, 25))
+        self.create_expenses('40', line_date=date(2023, 2, 10))
+        self.create_expenses('80', line_date=date(2023, 3, 20))
+        report = monthly_report(Expenses, self.user, date(2023, 1, 20), date(2023, 3, 10), seller=self.maxima)
+        self.assertEqual([(row['month'], row['total']) for row in report],
+                         [(date(2023, 1, 1), Decimal('20')), (date(2023, 2, 1), Decimal('40'))])
+
+    def breakdown_rows(self):
+        return sorted(BreakdownRollup.objects.values_list(
+            'kind', 'dimension', 'month', 'expenses_category', 'seller', 'income_category', 'income_source', 'count',
+            'total'), key=str)
+
+    def test_breakdowns_follow_lines_and_deleted_objects(self):
+        lidl = Seller.objects.create(client=self.user, seller='Lidl')
+        first = self.create_expenses('10')
+        second = self.create_expenses('30', seller=lidl)
+        self.create_expenses('5', category=self.rent, seller=lidl, line_date=date(2023, 2, 1))
+        self.create_income('100')
+        second.category = self.rent
+        second.save()
+        first.delete()
+        self.rent.delete()  # its rows merge into the rows of the lines without a category
+        incremental = self.breakdown_rows()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.breakdown_rows())
+        self.assertEqual(BreakdownRollup.objects.filter(dimension='seller', month=date(2023, 1, 1)).get().total,
+                         Decimal('30'))
+
+    def test_breakdown_ranks_objects_of_the_period(self):
+        lidl = Seller.objects.create(client=self.user, seller='Lidl')
+        self.create_expenses('10', line_date=date(2023, 1, 5))
+        self.create_expenses('50', line_date=date(2023, 1, 10), seller=lidl)
+        self.create_expenses('35', line_date=date(2023, 2, 10), category=None)
+        self.create_expenses('80', line_date=date(2023, 3, 20), seller=lidl)  # after the period
+        Expenses.objects.create(client=self.other_user, date=date(2023, 1, 5), amount=Decimal('1000'))
+        report = breakdown(Expenses, self.user, date(2023, 1, 1), date(2023, 3, 10), top=1)
+        self.assertEqual((report['seller']['count'], report['seller']['total']), (3, Decimal('95')))
+        self.assertEqual([(row['object'], row['total']) for row in report['seller']['rows']], [(lidl, Decimal('50'))])
+        self.assertEqual(report['seller']['other'], {'count': 2, 'total': Decimal('45')})
+        self.assertEqual([(row['object'], row['count']) for row in report['category']['rows']], [(self.groceries, 2)])
+        self.assertEqual(report['category']['other'], {'count': 1, 'total': Decimal('35')})  # without a category
+        self.assertEqual(round(report['category']['rows'][0]['share'], 1), Decimal('63.2'))
+
+    def test_breakdown_page(self):
+        self.create_expenses('10')
+        response = self.client.get(reverse('expenses-breakdown'), {'start_date': '2023-01-01', 'top': 5})
+        self.assertContains(response, 'Maxima')
+        self.assertEqual([title for title, _ in response.context['breakdowns']], ['Categories', 'Sellers'])
+        self.assertEqual(self.client.get(reverse('income-breakdown'), {'top': 0}).context['breakdowns'], [])
+
+    def test_archive_report_reads_monthly_data(self):
+        self.create_expenses('10', line_date=date(2023, 1, 5))
+        self.create_expenses('30', line_date=date(2023, 1, 25))
+        self.create_expenses('40', line_date=date(2023, 2, 10))
+        response = self.client.post(reverse('archive-expenses'), {'start_date_report': '2023-01-01',
+                                                                  'end_date_report': '2023-02-28'})
+        self.assertEqual(list(response.context['monthly_data']), ['2023-01', '2023-02'])
+        self.assertEqual(response.context['num_expenses_lines_period'], 3)
+        self.assertEqual(response.context['avg_expenses_month_total'], '40.00')
+        self.assertEqual(response.context['min_expenses_month'], '10.00')
+
+
+# The data migrations are run on rows made with the models of the previous migration
+class MigrationTests(TransactionTestCase):
+    def migrate(self, name):  # returns the models of the migration
+        executor = MigrationExecutor(connection)
+        executor.migrate([('portfolio', name)])
+        return executor.loader.project_state([('portfolio', name)]).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes('portfolio'))
+
+    def test_duplicate_rollup_rows_are_merged(self):
+        apps = self.migrate('0020_bank_movement_reason_index')
+        user = apps.get_model('auth', 'User').objects.create(username='client')
+        rollup = apps.get_model('portfolio', 'MonthlyRollup')
+        for count, total, smallest, largest in ((1, '10', '10', '10'), (2, '5', '2', '3')):  # left by a deleted seller
+            rollup.objects.create(client_id=user.pk, kind='expenses', month=date(2023, 1, 1), count=count,
+                                  total=Decimal(total), min_amount=Decimal(smallest), max_amount=Decimal(largest))
+        self.migrate('0021_rollup_bucket_unique')
+        self.assertEqual(list(MonthlyRollup.objects.values_list('count', 'total', 'min_amount', 'max_amount')),
+                         [(3, Decimal('15'), Decimal('2'), Decimal('10'))])
+
+    def test_breakdowns_of_existing_rollups_are_filled(self):
+        apps = self.migrate('0021_rollup_bucket_unique')
+        user = apps.get_model('auth', 'User').objects.create(username='client')
+        category = apps.get_model('portfolio', 'ExpensesCategory').objects.create(client_id=user.pk, definition='Food')
+        seller = apps.get_model('portfolio', 'Seller').objects.create(client_id=user.pk, seller='Rimi')
+        rollup = apps.get_model('portfolio', 'MonthlyRollup')
+        for seller_id, count, total in ((seller.pk, 1, '10'), (None, 2, '5')):  # rolled up before 0019
+            rollup.objects.create(client_id=user.pk, kind='expenses', month=date(2023, 1, 1), count=count,
+                                  total=Decimal(total), min_amount=Decimal('1'), max_amount=Decimal('10'),
+                                  expenses_category_id=category.pk, seller_id=seller_id)
+        self.migrate('0022_fill_breakdown_rollups')
+        rows = BreakdownRollup.objects.values_list('dimension', 'expenses_category', 'seller', 'count', 'total')
+        self.assertCountEqual(rows, [('category', category.pk, None, 3, Decimal('15')),
+                                     ('seller', None, seller.pk, 1, Decimal('10')),
+                                     ('seller', None, None, 2, Decimal('5'))])
+
+    def test_cash_flow_of_lines_saved_before_the_journal(self):
+        apps = self.migrate('0010_income_expenses_client_indexes')
+        user = apps.get_model('auth', 'User').objects.create(username='client')
+        bank = apps.get_model('portfolio', 'Bank').objects.create(owner_id=user.pk, name='SEB', balance=Decimal('1070'))
+        for model_name, amount, month in (('Income', '100', 1), ('Expenses', '30', 2)):  # the balance was 1000 before
+            apps.get_model('portfolio', model_name).objects.create(client_id=user.pk, bank_id=bank.pk,
+                                                                   amount=Decimal(amount), date=date(2023, month, 15))
+        self.migrate('0023_bankmovement_journal_start_reason')  # the journal is opened with the current balance
+        self.assertEqual(BankMovement.objects.get().reason, BankMovement.JOURNAL_START)
+        seb, total = cash_flow(User.objects.get(pk=user.pk), date(2022, 12, 1), date(2023, 3, 31))
+        self.assertEqual([str(row['balance']) for row in seb['months']], ['1000.00', '1100.00', '1070.00', '1070.00'])
+        self.assertEqual([str(row['net']) for row in total['months']], ['0.00', '100.00', '-30.00', '0.00'])
+
+
+class BalanceServiceTests(PortfolioTestCase):
+    def test_created_updated_and_deleted_lines_change_bank_balance(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        self.client.post(reverse('expenses-line-new'), {'date': '2023-01-15', 'amount': '100', 'bank': self.bank.pk})
+        line = Expenses.objects.get()
+        self.client.post(reverse('expenses-line-update', args=[line.pk]), {'date': '2023-01-15', 'amount': '40',
+                                                                            'bank': savings.pk})
+        self.bank.refresh_from_db()
+        savings.refresh_from_db()
+        self.assertEqual((self.bank.balance, savings.balance), (Decimal('1000'), Decimal('-40')))
+        Expenses.objects.get().delete()
+        savings.refresh_from_db()
+        self.assertEqual(savings.balance, Decimal('0'))
+
+    def test_move_line_inside_the_same_bank_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            move_line(1, self.bank.pk, Decimal('10'), self.bank, Decimal('25'))
+        # the balance update, the journal's movement and the check whether a snapshot is due
+        self.assertEqual([query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']],
+                         ['UPDATE', 'INSERT', 'UPDATE'])
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.balance, Decimal('1015'))
+
+    def test_transfer_with_insufficient_balance_changes_nothing(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        with self.assertRaises(InsufficientFunds):
+            transfer_between_banks(self.bank, savings, Decimal('1000.01'))
+        savings.refresh_from_db()
+        self.assertEqual(savings.balance, Decimal('0'))
+
+    def test_transfer_page_moves_funds(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        self.client.post(reverse('transfer-between_banks'), {'from_bank': self.bank.pk, 'to_bank': savings.pk,
+                                                             'amount': '250'})
+        self.client.post(reverse('transfer-inside_bank'), {'bank': savings.pk, 'source_account': 'balance',
+                                                           'to_account': 'investment', 'amount': '50'})
+        savings.refresh_from_db()
+        self.assertEqual((savings.balance, savings.investment), (Decimal('200'), Decimal('50')))
+
+    def test_batch_transfers_are_checked_in_order_and_written_at_once(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        foreign = Bank.objects.create(owner=self.other_user, name='Nordea', balance=Decimal('500'))
+        transfers = [(self.bank.pk, savings.pk, Decimal('600')), (savings.pk, self.bank.pk, Decimal('100')),
+                     (self.bank.pk, savings.pk, Decimal('600')),  # 500 left after the first two transfers
+                     (foreign.pk, savings.pk, Decimal('1')), (savings.pk, savings.pk, Decimal('1'))]
+        with CaptureQueriesContext(connection) as queries:
+            results = transfer_batch(self.user, transfers)
+        self.assertEqual([result['ok'] for result in results], [True, True, False, False, False])
+        self.assertEqual(results[2]['error'], 'Insufficient balance.')
+        # the banks, their update, the check of the debited balances, the movements and the check for snapshots, no
+        # matter how many transfers
+        self.assertEqual([query['sql'].split()[0] for query in queries if 'SAVEPOINT' not in query['sql']],
+                         ['SELECT', 'UPDATE', 'SELECT', 'INSERT', 'SELECT'])
+        for bank, balance in ((self.bank, Decimal('500')), (savings, Decimal('500')), (foreign, Decimal('500'))):
+            bank.refresh_from_db()
+            self.assertEqual(bank.balance, balance)
+            self.assertEqual(journal.rebuild_balance(bank), (balance, Decimal('0')))
+
+    def test_failed_batch_transfer_changes_nothing_when_all_or_nothing(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        results = transfer_batch(self.user, [(self.bank.pk, savings.pk, Decimal('10')),
+                                             (savings.pk, self.bank.pk, Decimal('20'))], all_or_nothing=True)
+        self.assertEqual([result['ok'] for result in results], [False, False])
+        savings.refresh_from_db()
+        self.assertEqual((savings.balance, savings.movements.count()), (Decimal('0'), 0))
+
+    def test_batch_transfers_take_journal_snapshots(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        transfer_batch(self.user, [(self.bank.pk, savings.pk, Decimal('1'))] * (journal.SNAPSHOT_INTERVAL + 5))
+        snapshot = BankSnapshot.objects.get(bank=self.bank)  # taken after the latest movement of the batch
+        self.bank.refresh_from_db()
+        self.assertEqual(snapshot.balance, Decimal('1000') - journal.SNAPSHOT_INTERVAL - 5)
+        self.assertEqual((self.bank.balance, self.bank.movements_since_snapshot), (snapshot.balance, 0))
+        self.assertEqual(journal.rebuild_balance(self.bank), (self.bank.balance, Decimal('0')))
+
+    def test_batch_is_rolled_back_when_a_debited_bank_was_withdrawn_meanwhile(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        check = balances._transfer_error
+
+        def withdrawn_meanwhile(banks, *args):  # another request takes the money while the batch is checked
+            if not BankMovement.objects.filter(bank=savings).exists():
+                transfer_between_banks(self.bank, savings, Decimal('950'))
+            return check(banks, *args)
+        with patch('portfolio.balances._transfer_error', side_effect=withdrawn_meanwhile):
+            results = transfer_batch(self.user, [(self.bank.pk, savings.pk, Decimal('100')), (self.bank.pk, 0, 1)])
+        self.assertEqual([(result['ok'], result['error']) for result in results],
+                         [(False, 'Not made, the balance of a bank was changed during the batch.'),
+                          (False, 'One or both of the banks do not exist or are not owned by you.')])
+        self.bank.refresh_from_db()
+        # the withdrawal was made in the transaction of the batch here, so it is rolled back too
+        self.assertEqual((self.bank.balance, self.bank.movements.count()), (Decimal('1000'), 1))
+
+    def test_batch_transfers_keep_changes_made_after_the_banks_were_read(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        Bank.objects.filter(pk=self.bank.pk).update(movements_since_snapshot=journal.SNAPSHOT_INTERVAL - 3)
+        check = balances._transfer_error
+
+        def line_saved_meanwhile(banks, *args):  # another request changes the bank while the batch is checked
+            if not BankMovement.objects.filter(bank=self.bank, reason=BankMovement.INCOME).exists():
+                apply_delta(self.bank, balance=Decimal('7'), reason=BankMovement.INCOME)
+            return check(banks, *args)
+        with patch('portfolio.balances._transfer_error', side_effect=line_saved_meanwhile):
+            transfer_batch(self.user, [(self.bank.pk, savings.pk, Decimal('1'))] * 3)
+        self.bank.refresh_from_db()
+        self.assertEqual((self.bank.balance, self.bank.movements_since_snapshot), (Decimal('1004'), 0))
+        snapshot = BankSnapshot.objects.get(bank=self.bank)  # the 4 movements reached the interval
+        self.assertEqual(snapshot.balance, Decimal('1004'))
+        self.assertEqual(journal.rebuild_balance(self.bank), (Decimal('1004'), Decimal('0')))
+
+
+class BankJournalTests(PortfolioTestCase):
+    def test_every_change_is_recorded(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        self.client.post(reverse('income-line-new'), {'date': '2023-01-15', 'amount': '100', 'bank': self.bank.pk})
+        transfer_between_banks(self.bank, savings, Decimal('30'))
+        self.client.post(reverse('transfer-inside_bank'), {'bank': savings.pk, 'source_account': 'balance',
+                                                           'to_account': 'investment', 'amount': '10'})
+        self.client.post(reverse('bank-update', args=[savings.pk]), {'name': 'Swedbank', 'balance': '25',
+                                                                     'investment': '10'})
+        self.assertEqual(list(savings.movements.values_list('reason', 'balance_delta', 'investment_delta')), [
+            ('transfer', Decimal('30'), Decimal('0')), ('inside', Decimal('-10'), Decimal('10')),
+            ('adjustment', Decimal('5'), Decimal('0'))])
+        self.assertEqual(list(self.bank.movements.values_list('reason', flat=True)), ['opening', 'income', 'transfer'])
+        self.assertEqual(journal.balance_at(self.bank), (Decimal('1070'), Decimal('0')))
+        self.assertEqual(journal.balance_at(savings), (Decimal('25'), Decimal('10')))
+
+    def test_movements_can_not_be_changed(self):
+        movement = self.bank.movements.get()
+        with self.assertRaises(ValueError):
+            movement.save()
+        with self.assertRaises(ValueError):
+            movement.delete()
+
+    def test_balance_at_past_moment_replays_movements_after_snapshot(self):
+        for _ in range(journal.SNAPSHOT_INTERVAL + 5):
+            apply_delta(self.bank, balance=Decimal('1'), reason=BankMovement.INCOME)
+        snapshot = BankSnapshot.objects.get()
+        self.assertEqual(snapshot.balance, Decimal('1000') + journal.SNAPSHOT_INTERVAL - 1)  # the opening is included
+        middle = self.bank.movements.order_by('id')[journal.SNAPSHOT_INTERVAL + 2]
+        with self.assertNumQueries(2):  # the latest snapshot and the sum of the movements made after it
+            balance, _ = journal.balance_at(self.bank, middle.created)
+        self.assertEqual(balance, Decimal('1000') + journal.SNAPSHOT_INTERVAL + 2)
+        self.assertEqual(journal.balance_at(self.bank, timezone.now() - timedelta(days=1)), (0, 0))
+
+    def test_rebuild_balance_repairs_stored_balance(self):
+        apply_delta(self.bank, balance=Decimal('-200'), reason=BankMovement.EXPENSES)
+        Bank.objects.filter(pk=self.bank.pk).update(balance=Decimal('1'))  # changed without the balance service
+        self.assertEqual(journal.rebuild_balance(self.bank, save=True), (Decimal('800'), Decimal('0')))
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.balance, Decimal('800'))
+
+
+class SearchTests(PortfolioTestCase):
+    def found(self, *keywords):
+        return list(search_lines(Expenses.objects.filter(client=self.user), keywords).values_list('amount', flat=True))
+
+    def test_keywords_match_word_prefixes_in_all_fields(self):
+        self.create_expenses('12.50', notes='weekly shopping')
+        self.create_expenses('30', category=self.rent, seller=None, notes='')
+        self.assertEqual(self.found('shop'), [Decimal('12.50')])
+        self.assertEqual(self.found('maxi'), [Decimal('12.50')])
+        self.assertEqual(self.found('12.50'), [Decimal('12.50')])
+        self.assertEqual(sorted(self.found('rent', 'weekly')), [Decimal('12.50'), Decimal('30')])
+        self.assertEqual(self.found('weekly rent'), [])  # words of a keyword must follow each other
+
+    def test_better_matches_come_first(self):
+        self.create_expenses('1', notes='milk')
+        self.create_expenses('2', notes='milk milk milk')
+        self.assertEqual(self.found('milk'), [Decimal('2'), Decimal('1')])
+
+    def test_documents_follow_renamed_and_deleted_names(self):
+        self.create_expenses('10')
+        self.maxima.seller = 'Rimi'
+        self.maxima.save()
+        self.assertEqual((self.found('maxima'), self.found('rimi')), ([], [Decimal('10')]))
+        self.groceries.delete()
+        self.assertEqual(self.found('groceries'), [])
+        Expenses.objects.get().delete()
+        self.assertFalse(SearchDocument.objects.exists())
+
+    def test_keyword_filter_counts_only_users_lines(self):
+        self.create_expenses('10', notes='cinema')
+        Expenses.objects.create(client=self.other_user, date=date(2023, 1, 1), amount=Decimal('1'), notes='cinema')
+        lines = Expenses.objects.filter(client=self.user)
+        self.assertEqual(lines.filter(keyword_filter(Expenses, ['cinema'])).count(), 1)
+
+    def test_rebuild_indexes_bulk_created_lines(self):
+        Income.objects.bulk_create([Income(client=self.user, date=date(2023, 1, 1), amount=Decimal('5'),
+                                           notes='dividends')])
+        self.assertEqual(rebuild_search_index(self.user), 1)
+        response = self.client.get(reverse('user-income-lines'), {'query': 'dividend'})
+        self.assertEqual(len(response.context['income_lines']), 1)
+
+
+class KeysetPaginationTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # the cached counts of found lines must not leak between the tests
+        for index in range(25):  # several lines share a date, so the pages must also be split by id
+            self.create_expenses(str(index + 1), line_date=date(2023, 1, 1) + timedelta(days=index // 3))
+        self.create_expenses('0.5', line_date=None)  # lines without a date are listed after all the others
+        self.create_expenses('0.5', line_date=None)
+
+    def page(self, **parameters):
+        response = self.client.get(reverse('user-expenses-lines'), parameters)
+        return response.context['page_obj']
+
+    def test_cursor_pages_walk_through_all_lines(self):
+        expected = list(Expenses.objects.order_by('-date', '-id').values_list('id', flat=True))
+        seen, page = [], self.page()
+        while True:
+            seen += [line.id for line in page]
+            if not page.has_next:
+                break
+            page = self.page(cursor=page.next_cursor)
+        self.assertEqual(seen, expected)
+        previous = self.page(cursor=page.previous_cursor)
+        self.assertEqual([line.id for line in previous], expected[10:20])
+        self.assertEqual([line.id for line in self.page(cursor='last')], expected[-10:])
+
+    def test_page_is_read_without_offset_and_count_is_cached(self):
+        first = self.page()
+        with CaptureQueriesContext(connection) as queries:
+            second = self.page(cursor=first.next_cursor)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('OFFSET', sql)
+        self.assertNotIn('COUNT', sql)
+        self.assertEqual(second.approximate_count, 27)
+
+    def test_search_keeps_keywords_in_links(self):
+        self.create_expenses('100', notes='cinema')
+        response = self.client.get(reverse('search-expenses-key'), {'keywords': 'cinema'})
+        self.assertEqual(response.context['page_query'], 'keywords=cinema')
+        self.assertEqual([line.amount for line in response.context['expenses']], [Decimal('100')])
+
+    def test_keyword_searches_are_ranked_on_numbered_pages(self):
+        self.create_expenses('1', notes='milk', line_date=date(2023, 3, 1))
+        self.create_expenses('2', notes='milk milk milk', line_date=date(2023, 2, 1))  # older, but a better match
+        for url, parameter in ((reverse('search-expenses-key'), 'keywords'), (reverse('user-expenses-lines'), 'query')):
+            page = self.client.get(url, {parameter: 'milk'}).context['page_obj']
+            self.assertFalse(hasattr(page, 'is_keyset'))
+            self.assertEqual([line.amount for line in page], [Decimal('2'), Decimal('1')])
+
+    def test_numbered_pages_still_work(self):
+        self.assertEqual(len(self.client.get(reverse('user-expenses-lines'), {'page': 3}).context['expenses_lines']), 7)
+        with override_settings(KEYSET_PAGINATION=False):
+            self.assertFalse(hasattr(self.page(), 'is_keyset'))
+
+
+# The number of queries of the list and search pages must not depend on the number of shown lines
+class StatementImportTests(PortfolioTestCase):
+    csv_statement = (
+        'date,amount,type,category,seller,bank,notes\n'
+        '2023-01-05,-12.50,,groceries,MAXIMA,SEB,weekly shopping\n'
+        '06/01/2023,"1500,00",income,Salary,University,SEB,\n'
+        '2023-01-07,-20,,Fuel,Circle K,Revolut,\n'
+        'yesterday,10,,,,,\n'
+        '2999-01-01,10,,,,,\n'
+    )
+
+    def test_csv_lines_are_imported_in_batches(self):
+        importer = import_statement(self.user, io.StringIO(self.csv_statement), 'csv', batch_size=2)
+        self.assertEqual((importer.counts[Income], importer.counts[Expenses], importer.rejected), (1, 2, 2))
+        self.assertEqual([number for number, _ in importer.errors], [4, 5])
+        # Existing objects are found case-insensitively, the missing ones are created once
+        expenses = Expenses.objects.get(amount=Decimal('12.50'))
+        self.assertEqual((expenses.category, expenses.seller, expenses.bank), (self.groceries, self.maxima, self.bank))
+        self.assertEqual(Income.objects.get().source, self.university)
+        revolut = Bank.objects.get(owner=self.user, name='Revolut')
+        self.assertEqual(Seller.objects.filter(client=self.user, seller='Circle K').count(), 1)
+        # One balance change per bank and batch, the rollups and the search documents are refreshed
+        self.bank.refresh_from_db()
+        revolut.refresh_from_db()
+        self.assertEqual((self.bank.balance, revolut.balance), (Decimal('2487.50'), Decimal('-20')))
+        self.assertEqual(BankMovement.objects.filter(reason=BankMovement.IMPORT).count(), 2)  # SEB and Revolut
+        self.assertEqual(journal.balance_at(self.bank), (Decimal('2487.50'), Decimal('0')))
+        report = monthly_report(Expenses, self.user, date(2023, 1, 1), date(2023, 1, 31))
+        self.assertEqual((report[0]['count'], report[0]['total']), (2, Decimal('32.50')))
+        self.assertEqual(Expenses.objects.filter(keyword_filter(Expenses, ['circle'])).count(), 1)
+
+    def test_amounts_which_are_not_numbers_are_rejected(self):
+        statement = 'date,amount\n2023-01-05,NaN\n2023-01-05,-inf\n2023-01-05,sNaN\n2023-01-05,1e400\n2023-01-05,1\n'
+        importer = import_statement(self.user, io.StringIO(statement), 'csv', batch_size=1)
+        self.assertEqual((importer.counts[Income], importer.rejected), (1, 4))
+        self.assertEqual([error for _, error in importer.errors],
+                         [f'Unknown amount {value!r}.' for value in ('NaN', '-inf', 'sNaN', '1e400')])
+
+    def test_ofx_transactions_are_imported(self):
+        statement = (
+            'OFXHEADER:100\nDATA:OFXSGML\n<OFX><SIGNONMSGSRSV1><SONRS><FI><ORG>Swedbank</FI></SONRS>'
+            '</SIGNONMSGSRSV1><BANKTRANLIST>'
+            '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20230110120000.000[-5:EST]<TRNAMT>-7.25<NAME>Lidl &amp; Co'
+            '<MEMO>bread</STMTTRN>'
+            '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20230111<TRNAMT>100.00<NAME>University</STMTTRN>'
+            '</BANKTRANLIST></OFX>'
+        )
+        import_statement(self.user, io.StringIO(statement), 'ofx')
+        expenses = Expenses.objects.get()
+        self.assertEqual((expenses.date, expenses.amount, expenses.seller.seller, expenses.notes, expenses.bank.name),
+                         (date(2023, 1, 10), Decimal('7.25'), 'Lidl & Co', 'bread', 'Swedbank'))
+        self.assertEqual(Income.objects.get().source, self.university)
+
+    def test_files_without_required_columns_are_refused(self):
+        with self.assertRaises(StatementError):
+            import_statement(self.user, io.StringIO('day,sum\n2023-01-01,1\n'), 'csv')
+        self.assertFalse(Expenses.objects.exists())
+
+    def test_upload_view_uses_the_default_bank(self):
+        statement = SimpleUploadedFile('statement.csv', b'\xef\xbb\xbfdate,amount\n2023-01-05,-5\n')
+        response = self.client.post(reverse('import-statement'), {'statement': statement, 'file_format': 'auto',
+                                                                   'bank': self.bank.pk}, follow=True)
+        self.assertContains(response, '0 income and 1 expenses lines were imported')
+        self.assertEqual(Expenses.objects.get(client=self.user).bank, self.bank)
+
+
+class ExportTests(PortfolioTestCase):
+    def download(self, response):
+        self.assertTrue(response.streaming)  # the rows are written while they are read from the database
+        self.assertIn('attachment;', response['Content-Disposition'])
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    def test_keyword_search_is_exported_as_csv(self):
+        self.create_expenses('12.50', notes='weekly shopping')
+        self.create_expenses('7', line_date=date(2023, 2, 1), notes='=cmd')
+        self.create_expenses('30', category=self.rent, seller=None, notes='')
+        rows = self.download(self.client.get(reverse('search-expenses-key'), {'keywords': 'shop, cmd',
+                                                                              'export': 'csv'}))
+        self.assertEqual(rows, ['Date,Amount,Category,Seller,Bank,Notes', "2023-02-01,7.00,Groceries,Maxima,SEB,'=cmd",
+                                '2023-01-15,12.50,Groceries,Maxima,SEB,weekly shopping'])
+
+    def test_select_search_and_archive_export_the_found_lines(self):
+        self.create_income('100')
+        self.create_income('200', line_date=date(2022, 1, 1))
+        rows = self.download(self.client.post(reverse('search-income-select'), {'start_date': '2023-01-01',
+                                                                                'export': 'csv'}))
+        self.assertEqual(rows[1:], ['2023-01-15,100.00,Salary,University,SEB,There are no additional notes'])
+        rows = self.download(self.client.post(reverse('archive-income'), {'end_date': '2022-12-31', 'export': 'csv'}))
+        self.assertEqual(rows[1:], ['2022-01-01,200.00,Salary,University,SEB,There are no additional notes'])
+
+    def test_unknown_format_is_not_found(self):
+        response = self.client.get(reverse('search-income-key'), {'export': 'pdf'})
+        self.assertEqual(response.status_code, 404)
+
+
+class BankSummaryTests(PortfolioTestCase):
+    def get_banks(self):
+        cache.clear()  # the first view reads the summary from the database
+        return self.client.get(reverse('user-banks'))
+
+    def test_cached_bank_list_reads_no_portfolio_tables(self):
+        self.get_banks()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('user-banks'))
+        self.assertEqual([query['sql'] for query in queries if 'portfolio_' in query['sql']], [])
+        self.assertContains(response, '1000.00')
+        self.assertContains(response, f'<option value="{self.bank.pk}">SEB</option>', count=3)
+
+    def test_summary_follows_balance_changes(self):
+        savings = Bank.objects.create(owner=self.user, name='Savings', balance=Decimal('50'))
+        self.assertContains(self.get_banks(), '1050.00')
+        transfer_between_banks(self.bank, savings, Decimal('100'))
+        apply_delta(savings.pk, investment=Decimal('5'))  # only the id of the bank
+        response = self.client.get(reverse('user-banks'))
+        self.assertContains(response, '<strong>1050.00</strong>')
+        self.assertContains(response, '<strong>5.00</strong>')
+        self.create_expenses('25', bank=savings).delete()  # the deleted expenses are returned to the bank
+        self.assertContains(self.client.get(reverse('user-banks')), '<strong>1075.00</strong>')
+        savings.delete()
+        self.assertContains(self.client.get(reverse('user-banks')), '<strong>900.00</strong>')
+
+    def test_summary_of_process_memory_expires_soon(self):  # the other processes do not see the data version
+        self.assertEqual(cache_timeout(SUMMARY_TIMEOUT), LOCAL_TIMEOUT)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(cache_timeout(SUMMARY_TIMEOUT), SUMMARY_TIMEOUT)
+
+
+class CachedPageTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_cached_page_reads_no_portfolio_tables(self):
+        url = reverse('user-expenses-categories')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual([query['sql'] for query in queries if 'portfolio_' in query['sql']], [])
+        self.assertContains(response, 'Groceries')
+
+    def test_changes_and_messages_are_not_served_from_the_cache(self):
+        url = reverse('user-expenses-categories')
+        self.client.get(url)
+        response = self.client.post(reverse('expenses-category-update', args=[self.groceries.pk]),
+                                    {'definition': 'Food'}, follow=True)
+        self.assertContains(response, 'Food')
+        self.assertContains(response, 'updated successfully')
+        response = self.client.get(url)
+        self.assertContains(response, 'Food')
+        self.assertNotContains(response, 'updated successfully')  # the message was shown only once
+
+    def test_pages_are_cached_per_user(self):
+        self.client.get(reverse('home'))
+        self.client.force_login(self.other_user)
+        self.assertContains(self.client.get(reverse('home')), 'other')
+
+
+@override_settings(THUMBNAILS_ASYNC=False)
+class ProfilePhotoTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def upload(self, name, size=(640, 480)):
+        output = io.BytesIO()
+        PILImage.new('RGB', size, 'red').save(output, 'JPEG')
+        return SimpleUploadedFile(name, output.getvalue(), content_type='image/jpeg')
+
+    def test_new_photo_is_resized_after_the_commit(self):
+        profile = self.user.profile
+        with self.captureOnCommitCallbacks(execute=True):
+            profile.photo = self.upload('me.jpg')
+            profile.save()
+        profile.refresh_from_db()
+        self.assertEqual(profile.photo_processed, profile.photo.name)
+        for size in Profile.PHOTO_SIZES:
+            with PILImage.open(os.path.join(self.media.name, profile.photo_variant_name(size))) as image:
+                self.assertEqual(image.size, (size, size * 3 // 4))
+        self.assertIn(profile.photo_digest, profile.photo_200_url)
+        # The same content uploaded again shares the copies, logins and other saves do not process the photo
+        other = self.other_user.profile
+        with self.captureOnCommitCallbacks(execute=True):
+            other.photo = self.upload('copy.jpg')
+            other.save()
+        other.refresh_from_db()
+        self.assertEqual(other.photo_200_url, profile.photo_200_url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.login(username='client', password='secret-password')
+        self.assertFalse([query for query in queries if 'portfolio_profile' in query['sql']])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertEqual(process_photo(profile.pk), 0)
+
+    def test_original_photo_is_shown_until_processed(self):
+        profile = self.user.profile
+        with self.captureOnCommitCallbacks(execute=False):
+            profile.photo = self.upload('me.jpg')
+            profile.save()
+        self.assertEqual(profile.photo_200_url, profile.photo.url)
+
+
+class StoredFileTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def attach(self, line, name, content=b'%PDF-1.4 statement'):
+        line.pdf = SimpleUploadedFile(name, content, content_type='application/pdf')
+        line.save()
+        return line.pdf.name
+
+    def test_same_content_is_stored_once_and_deleted_with_its_last_line(self):
+        first = self.attach(self.create_expenses('10'), 'hello.pdf')
+        second = self.attach(self.create_income('20'), 'hello_copy.pdf')
+        self.assertEqual(first, second)
+        self.assertTrue(first.startswith('blobs/'))
+        self.assertEqual(StoredBlob.objects.get().references, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            Expenses.objects.get().delete()
+        self.assertTrue(pdf_storage.exists(first))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.attach(Income.objects.get(), 'other.pdf', b'%PDF-1.4 other')  # the replaced file is released
+        self.assertFalse(pdf_storage.exists(first))
+        self.assertEqual(list(StoredBlob.objects.values_list('references', flat=True)), [1])
+
+    def test_upload_of_released_content_keeps_the_file(self):
+        name = self.attach(self.create_expenses('10'), 'hello.pdf')
+        with self.captureOnCommitCallbacks() as callbacks:
+            Expenses.objects.get().delete()  # the file is deleted after the commit ...
+            self.assertEqual(self.attach(self.create_income('20'), 'again.pdf'), name)  # ... unless it is reused
+        for callback in callbacks:
+            callback()
+        self.assertTrue(pdf_storage.exists(name))
+        self.attach(Income.objects.get(), 'same.pdf')  # the same content uploaded to the same line
+        self.assertEqual(StoredBlob.objects.get().references, 1)
+
+    def test_legacy_documents_are_moved_and_orphans_deleted(self):
+        line = self.create_expenses('10')
+        default_storage.save('expenses_pdfs/hello.pdf', ContentFile(b'%PDF-1.4 hello'))  # not by its content
+        Expenses.objects.filter(pk=line.pk).update(pdf='expenses_pdfs/hello.pdf')
+        orphan = default_storage.save('blobs/00/orphan.pdf', ContentFile(b'%PDF-1.4 orphan'))
+        os.utime(pdf_storage.path(orphan), (0, 0))  # older than the grace period
+        self.assertEqual(store_legacy_documents(), 1)
+        self.assertEqual(recount_references(), 1)
+        line.refresh_from_db()
+        self.assertTrue(pdf_storage.exists(line.pdf.name))
+        self.assertFalse(pdf_storage.exists('expenses_pdfs/hello.pdf'))
+        self.assertFalse(pdf_storage.exists(orphan))
+        self.assertEqual(StoredBlob.objects.get().name, line.pdf.name)
+
+
+class DocumentDownloadTests(PortfolioTestCase):
+    content = b'%PDF-1.4 ' + b'x' * 1000
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.line = self.create_income('20')
+        self.line.pdf = SimpleUploadedFile('statement.pdf', self.content, content_type='application/pdf')
+        self.line.save()
+        self.url = reverse('income-line-pdf', args=[self.line.pk])
+
+    def test_only_the_owner_gets_the_document(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertContains(self.client.get(reverse('income-line-detail', args=[self.line.pk])), self.url)
+        self.client.force_login(self.other_user)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_ranges_and_unchanged_documents(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=4-8')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 4-8/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[4:9])
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-3:])
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=5000-').status_code, 416)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    @override_settings(PDF_SENDFILE='x-accel-redirect')
+    def test_the_web_server_sends_the_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.line.pdf.name)
+        self.assertEqual(response.content, b'')
+
+
+class ApiTests(PortfolioTestCase):
+    def test_fields_and_cursor_pages(self):
+        lines = [self.create_expenses(amount, line_date=date(2023, 1, day)) for day, amount in ((1, '5'), (2, '6'),
+                                                                                               (3, '7'))]
+        Expenses.objects.create(client=self.other_user, date=date(2023, 1, 4), amount=Decimal('8'))
+        url = reverse('api-list', args=['expenses'])
+        data = self.client.get(url, {'fields': 'date,amount,bank', 'limit': 2}).json()
+        self.assertEqual(data['results'], [{'date': '2023-01-03', 'amount': '7.00', 'bank': 'SEB'},
+                                           {'date': '2023-01-02', 'amount': '6.00', 'bank': 'SEB'}])
+        data = self.client.get(data['next']).json()
+        self.assertEqual([row['amount'] for row in data['results']], ['5.00'])
+        self.assertIsNone(data['next'])
+        self.assertEqual(self.client.get(data['previous']).json()['results'][0]['amount'], '7.00')
+        detail = self.client.get(reverse('api-detail', args=['expenses', lines[0].pk]), {'fields': 'id'}).json()
+        self.assertEqual(detail, {'id': lines[0].pk})
+        self.assertEqual(self.client.get(url, {'fields': 'password'}).status_code, 400)
+
+    def test_other_users_and_anonymous_requests(self):
+        category = ExpensesCategory.objects.create(client=self.other_user, definition='Hidden')
+        rows = self.client.get(reverse('api-list', args=['expenses_categories'])).json()['results']
+        self.assertNotIn('Hidden', [row['definition'] for row in rows])
+        self.assertEqual(self.client.get(reverse('api-detail', args=['expenses_categories', category.pk])).status_code,
+                         404)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api-list', args=['banks'])).status_code, 401)
+
+    def test_unchanged_data_is_not_read_again(self):
+        url = reverse('api-list', args=['banks'])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['results'][0]['name'], 'SEB')
+        with self.assertNumQueries(1):  # the user only (the session is cached)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        Bank.objects.create(owner=self.user, name='Swedbank')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_batch_transfers(self):
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        url = reverse('api-transfers')
+        response = self.client.post(url, {'transfers': [
+            {'from_bank': self.bank.pk, 'to_bank': savings.pk, 'amount': '250.50'},
+            {'from_bank': savings.pk, 'to_bank': self.bank.pk, 'amount': 300}]}, content_type='application/json')
+        self.assertEqual(response.json()['made'], 1)
+        self.assertEqual(response.json()['results'][0], {'from_bank': self.bank.pk, 'to_bank': savings.pk,
+                                                         'amount': '250.50', 'ok': True, 'error': None})
+        savings.refresh_from_db()
+        self.assertEqual(savings.balance, Decimal('250.50'))
+        for body in ({'transfers': [{'from_bank': self.bank.pk, 'to_bank': savings.pk, 'amount': '0.001'}]},
+                     {'transfers': []}, [1, 2]):
+            self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+
+@override_settings(REQUEST_METRICS=True, REQUEST_METRICS_BATCH=1)
+class RequestMetricsTests(PortfolioTestCase):
+    def test_request_is_measured_per_url_name(self):
+        response = self.client.get(reverse('user-expenses-lines'))
+        self.assertRegex(response['Server-Timing'],
+                         r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries, \d+ duplicates"$')
+        metric = RequestMetric.objects.get()
+        self.assertEqual((metric.url_name, metric.status), ('user-expenses-lines', 200))
+        self.assertGreater(metric.queries, 0)
+
+    def test_repeated_queries_are_counted_as_duplicates(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(3):
+                Bank.objects.filter(owner=self.user).count()
+            Bank.objects.filter(owner=self.other_user).count()  # other parameters, not a duplicate
+        self.assertEqual((recorder.queries, recorder.duplicates), (4, 2))
+
+    def test_percentiles_page_for_staff_and_json_report(self):
+        self.client.get(reverse('user-expenses-lines'))
+        self.assertEqual(self.client.get(reverse('request-metrics')).status_code, 302)  # to the login of the admin
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertContains(self.client.get(reverse('request-metrics')), 'user-expenses-lines')
+        output = io.StringIO()
+        call_command('request_metrics', stdout=output)
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['user-expenses-lines']['requests'], 1)
+        self.assertEqual(list(report['user-expenses-lines']['latency']), ['p50', 'p95', 'p99'])
+        self.assertEqual([percentile(list(range(1, 101)), percent) for percent in (50, 95, 99)], [50, 95, 99])
+
+    def test_clear_deletes_only_the_reported_requests(self):
+        old = RequestMetric.objects.create(url_name='home', status=200, latency=1, queries=1, sql_time=1, duplicates=0)
+        RequestMetric.objects.filter(pk=old.pk).update(created=timezone.now() - timedelta(days=5))
+        self.client.get(reverse('user-expenses-lines'))
+        call_command('request_metrics', days=1, clear=True, stdout=io.StringIO())
+        self.assertEqual(list(RequestMetric.objects.values_list('url_name', flat=True)), ['home'])
+
+    @override_settings(REQUEST_METRICS_BATCH=2)
+    def test_batch_is_written_after_the_response(self):
+        with patch.object(RequestMetric.objects, 'bulk_create', wraps=RequestMetric.objects.bulk_create) as write:
+            self.client.get(reverse('user-expenses-lines'))
+            self.assertFalse(write.called)
+            self.client.get(reverse('user-expenses-lines'))  # written when the server closes the response
+            self.assertEqual(write.call_count, 1)
+        self.assertEqual(RequestMetric.objects.count(), 2)
+
+
+class SyntheticDataTests(TestCase):
+    def test_generated_clients_are_consistent_and_measured(self):
+        call_command('generate_data', users=2, lines=200, years=2, prefix='load', stdout=io.StringIO())
+        user = User.objects.get(username='load_0')
+        self.assertEqual(Expenses.objects.filter(client=user).count() + Income.objects.filter(client=user).count(),
+                         200 + len(list(paydays(date.today(), 24))))  # and the salaries of two years
+        for bank in Bank.objects.filter(owner=user):  # balances are the totals of the lines and match the journal
+            self.assertEqual(journal.rebuild_balance(bank), (bank.balance, bank.investment))
+        self.assertEqual(SearchDocument.objects.filter(expenses__client=user).count(),
+                         Expenses.objects.filter(client=user).count())
+        self.assertTrue(MonthlyRollup.objects.filter(client=user).exists())
+
+        baseline = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(os.remove, baseline)
+        call_command('benchmark_endpoints', user='load_0', repeat=1, output=baseline, stdout=io.StringIO())
+        with open(baseline) as baseline_file:
+            pages = json.load(baseline_file)['pages']
+        self.assertEqual({page['status'] for page in pages.values()}, {200})
+        self.assertEqual(pages['Expenses list']['queries'], 3)
+        call_command('benchmark_endpoints', user='load_0', repeat=1, compare=baseline, tolerance=100,
+                     stdout=io.StringIO())
+
+
+class AnalyticsTests(PortfolioTestCase):
+    def create_months(self):  # income of 100 every month of 2022 and the first two months of 2023
+        for month in range(14):
+            self.create_income('100', line_date=date(2022 + month // 12, month % 12 + 1, 10))
+        self.create_expenses('40', line_date=date(2022, 1, 20))
+        self.create_expenses('70', line_date=date(2023, 1, 20))
+
+    @skipIf(analytics.np is None, 'numpy is not installed')
+    def test_trends_of_the_period(self):
+        self.create_months()
+        result = trends(self.user, date(2022, 1, 1), date(2023, 2, 28), horizon=2)
+        months = result['months']
+        self.assertEqual([months[0]['month'], months[-1]['month'], len(months)], ['2022-01', '2023-02', 14])
+        self.assertEqual((months[1]['income_avg_3'], months[2]['income_avg_3']), (None, 100.0))
+        self.assertEqual((months[11]['expenses_avg_12'], months[11]['expenses_yoy']), (round(40 / 12, 2), None))
+        self.assertEqual((months[12]['expenses_yoy'], months[12]['savings_yoy'], months[12]['savings']),
+                         (30.0, -30.0, 30.0))
+        self.assertEqual((months[0]['savings_rate'], months[1]['savings_rate']), (60.0, 100.0))
+        self.assertEqual([(row['month'], row['income']) for row in result['forecast']],
+                         [('2023-03', 100.0), ('2023-04', 100.0)])
+
+    @skipIf(analytics.np is None, 'numpy is not installed')
+    def test_trends_match_the_per_line_loop(self):
+        self.create_months()
+        self.create_expenses('12.34', line_date=date.today())
+        output = io.StringIO()
+        call_command('benchmark_analytics', user='client', repeat=1, stdout=output)
+        self.assertIn(' 0 different values', output.getvalue())
+
+    @skipIf(analytics.np is None, 'numpy is not installed')
+    def test_archive_page_and_api(self):
+        self.create_months()
+        response = self.client.post(reverse('archive-expenses'), {'start_date_report': '2022-06-01',
+                                                                  'end_date_report': '2022-12-31'})
+        self.assertEqual([row['month'] for row in response.context['trends']['months']][:2], ['2022-06', '2022-07'])
+        response = self.client.get(reverse('api-trends'), {'start': '2023-01-01', 'end': '2023-01-31', 'forecast': 0})
+        self.assertEqual(response.json()['months'][0]['savings'], 30.0)
+        self.assertEqual(response.json()['forecast'], [])
+        self.assertEqual(self.client.get(reverse('api-trends'), {'forecast': 100}).status_code, 400)
+
+    def test_pages_without_numpy(self):
+        with patch.object(analytics, 'np', None):
+            self.assertContains(self.client.get(reverse('archive-income')), 'require the numpy package')
+            self.assertEqual(self.client.get(reverse('api-trends')).status_code, 501)
+
+
+class CashFlowTests(PortfolioTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()  # the bank summary with the current balances must not leak between the tests
+        # the bank was opened before the lines of the tests
+        BankMovement.objects.filter(bank=self.bank).update(created=timezone.make_aware(datetime(2022, 12, 1)))
+
+    def add_line(self, amount, line_date, bank=None, income=True):  # the balance is changed like in the create view
+        create = self.create_income if income else self.create_expenses
+        line = create(amount, line_date=line_date, bank=bank or self.bank)
+        apply_delta(line.bank, balance=Decimal(amount) if income else -Decimal(amount),
+                    reason=BankMovement.INCOME if income else BankMovement.EXPENSES)
+
+    def test_months_and_balances_of_the_banks(self):
+        self.add_line('100', date(2023, 1, 15))
+        self.add_line('30', date(2023, 2, 15), income=False)
+        self.create_income('5', line_date=date(2023, 1, 20), bank=None)
+        savings = Bank.objects.create(owner=self.user, name='Swedbank', balance=Decimal('0'))
+        transfer_between_banks(self.bank, savings, Decimal('200'))
+        BankMovement.objects.filter(reason=BankMovement.TRANSFER).update(
+            created=timezone.make_aware(datetime(2023, 3, 10)))
+        BankMovement.objects.filter(bank=savings, reason=BankMovement.OPENING).update(
+            created=timezone.make_aware(datetime(2022, 12, 1)))
+        self.bank.refresh_from_db()
+        self.assertEqual(self.bank.balance, Decimal('870'))
+
+        seb, swedbank, without_bank, total = cash_flow(self.user, date(2023, 1, 1), date(2023, 3, 31))
+        self.assertEqual((seb['bank'], swedbank['bank'], without_bank['bank'], total['total']),
+                         (self.bank, savings, None, True))
+        self.assertEqual([(row['income'], row['expenses'], row['net'], row['balance']) for row in seb['months']],
+                         [(100, 0, 100, 1100), (0, 30, -30, 1070), (0, 0, 0, 870)])
+        self.assertEqual([row['balance'] for row in swedbank['months']], [0, 0, 200])
+        self.assertEqual([(row['income'], row['balance']) for row in without_bank['months']],
+                         [(5, None), (0, None), (0, None)])
+        self.assertEqual([(row['month'], row['income'], row['net'], row['balance']) for row in total['months']],
+                         [(date(2023, 1, 1), 105, 105, 1100), (date(2023, 2, 1), 0, -30, 1070),
+                          (date(2023, 3, 1), 0, 0, 1070)])
+
+    def test_later_lines_are_taken_off_the_balance(self):
+        self.add_line('50', date(2023, 5, 1), income=False)
+        report = cash_flow(self.user, date(2023, 1, 1), date(2023, 2, 28))
+        self.assertEqual(len(report), 2)  # the bank and the total
+        self.assertEqual([row['balance'] for row in report[0]['months']], [1000, 1000])
+        self.assertEqual(Bank.objects.get(pk=self.bank.pk).balance, Decimal('950'))
+
+    def test_cash_flow_page(self):
+        self.add_line('100', date.today())
+        response = self.client.get(reverse('cash-flow'))
+        self.assertEqual(len(response.context['reports'][0]['months']), 12)
+        self.assertEqual(response.context['reports'][0]['months'][-1]['balance'], Decimal('1100'))
+        self.assertContains(response, 'All banks')
+        response = self.client.get(reverse('cash-flow'), {'start_date': '2023-02-01', 'end_date': '2023-01-01'})
+        self.assertEqual(response.context['reports'], [])
+
+    def test_cash_flow_period_is_at_most_ten_years(self):
+        for start in ('0001-01-01', (date.today() - timedelta(days=3700)).isoformat()):  # the end is today by default
+            response = self.client.get(reverse('cash-flow'), {'start_date': start})
+            self.assertEqual(response.context['reports'], [])
+            self.assertContains(response, 'The period can be at most 10 years long.')
+        response = self.client.get(reverse('cash-flow'), {'start_date': '2014-01-01', 'end_date': '2023-12-31'})
+        self.assertEqual(len(response.context['reports'][0]['months']), 120)
+
+
+class QueryCountTests(PortfolioTestCase):
+    def add_lines(self, number):  # every line gets its own category, seller, source and bank
+        for index in range(number):
+            bank = Bank.objects.create(owner=self.user, name=f'Bank {index}', balance=Decimal('0'))
+            self.create_expenses('10', bank=bank, category=ExpensesCategory.objects.create(client=self.user),
+                                 seller=Seller.objects.create(client=self.user, seller=f'Seller {index}'))
+            self.create_income('10', bank=bank, category=IncomeCategory.objects.create(client=self.user),
+                               source=IncomeSource.objects.create(earner=self.user, source=f'Source {index}'))
+
+    def count_queries(self, url, data=None):
+        cache.clear()  # every request counts the found lines again
+        with CaptureQueriesContext(connection) as queries:
+            response = (self.client.post(url, data) if data else self.client.get(url))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def assertConstantQueries(self, url, data=None):
+        self.add_lines(1)
+        few = self.count_queries(url, data)
+        self.add_lines(9)
+        self.assertEqual(self.count_queries(url, data), few)
+
+    def test_expenses_list(self):
+        self.assertConstantQueries(reverse('user-expenses-lines'))
+
+    def test_line_is_read_once_for_the_owner_check_and_the_form(self):
+        line = self.create_expenses('10')
+        for kind, url in (('expenses', reverse('expenses-line-update', args=[line.pk])),
+                          ('expenses', reverse('expenses-line-delete', args=[line.pk])),
+                          ('seller', reverse('seller-update', args=[line.seller_id]))):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            table = f'FROM "portfolio_{kind}"'
+            self.assertEqual(len([query for query in queries if table in query['sql']]), 1, url)
+
+    def test_previous_line_is_read_for_the_log_only_when_it_is_enabled(self):
+        line = self.create_expenses('10')
+        url = reverse('expenses-line-update', args=[line.pk])
+
+        def update(amount):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {'date': '2023-01-15', 'amount': amount, 'bank': self.bank.pk})
+            self.assertEqual(response.status_code, 302)
+            return len(queries)
+
+        update('20')  # the session and the caches are read once
+        silent = update('30')
+        with self.assertLogs('portfolio.views_ledger', 'DEBUG') as logs:
+            logged = update('40')
+        self.assertIn('previous_amount=30.00 amount=40', logs.output[0])
+        self.assertGreater(logged, silent)
+
+    def test_archive_report_is_not_read_again_for_the_log(self):
+        self.add_lines(1)
+        url, data = reverse('archive-expenses'), {'start_date_report': '2023-01-01', 'end_date_report': '2023-02-28'}
+        silent = self.count_queries(url, data)
+        with self.assertLogs('portfolio.views_ledger', 'DEBUG') as logs:
+            logged = self.count_queries(url, data)
+        self.assertIn("months={'2023-01'", logs.output[0])
+        self.assertEqual(logged, silent)
+
+    def test_income_list(self):
+        self.assertConstantQueries(reverse('user-income-lines'))
+
+    def test_expenses_keyword_search(self):
+        self.assertConstantQueries(reverse('search-expenses-key') + '?keywords=additional')
+
+    def test_income_keyword_search(self):
+        self.assertConstantQueries(reverse('search-income-key') + '?keywords=additional')
+
+    def test_expenses_select_search(self):
+        self.assertConstantQueries(reverse('search-expenses-select'), {'start_date': '2023-01-01'})
+
+    def test_income_select_search(self):
+        self.assertConstantQueries(reverse('search-income-select'), {'start_date': '2023-01-01'})
+
+    def test_expenses_archive(self):
+        self.assertConstantQueries(reverse('archive-expenses'), {'start_date': '2023-01-01'})
+
+    def test_income_archive(self):
+        self.assertConstantQueries(reverse('archive-income'), {'start_date': '2023-01-01'})
+
+    def test_breakdown(self):
+        self.assertConstantQueries(reverse('expenses-breakdown') + '?start_date=2023-01-10')
+
+    def test_cash_flow(self):
+        self.assertConstantQueries(reverse('cash-flow') + '?start_date=2023-01-01&end_date=2023-03-31')
+
+    def test_choices_are_read_once_for_both_forms(self):
+        self.add_lines(3)
+        seller, source = Seller.objects.last(), IncomeSource.objects.last()
+        for kind, party, tables in (('expenses', seller, ('seller', 'expensescategory', 'bank')),
+                                    ('income', source, ('incomesource', 'incomecategory', 'bank'))):
+            url = reverse(f'search-{kind}-select')
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(url, {'start_date': '2023-01-01', 'source': party.pk})
+            self.assertContains(response, f'<option value="{party.pk}" selected>')
+            for table in tables:  # validated and rendered in two forms, read once
+                sql = f'FROM "portfolio_{table}"'
+                self.assertEqual(len([query for query in queries if sql in query['sql']]), 1, (url, table))
+
+    def test_choices_of_another_user_are_rejected(self):
+        foreign = Bank.objects.create(owner=self.other_user, name='Nordea', balance=Decimal('0'))
+        form = SearchSelectExpensesForm(self.user, {'bank': foreign.pk})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(form.errors['bank'][0].split('.')[0], 'Select a valid choice')
+        self.assertNotIn('Nordea', str(form['bank']))
+
+
+# Many clients post lines and transfers at the same time, no change of the bank balance may be lost
+@override_settings(THUMBNAILS_ASYNC=False)
+class ConcurrentBalanceTests(TransactionTestCase):
+    threads = 8
+    posts_per_thread = 10
+
+    def setUp(self):  # the copies of the new user's default profile photo are made in a temporary directory
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        os.makedirs(os.path.join(media.name, 'profile_pics'))
+        shutil.copy(os.path.join(settings.MEDIA_ROOT, 'profile_pics', 'default.png'),
+                    os.path.join(media.name, 'profile_pics'))
+        override = override_settings(MEDIA_ROOT=media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_no_lost_updates_under_concurrent_posts(self):
+        user = User.objects.create_user(username='client', password='secret-password')
+        bank = Bank.objects.create(owner=user, name='SEB', balance=Decimal('0'))
+        other_bank = Bank.objects.create(owner=user, name='Swedbank', balance=Decimal('100000'))
+        barrier = threading.Barrier(self.threads)
+        errors = []
+
+        def post_lines(number):
+            try:
+                client = Client()
+                client.force_login(user)
+                barrier.wait()  # all threads start posting at the same moment
+                for _ in range(self.posts_per_thread):
+                    url, data = (('income-line-new', {'date': '2023-01-15', 'amount': '10', 'bank': bank.pk})
+                                 if number % 2 else
+                                 ('transfer-between_banks', {'from_bank': other_bank.pk, 'to_bank': bank.pk,
+                                                             'amount': '1'}))
+                    client.post(reverse(url), data)
+            except Exception as error:  # errors of the threads are reported by the main thread
+                errors.append(error)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=post_lines, args=(number,)) for number in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        posts = self.threads // 2 * self.posts_per_thread
+        bank.refresh_from_db()
+        other_bank.refresh_from_db()
+        self.assertEqual(Income.objects.count(), posts)
+        self.assertEqual(bank.balance, posts * 10 + posts * 1)
+        self.assertEqual(other_bank.balance, 100000 - posts)
+
+    def test_batch_transfers_do_not_overdraw_a_bank_withdrawn_at_the_same_time(self):
+        user = User.objects.create_user(username='client', password='secret-password')
+        bank = Bank.objects.create(owner=user, name='SEB', balance=Decimal('100'))
+        other_bank = Bank.objects.create(owner=user, name='Swedbank', balance=Decimal('0'))
+        barrier = threading.Barrier(self.threads)
+        made, errors = [], []
+
+        def transfer(number):
+            try:
+                barrier.wait()  # all threads start transferring at the same moment
+                for _ in range(self.posts_per_thread):
+                    if number % 2:
+                        try:
+                            made.extend(result['ok'] for result in transfer_batch(
+                                user, [(bank.pk, other_bank.pk, Decimal('1'))] * 3))
+                        except OperationalError:  # SQLite does not let a reading transaction write after another one
+                            pass
+                    else:
+                        try:
+                            transfer_between_banks(bank, other_bank, Decimal('1'))
+                            made.append(True)
+                        except InsufficientFunds:
+                            made.append(False)
+            except Exception as error:  # errors of the threads are reported by the main thread
+                errors.append(error)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=transfer, args=(number,)) for number in range(self.threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        bank.refresh_from_db()
+        other_bank.refresh_from_db()
+        self.assertEqual((bank.balance, other_bank.balance), (Decimal('100') - sum(made), sum(made)))
+        self.assertGreaterEqual(bank.balance, 0)  # more money was asked for than there was
+        self.assertEqual(journal.rebuild_balance(bank), (bank.balance, Decimal('0')))
@@ -0,0 +1,101 @@
+"""
+Background processing of profile photos. The uploaded photo is kept as it is and pre-sized copies (Profile.PHOTO_SIZES,
+e.g. 40, 200 and 300 pixels) are made by a small thread pool after the transaction which saved the new photo is
+committed, so no image is decoded during the login and profile requests. The pages show the original photo until the
+copies are ready (Profile.photo_variant_url()).
+
+The copies are stored under the SHA-256 digest of the photo's content ('profile_pics/sized/3f/3f9c...e1_200.jpg'), so
+the same photo uploaded twice (e.g. the default photo of all users) is processed and stored only once, and the browsers
+can keep the copies for as long as they like. Photos are processed only when Profile.photo differs from
+Profile.photo_processed, i.e. when a new photo was uploaded.
+
+With the THUMBNAILS_ASYNC setting off the copies are made right after the commit in the same thread (e.g. for scripts).
+The 'process_profile_photos' management command makes the missing copies of the existing profiles.
+"""
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image
+from .models import Profile
+from .caching import data_changed
+
+logger = logging.getLogger(__name__)
+
+WORKERS = 2  # threads making the copies
+CHUNK_SIZE = 65536  # bytes of the photo read at once while its digest is calculated
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='thumbnails')
+    return _executor
+
+
+def schedule_photo(profile_id):  # the copies are made after the commit, in the pool unless THUMBNAILS_ASYNC is off
+    if getattr(settings, 'THUMBNAILS_ASYNC', True):
+        transaction.on_commit(lambda: _get_executor().submit(_process_safely, profile_id, in_thread=True))
+    else:
+        transaction.on_commit(lambda: _process_safely(profile_id))
+
+
+def _process_safely(profile_id, in_thread=False):
+    try:
+        process_photo(profile_id)
+    except Exception:  # a missing or unreadable image only leaves the original photo shown
+        logger.exception('Profile photo %s could not be processed.', profile_id)
+    finally:
+        if in_thread:
+            connection.close()  # every thread has its own database connection
+
+
+def file_digest(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks(CHUNK_SIZE):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _resized(image, size, image_format):
+    copy = image.copy()
+    copy.thumbnail((size, size))
+    if image_format == 'JPEG' and copy.mode not in ('RGB', 'L'):
+        copy = copy.convert('RGB')
+    output = io.BytesIO()
+    copy.save(output, image_format)
+    return ContentFile(output.getvalue())
+
+
+def process_photo(profile_id):
+    """
+    Makes the missing pre-sized copies of the profile's photo and records them in the profile. Returns the number of
+    copies made (zero if the photo was already processed or has been replaced meanwhile).
+    """
+    profile = Profile.objects.filter(pk=profile_id).first()
+    if profile is None or not profile.photo or profile.photo.name == profile.photo_processed:
+        return 0
+    name, storage = profile.photo.name, profile.photo.storage
+    with storage.open(name, 'rb') as file:
+        profile.photo_processed, profile.photo_digest = name, file_digest(file)
+        made = 0
+        file.seek(0)
+        with Image.open(file) as image:
+            image_format = 'PNG' if profile.photo_variant_name(0).endswith('.png') else 'JPEG'
+            for size in Profile.PHOTO_SIZES:
+                variant = profile.photo_variant_name(size)
+                if not storage.exists(variant):  # the copies of the same content are shared
+                    saved = storage.save(variant, _resized(image, size, image_format))
+                    if saved != variant:  # the same copy was made meanwhile by another thread
+                        storage.delete(saved)
+                    made += 1
+    # Only if the photo was not replaced while its copies were made
+    if Profile.objects.filter(pk=profile_id, photo=name).update(photo_processed=name,
+                                                                photo_digest=profile.photo_digest):
+        data_changed(profile.user_id)  # the cached pages show the new copies
+    return made
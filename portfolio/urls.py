@@ -1,6 +1,10 @@
 from django.urls import path
-from . import views, views_income, views_expenses, views_income_associated, views_expenses_associated, \
-    views_income_search, views_expenses_search, views_banks, views_income_archive, views_expenses_archive
+from . import views, views_banks, views_import, views_downloads, views_api, views_metrics
+from .ledgers import INCOME, EXPENSES, INCOME_CATEGORIES, INCOME_SOURCES, EXPENSES_CATEGORIES, SELLERS
+from .views_ledger import (LineListView, LineDetailView, LineCreateView, LineUpdateView, LineDeleteView,
+                           LineKeywordSearchView, search_select_lines, archive_report, breakdown_report,
+                           CatalogueListView, CatalogueDetailView, CatalogueCreateView, CatalogueUpdateView,
+                           CatalogueDeleteView)
 
 urlpatterns = [
     path('', views.home, name='home'),  # For 'home page' view
@@ -8,20 +12,20 @@ urlpatterns = [
     path('profile/', views.profile, name='profile'),
 
     # For Income lines, CRUD functionality, list and detail views provided:
-    path('income_line/new', views_income.IncomeByUserCreateView.as_view(), name='income-line-new'),
-    path('my_income_lines/', views_income.ListedIncomeByUserListView.as_view(), name='user-income-lines'),
-    path('my_income_lines/<int:pk>', views_income.IncomeByUserDetailView.as_view(), name='income-line-detail'),
-    path('income_line/<int:pk>/update', views_income.IncomeByUserUpdateView.as_view(), name='income-line-update'),
-    path('income_line/<int:pk>/delete', views_income.IncomeByUserDeleteView.as_view(), name='income-line-delete'),
+    path('income_line/new', LineCreateView.as_view(ledger=INCOME), name='income-line-new'),
+    path('my_income_lines/', LineListView.as_view(ledger=INCOME), name='user-income-lines'),
+    path('my_income_lines/<int:pk>', LineDetailView.as_view(ledger=INCOME), name='income-line-detail'),
+    path('my_income_lines/<int:pk>/pdf', views_downloads.income_document, name='income-line-pdf'),
+    path('income_line/<int:pk>/update', LineUpdateView.as_view(ledger=INCOME), name='income-line-update'),
+    path('income_line/<int:pk>/delete', LineDeleteView.as_view(ledger=INCOME), name='income-line-delete'),
 
     # For Expenses lines, CRUD functionality, list and detail views provided:
-    path('expenses_line/new', views_expenses.ExpensesByUserCreateView.as_view(), name='expenses-line-new'),
-    path('my_expenses_lines/', views_expenses.ListedExpensesByUserListView.as_view(), name='user-expenses-lines'),
-    path('my_expenses_lines/<int:pk>', views_expenses.ExpensesByUserDetailView.as_view(), name='expenses-line-detail'),
-    path('expenses_line/<int:pk>/update', views_expenses.ExpensesByUserUpdateView.as_view(),
-         name='expenses-line-update'),
-    path('expenses_line/<int:pk>/delete', views_expenses.ExpensesByUserDeleteView.as_view(),
-         name='expenses-line-delete'),
+    path('expenses_line/new', LineCreateView.as_view(ledger=EXPENSES), name='expenses-line-new'),
+    path('my_expenses_lines/', LineListView.as_view(ledger=EXPENSES), name='user-expenses-lines'),
+    path('my_expenses_lines/<int:pk>', LineDetailView.as_view(ledger=EXPENSES), name='expenses-line-detail'),
+    path('my_expenses_lines/<int:pk>/pdf', views_downloads.expenses_document, name='expenses-line-pdf'),
+    path('expenses_line/<int:pk>/update', LineUpdateView.as_view(ledger=EXPENSES), name='expenses-line-update'),
+    path('expenses_line/<int:pk>/delete', LineDeleteView.as_view(ledger=EXPENSES), name='expenses-line-delete'),
 
     # For Bank objects, CRUD functionality, list and detail views provided:
     path('bank/new', views_banks.BankByUserCreateView.as_view(), name='bank-new'),
@@ -33,61 +37,71 @@ urlpatterns = [
     # For transfers between Bank 'accounts', two types - inside bank (among balance and investment) and between banks:
     path('transfer_inside_bank/', views_banks.transfer_inside_bank, name='transfer-inside_bank'),
     path('transfer_between_banks/', views_banks.transfer_between_banks, name='transfer-between_banks'),
+    # Monthly income, expenses, net cash flow and balance of every bank (more about it in cashflow.py):
+    path('cash_flow/', views_banks.cash_flow_report, name='cash-flow'),
+
+    # For importing Income and Expenses lines from bank statements (CSV or OFX files):
+    path('import_statement/', views_import.import_statement_by_user, name='import-statement'),
 
     # For IncomeCategory objects, CRUD functionality, list and detail views provided:
-    path('income_category/new', views_income_associated.IncomeCategoryByUserCreateView.as_view(),
-         name='income-category-new'),
-    path('my_income_categories/', views_income_associated.ListedIncomeCategoryByUserListView.as_view(),
+    path('income_category/new', CatalogueCreateView.as_view(catalogue=INCOME_CATEGORIES), name='income-category-new'),
+    path('my_income_categories/', CatalogueListView.as_view(catalogue=INCOME_CATEGORIES),
          name='user-income-categories'),
-    path('my_income_categories/<int:pk>', views_income_associated.IncomeCategoryByUserDetailView.as_view(),
+    path('my_income_categories/<int:pk>', CatalogueDetailView.as_view(catalogue=INCOME_CATEGORIES),
          name='income-category-detail'),
-    path('income_category/<int:pk>/update', views_income_associated.IncomeCategoryByUserUpdateView.as_view(),
+    path('income_category/<int:pk>/update', CatalogueUpdateView.as_view(catalogue=INCOME_CATEGORIES),
          name='income-category-update'),
-    path('income_category/<int:pk>/delete', views_income_associated.IncomeCategoryByUserDeleteView.as_view(),
+    path('income_category/<int:pk>/delete', CatalogueDeleteView.as_view(catalogue=INCOME_CATEGORIES),
          name='income-category-delete'),
 
     # For IncomeSource objects, CRUD functionality, list and detail views provided:
-    path('income_source/new', views_income_associated.IncomeSourceByUserCreateView.as_view(),
-         name='income-source-new'),
-    path('my_income_sources/', views_income_associated.ListedIncomeSourceByUserListView.as_view(),
-         name='user-income-sources'),
-    path('my_income_sources/<int:pk>', views_income_associated.IncomeSourceByUserDetailView.as_view(),
+    path('income_source/new', CatalogueCreateView.as_view(catalogue=INCOME_SOURCES), name='income-source-new'),
+    path('my_income_sources/', CatalogueListView.as_view(catalogue=INCOME_SOURCES), name='user-income-sources'),
+    path('my_income_sources/<int:pk>', CatalogueDetailView.as_view(catalogue=INCOME_SOURCES),
          name='income-source-detail'),
-    path('income_source/<int:pk>/update', views_income_associated.IncomeSourceByUserUpdateView.as_view(),
+    path('income_source/<int:pk>/update', CatalogueUpdateView.as_view(catalogue=INCOME_SOURCES),
          name='income-source-update'),
-    path('income_source/<int:pk>/delete', views_income_associated.IncomeSourceByUserDeleteView.as_view(),
+    path('income_source/<int:pk>/delete', CatalogueDeleteView.as_view(catalogue=INCOME_SOURCES),
          name='income-source-delete'),
 
     # For ExpensesCategory objects, CRUD functionality, list and detail views provided:
-    path('expenses_category/new', views_expenses_associated.ExpensesCategoryByUserCreateView.as_view(),
+    path('expenses_category/new', CatalogueCreateView.as_view(catalogue=EXPENSES_CATEGORIES),
          name='expenses-category-new'),
-    path('my_expenses_categories/', views_expenses_associated.ListedExpensesCategoryByUserListView.as_view(),
+    path('my_expenses_categories/', CatalogueListView.as_view(catalogue=EXPENSES_CATEGORIES),
          name='user-expenses-categories'),
-    path('my_expenses_categories/<int:pk>', views_expenses_associated.ExpensesCategoryByUserDetailView.as_view(),
+    path('my_expenses_categories/<int:pk>', CatalogueDetailView.as_view(catalogue=EXPENSES_CATEGORIES),
          name='expenses-category-detail'),
-    path('expenses_category/<int:pk>/update', views_expenses_associated.ExpensesCategoryByUserUpdateView.as_view(),
+    path('expenses_category/<int:pk>/update', CatalogueUpdateView.as_view(catalogue=EXPENSES_CATEGORIES),
          name='expenses-category-update'),
-    path('expenses_category/<int:pk>/delete', views_expenses_associated.ExpensesCategoryByUserDeleteView.as_view(),
+    path('expenses_category/<int:pk>/delete', CatalogueDeleteView.as_view(catalogue=EXPENSES_CATEGORIES),
          name='expenses-category-delete'),
 
     # For Seller objects (equivalent to IncomeSource), CRUD functionality, list and detail views provided:
-    path('seller/new', views_expenses_associated.SellerByUserCreateView.as_view(), name='seller-new'),
-    path('my_sellers/', views_expenses_associated.ListedSellerByUserListView.as_view(), name='user-sellers'),
-    path('my_sellers/<int:pk>', views_expenses_associated.SellerByUserDetailView.as_view(), name='seller-detail'),
-    path('seller/<int:pk>/update', views_expenses_associated.SellerByUserUpdateView.as_view(), name='seller-update'),
-    path('seller/<int:pk>/delete', views_expenses_associated.SellerByUserDeleteView.as_view(), name='seller-delete'),
+    path('seller/new', CatalogueCreateView.as_view(catalogue=SELLERS), name='seller-new'),
+    path('my_sellers/', CatalogueListView.as_view(catalogue=SELLERS), name='user-sellers'),
+    path('my_sellers/<int:pk>', CatalogueDetailView.as_view(catalogue=SELLERS), name='seller-detail'),
+    path('seller/<int:pk>/update', CatalogueUpdateView.as_view(catalogue=SELLERS), name='seller-update'),
+    path('seller/<int:pk>/delete', CatalogueDeleteView.as_view(catalogue=SELLERS), name='seller-delete'),
 
     # For searching Income and Expenses objects, for both two types of search views - based on keywords and criteria:
-    path('search_income_keywords/', views_income_search.SearchKeywordsIncomeByUserListView.as_view(),
-         name='search-income-key'),
-    path('search_expenses_keywords/', views_expenses_search.SearchKeywordsExpensesByUserListView.as_view(),
-         name='search-expenses-key'),
-    path('search_income_select/', views_income_search.search_select_income_by_user,
-         name='search-income-select'),
-    path('search_expenses_select/', views_expenses_search.search_select_expenses_by_user,
-         name='search-expenses-select'),
+    path('search_income_keywords/', LineKeywordSearchView.as_view(ledger=INCOME), name='search-income-key'),
+    path('search_expenses_keywords/', LineKeywordSearchView.as_view(ledger=EXPENSES), name='search-expenses-key'),
+    path('search_income_select/', search_select_lines, {'ledger': INCOME}, name='search-income-select'),
+    path('search_expenses_select/', search_select_lines, {'ledger': EXPENSES}, name='search-expenses-select'),
     # For creating archival reports of Income and Expenses objects:
-    path('archive_income/', views_income_archive.report_income_by_user, name='archive-income'),
-    path('archive_expenses/', views_expenses_archive.report_expenses_by_user, name='archive-expenses'),
+    path('archive_income/', archive_report, {'ledger': INCOME}, name='archive-income'),
+    path('archive_expenses/', archive_report, {'ledger': EXPENSES}, name='archive-expenses'),
+    # For the top categories, sources and sellers of Income and Expenses objects:
+    path('breakdown_income/', breakdown_report, {'ledger': INCOME}, name='income-breakdown'),
+    path('breakdown_expenses/', breakdown_report, {'ledger': EXPENSES}, name='expenses-breakdown'),
+
+    # Read-only JSON API of the user's lines, banks, categories, sources and sellers (more about it in api.py):
+    path('api/transfers/', views_api.transfers, name='api-transfers'),  # before 'api/<str:resource>/'
+    path('api/trends/', views_api.monthly_trends, name='api-trends'),
+    path('api/<str:resource>/', views_api.resource_list, name='api-list'),
+    path('api/<str:resource>/<int:pk>', views_api.resource_detail, name='api-detail'),
+
+    # Percentiles of the recorded request metrics, for staff (more about it in metrics.py):
+    path('request_metrics/', views_metrics.request_metrics, name='request-metrics'),
 
 ]
@@ -8,18 +8,15 @@ by keywords or criteria and date range, as well as creating archival reports of
 app have functionality related to user authentication and authorization, including the use of the LoginRequiredMixin
 and UserPassesTestMixin mixins.
 
-Due to the size of the code in the views.py file, it is divided into 10 parts and Python file for each was created:
+Due to the size of the code in the views.py file, it is divided into several parts and Python file for each was created:
 1) Function based views for home page, registration, profile updating - here, at views.py;
-2) CRUD functionality for instances of the model: Income - at views_income.py;
-3) CRUD functionality for instances of the model: Expenses - at views_expenses.py;
-4) CRUD functionality for instances of the models: IncomeCategory, IncomeSource - at views_income_associated.py;
-5) CRUD functionality for instances of the models: ExpensesCategory, Seller - at views_expenses_associated.py;
-6) Views for searching Income objects, two types search: by keywords or criteria - at views_income_search.py;
-7) Views for searching Expenses objects, two types search: by keywords or criteria - at views_expenses_search.py;
-8) Views for archival reports of Income objects - at views_income_archive.py;
-9) Views for archival reports of Expenses objects - at views_expenses_archive.py;
-10) CRUD functionality for instances of the Bank model, as well as views handling transfers between banks and within
-a single bank - at views_banks.py.
+2) Generic views shared by Income and Expenses (more about the two sides in ledgers.py) - at views_ledger.py: CRUD
+functionality for the lines and for their categories, sources of income and sellers, searching the lines by keywords
+or criteria, and archival reports;
+3) CRUD functionality for instances of the Bank model, as well as views handling transfers between banks and within
+a single bank - at views_banks.py;
+4) Importing of bank statements - at views_import.py, downloads of the lines' PDF documents - at views_downloads.py and
+the read-only JSON API - at views_api.py.
 """
 
 from django.shortcuts import render
@@ -29,9 +26,11 @@ from django.contrib import messages
 from django.contrib.auth.models import User, Group
 from django.contrib.auth.decorators import login_required
 from .forms import UserUpdateForm, ProfileUpdateForm
+from .caching import cache_per_user
 
 
 # For 'home page' view
+@cache_per_user()  # the rendered page of a logged-in user is cached, see caching.py
 def home(request):
     text = "Welcome to My_Portfolio"
     context = {
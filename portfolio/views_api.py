@@ -0,0 +1,112 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import wraps
+from urllib.parse import urlencode
+from django.http import JsonResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_POST, require_safe
+from .analytics import AnalyticsUnavailable, trends
+from .api import RESOURCES, ApiError, detail, get_limit, list_page, parse_transfers, parse_trend_parameters
+from .balances import transfer_batch
+from .caching import data_modified, data_version
+
+
+def api_login_required(view):  # like login_required, but answers with 401 and JSON instead of redirecting to the login
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+# The ETag and Last-Modified time are made from the user's data version (caching.py), so the conditional requests are
+# answered with 304 Not Modified before any row is read
+def _etag(request, *args, **kwargs):
+    return hashlib.md5(f'{data_version(request.user.pk)}:{request.get_full_path()}'.encode()).hexdigest()
+
+
+def _last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(data_modified(request.user.pk), tz=timezone.utc)
+
+
+def _resource_or_error(name):
+    if name not in RESOURCES:
+        raise ApiError(f"Unknown resource '{name}'. Available: {', '.join(RESOURCES)}.")
+    return RESOURCES[name]
+
+
+def _json(data, status=200):
+    response = JsonResponse(data, status=status)
+    patch_cache_control(response, private=True, no_cache=True)  # the browsers keep the response, but always ask again
+    return response
+
+
+def _page_url(request, cursor):
+    parameters = request.GET.copy()
+    parameters['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{urlencode(sorted(parameters.items()))}')
+
+
+# A view function that returns a page of the user's rows of the resource as JSON, more about it in api.py
+@api_login_required
+@require_safe
+@condition(etag_func=_etag, last_modified_func=_last_modified)
+def resource_list(request, resource):
+    try:
+        api_resource = _resource_or_error(resource)
+        limit = get_limit(request.GET.get('limit'))
+        rows, next_cursor, previous_cursor, count = list_page(
+            api_resource, api_resource.get_queryset(request), request.GET.get('fields'), request.GET.get('cursor'),
+            limit)
+    except ApiError as error:
+        return _json({'error': str(error)}, status=400)
+    return _json({'count': count, 'next': _page_url(request, next_cursor) if next_cursor else None,
+                  'previous': _page_url(request, previous_cursor) if previous_cursor else None, 'results': rows})
+
+
+# A view function that returns one of the user's rows of the resource as JSON
+@api_login_required
+@require_safe
+@condition(etag_func=_etag, last_modified_func=_last_modified)
+def resource_detail(request, resource, pk):
+    try:
+        api_resource = _resource_or_error(resource)
+        row = detail(api_resource, api_resource.get_queryset(request), request.GET.get('fields'), pk)
+    except ApiError as error:
+        return _json({'error': str(error)}, status=400)
+    if row is None:  # also the objects of other users
+        return _json({'error': 'Not found.'}, status=404)
+    return _json(row)
+
+
+# A view function that makes a batch of transfers between the user's banks in one transaction, more about it in api.py
+@api_login_required
+@require_POST
+def transfers(request):
+    try:
+        try:
+            body = json.loads(request.body)
+        except ValueError:
+            raise ApiError('The body must be JSON.')
+        batch, all_or_nothing = parse_transfers(body)
+    except ApiError as error:
+        return _json({'error': str(error)}, status=400)
+    results = transfer_batch(request.user, batch, all_or_nothing=all_or_nothing)
+    return _json({'made': sum(result['ok'] for result in results), 'results': results})
+
+
+# A view function that returns the monthly trends of the user's lines as JSON, more about them in analytics.py. There
+# is no ETag, the months of the default period change with the date, not only with the user's data
+@api_login_required
+@require_safe
+def monthly_trends(request):
+    try:
+        start, end, horizon = parse_trend_parameters(request.GET)
+    except ApiError as error:
+        return _json({'error': str(error)}, status=400)
+    try:
+        return _json(trends(request.user, start, end, horizon))
+    except AnalyticsUnavailable as error:
+        return _json({'error': str(error)}, status=501)
@@ -1,18 +1,29 @@
+from datetime import date
 from django.shortcuts import render
-from django.db.models import Sum
 from django.template.defaultfilters import floatformat  # to format the floating-point number
+from django.utils.decorators import method_decorator
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.contrib.messages.views import SuccessMessageMixin
-from .models import Bank
-from .forms import BankCreateForm, TransferBetweenBanksForm, TransferInsideBankForm, TransferInsideBankForDetailViewForm
+from .models import Bank, BankMovement
+from .caching import cache_per_user
+from .cashflow import cash_flow
+from .rollups import next_month
+from .choices import request_choices
+from .summaries import bank_summary
+from .balances import InsufficientFunds, apply_delta, transfer_between_banks as transfer_funds, \
+    transfer_inside_bank as transfer_accounts
+from .forms import BankCreateForm, CashFlowForm, TransferBetweenBanksForm, TransferInsideBankForm, \
+    TransferInsideBankForDetailViewForm
 from django.views.generic import (ListView, DetailView, CreateView, UpdateView, DeleteView)
 from django.views.generic.edit import FormMixin  # is a class-based view mixin that provides methods and attributes to
 # handle form processing and rendering. In the code it is intended to be used in conjunction with DetailView
 
 
 # Displays the details of a single object and perform transfers between accounts within the same bank
+@method_decorator(cache_per_user(), name='dispatch')  # the rendered page is cached for the user, see caching.py
 class BankByUserDetailView(LoginRequiredMixin, FormMixin, DetailView):  # requires user to be logged-in to access view
     model = Bank
     context_object_name = 'banks'
@@ -24,15 +35,11 @@ class BankByUserDetailView(LoginRequiredMixin, FormMixin, DetailView):  # requir
         form = self.get_form()
         # If the form is valid, the balance and investment amounts are transferred between accounts within the same bank
         if form.is_valid():
-            balance_to_investment = form.cleaned_data['balance_to_investment']
-            investment_to_balance = form.cleaned_data['investment_to_balance']
-            if balance_to_investment:
-                bank.balance -= balance_to_investment
-                bank.investment += balance_to_investment
-            if investment_to_balance:
-                bank.investment -= investment_to_balance
-                bank.balance += investment_to_balance
-            bank.save()
+            balance_to_investment = form.cleaned_data['balance_to_investment'] or 0
+            investment_to_balance = form.cleaned_data['investment_to_balance'] or 0
+            # Both directions are combined into one change of each account, applied in the database (see balances.py)
+            apply_delta(bank, balance=investment_to_balance - balance_to_investment,
+                        investment=balance_to_investment - investment_to_balance, reason=BankMovement.INSIDE_TRANSFER)
             messages.success(request, 'Your funds have been transferred between the accounts!')
         return self.get(request, *args, **kwargs)  # is a call to the parent class's get method with the same arguments
     # used to re-render the view with any updated data that may have been modified as a result of the form submission
@@ -94,51 +101,49 @@ class ListedBanksByUserListView(LoginRequiredMixin, ListView):
     template_name = 'user_banks.html'
     paginate_by = 10
 
-    def get_queryset(self):  # overrides the default queryset to return only banks owned by the current user
-        user = self.request.user
-        return Bank.objects.filter(owner=user)
+    def get_queryset(self):  # returns only banks owned by the current user, from the cached bank summary (a list)
+        return self.get_summary()['banks']
 
-    # Calculates the total balance and investment of all the banks owned by the current user
+    def get_summary(self):  # the banks and their totals are read once per user and kept in the cache, see summaries.py
+        if not hasattr(self, 'summary'):
+            self.summary = bank_summary(self.request.user)
+        return self.summary
+
+    # Adds the total balance and investment of all the banks owned by the current user
     def get_context_data(self, **kwargs):  # used to add custom data that is needed for the template
         context = super().get_context_data(**kwargs)
-        total_balance = self.get_queryset().aggregate(Sum('balance'))['balance__sum']  # First calculation
-        # 1. Returns a queryset containing all banks owned by the current user
-        # 2. Apply an SQL aggregation function to the queryset, in this case, Sum() of balance attribute for all banks
-        # 3. ['balance__sum'] access result of the aggregation, which is stored in a dictionary with key 'balance__sum'
-        total_investment = self.get_queryset().aggregate(Sum('investment'))['investment__sum']  # Second calculation
-        context['total_investment'] = floatformat(total_investment, 2)  # rounded to 2 decimal places
-        context['total_balance'] = floatformat(total_balance, 2)  # rounded to 2 decimal places
-        context['form'] = TransferBetweenBanksForm(self.request.user)  # adds forms for transferring funds between banks
-        context['second_form'] = TransferInsideBankForm(self.request.user)  # ...  and accounts
+        summary = self.get_summary()  # the totals are summed up together with reading the banks, not by 2 queries
+        context['total_investment'] = floatformat(summary['total_investment'], 2)  # rounded to 2 decimal places
+        context['total_balance'] = floatformat(summary['total_balance'], 2)  # rounded to 2 decimal places
+        # adds forms for transferring funds between banks and accounts, their dropdowns show the cached banks
+        choices = request_choices(self.request)
+        choices.provide(Bank, summary['banks'])
+        context['form'] = TransferBetweenBanksForm(self.request.user, choices=choices)
+        context['second_form'] = TransferInsideBankForm(self.request.user, choices=choices)
         return context  # returns the updated context dictionary
 
     def post(self, request, *args, **kwargs):  # method handles form submissions
-        form = TransferBetweenBanksForm(request.user, request.POST)  # request.user intended for a form query
+        choices = request_choices(request)  # both forms read the user's banks once
+        form = TransferBetweenBanksForm(request.user, request.POST, choices=choices)  # the user's banks
         if form.is_valid():  # The form is then validated
-            from_bank_id = form.cleaned_data['from_bank']
-            to_bank_id = form.cleaned_data['to_bank']
+            # The form has already read the selected banks by their ids, only among the user's banks (see forms.py)
+            from_bank = form.cleaned_data['from_bank']
+            to_bank = form.cleaned_data['to_bank']
             amount = form.cleaned_data['amount']
-            try:  # attempts to retrieve the source and destination banks for the transfer using name and owner fields
-                from_bank = Bank.objects.get(name=from_bank_id, owner=request.user)
-                to_bank = Bank.objects.get(name=to_bank_id, owner=request.user)
-            except Bank.DoesNotExist:  # exception if the specified bank does not exist in the database
-                messages.error(request, 'One or both of the banks do not exist or are not owned by you.')
+            if from_bank == to_bank:  # validation to ensure that the user has selected two different banks and ...
+                messages.error(request, 'The source and destination banks must be different.')
             else:
-                if from_bank == to_bank:  # validation to ensure that the user has selected two different banks and ...
-                    messages.error(request, 'The source and destination banks must be different.')
-                elif from_bank.balance < amount:  # has sufficient balance in the source bank to complete the transfer
+                try:  # subtracts the transfer amount from the source bank's balance and adds it to the destination
+                    transfer_funds(from_bank, to_bank, amount)  # bank's balance, both in one transaction
+                except InsufficientFunds:  # if the source bank has not sufficient balance to complete the transfer
                     messages.error(request, 'Insufficient balance.')
                 else:
-                    from_bank.balance -= amount  # subtracts the transfer amount from the source bank's balance ...
-                    to_bank.balance += amount  # and adds it to the destination bank's balance
-                    from_bank.save()
-                    to_bank.save()  # and saves both banks
                     messages.success(request, 'Your funds have been transferred between the selected banks!')
         else:
             TransferBetweenBanksForm(request.user)  # If request method isn't POST, creates a new instance of form
         # This is done when the user initially navigates to the transfer page
 
-        second_form = TransferInsideBankForm(request.user, request.POST)  # request.user intended for a form query
+        second_form = TransferInsideBankForm(request.user, request.POST, choices=choices)  # the same banks
         if second_form.is_valid():  # If a form for transferring funds within the same bank, it validates the form data
             bank = second_form.cleaned_data['bank']
             source_account = second_form.cleaned_data['source_account']
@@ -147,19 +152,13 @@ class ListedBanksByUserListView(LoginRequiredMixin, ListView):
             # If any of these checks fail, error is raised:
             if source_account == to_account:
                 messages.error(request, 'The source and destination accounts must be different.')
-            elif source_account == 'balance' and bank.balance < amount:
-                messages.error(request, 'Insufficient balance.')
-            elif source_account == 'investment' and bank.investment < amount:
-                messages.error(request, 'Insufficient investment.')
-            else:  # If all checks are successful, this code transfers the funds between the accounts
-                if source_account == 'balance':
-                    bank.balance -= amount
-                    bank.investment += amount
+            else:  # If the check is successful, this code transfers the funds between the accounts
+                try:  # the source account is checked for sufficient funds in the same database update (see balances.py)
+                    transfer_accounts(bank, source_account, to_account, amount)
+                except InsufficientFunds as error:  # 'Insufficient balance.' or 'Insufficient investment.'
+                    messages.error(request, str(error))
                 else:
-                    bank.balance += amount
-                    bank.investment -= amount
-                bank.save()
-                messages.success(request, 'Your funds have been transferred between accounts in the selected bank!')
+                    messages.success(request, 'Your funds have been transferred between accounts in the selected bank!')
         else:
             TransferInsideBankForm(request.user)  # If request method isn't POST, creates a new instance of form
         # This is done when the user initially navigates to the transfer page
@@ -182,19 +181,13 @@ def transfer_inside_bank(request):  # request argument represents an HTTP reques
             # If any of these checks fail, error is raised:
             if source_account == to_account:
                 messages.error(request, 'The source and destination accounts must be different.')
-            elif source_account == 'balance' and bank.balance < amount:
-                messages.error(request, 'Insufficient balance.')
-            elif source_account == 'investment' and bank.investment < amount:
-                messages.error(request, 'Insufficient investment.')
-            else:  # If all checks are successful, this code transfers the funds between the accounts
-                if source_account == 'balance':
-                    bank.balance -= amount
-                    bank.investment += amount
+            else:  # If the check is successful, this code transfers the funds between the accounts
+                try:  # the source account is checked for sufficient funds in the same database update (see balances.py)
+                    transfer_accounts(bank, source_account, to_account, amount)
+                except InsufficientFunds as error:  # 'Insufficient balance.' or 'Insufficient investment.'
+                    messages.error(request, str(error))
                 else:
-                    bank.balance += amount
-                    bank.investment -= amount
-                bank.save()
-                messages.success(request, 'Your funds have been transferred between accounts in the selected bank!')
+                    messages.success(request, 'Your funds have been transferred between accounts in the selected bank!')
     else:
         second_form = TransferInsideBankForm(request.user)  # If request method is not POST, initializes an empty form
     return render(request, 'transfer_inside_bank.html', {'second_form': second_form})
@@ -205,24 +198,18 @@ def transfer_between_banks(request):  # starts by checking if the request method
     if request.method == 'POST':  # has submitted a form with data. If so, it initializes a new instance ...
         form = TransferBetweenBanksForm(request.user, request.POST)  # of the form with the data from the request
         if form.is_valid():  # The form is then validated
-            from_bank_id = form.cleaned_data['from_bank']
-            to_bank_id = form.cleaned_data['to_bank']
+            # The form has already read the selected banks by their ids, only among the user's banks (see forms.py)
+            from_bank = form.cleaned_data['from_bank']
+            to_bank = form.cleaned_data['to_bank']
             amount = form.cleaned_data['amount']
-            try:  # attempts to retrieve the source and destination banks for the transfer using name and owner fields
-                from_bank = Bank.objects.get(name=from_bank_id, owner=request.user)
-                to_bank = Bank.objects.get(name=to_bank_id, owner=request.user)
-            except Bank.DoesNotExist:  # exception if the specified bank does not exist in the database
-                messages.error(request, 'One or both of the banks do not exist or are not owned by you.')
+            if from_bank == to_bank:  # validation to ensure that the user has selected two different banks and ...
+                messages.error(request, 'The source and destination banks must be different.')
             else:
-                if from_bank == to_bank:  # validation to ensure that the user has selected two different banks and ...
-                    messages.error(request, 'The source and destination banks must be different.')
-                elif from_bank.balance < amount:  # has sufficient balance in the source bank to complete the transfer
+                try:  # subtracts the transfer amount from the source bank's balance and adds it to the destination
+                    transfer_funds(from_bank, to_bank, amount)  # bank's balance, both in one transaction
+                except InsufficientFunds:  # if the source bank has not sufficient balance to complete the transfer
                     messages.error(request, 'Insufficient balance.')
                 else:
-                    from_bank.balance -= amount  # subtracts the transfer amount from the source bank's balance ...
-                    to_bank.balance += amount  # and adds it to the destination bank's balance
-                    from_bank.save()
-                    to_bank.save()  # and saves both banks
                     messages.success(request, 'Your funds have been transferred between the selected banks!')
         else:
             messages.error(request, 'Transfer failed. Please check the selected banks and the amount.')
@@ -230,3 +217,18 @@ def transfer_between_banks(request):  # starts by checking if the request method
         form = TransferBetweenBanksForm(request.user)  # If request method isn't POST, creates a new instance of form
         # This is done when the user initially navigates to the transfer page
     return render(request, 'transfer_between_banks.html', {'form': form})  # ... and, finally, renders the template
+
+
+# Function that shows the monthly income, expenses, net cash flow and balance of the user's banks in a given period
+@login_required  # The function is decorated - the user must be logged in to access the page
+def cash_flow_report(request):
+    form = CashFlowForm(request.GET or None)  # the report is a link, so the form is sent with the GET method
+    reports = []
+    if not form.is_bound or form.is_valid():  # the last 12 months are shown by default
+        data = form.cleaned_data if form.is_bound else {}
+        end = data.get('end_date') or date.today()
+        start = data.get('start_date') or next_month(date(end.year - 1, end.month, 1))  # 12 months up to the end
+        # Both sides of the months are read from the MonthlyRollup table and the balances are calculated back from
+        # the current ones of the Bank rows, so the lines themselves are not read (see cashflow.py)
+        reports = cash_flow(request.user, start, end)
+    return render(request, 'user_cash_flow.html', {'form': form, 'reports': reports})
@@ -0,0 +1,26 @@
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.contrib.auth.decorators import login_required
+from .models import Income, Expenses
+from .downloads import serve_document
+
+
+def _line_document(request, model, pk, prefix):
+    # The ownership is checked once, by the query itself: the line of another user is not found (404, not 403, so the
+    # existence of other users' lines is not revealed). Only the fields needed for the file are read.
+    line = get_object_or_404(model.objects.only('pk', 'client_id', 'pdf'), pk=pk, client=request.user)
+    if not line.pdf or not line.pdf.storage.exists(line.pdf.name):
+        raise Http404('The line has no document.')
+    return serve_document(request, line.pdf, f'{prefix}_{line.pk}.pdf')
+
+
+# A view function that sends the PDF document of the user's Income line, more about it in downloads.py
+@login_required  # The function is decorated - the user must be logged in to access the page
+def income_document(request, pk):
+    return _line_document(request, Income, pk, 'income')
+
+
+# A view function that sends the PDF document of the user's Expenses line, more about it in downloads.py
+@login_required  # The function is decorated - the user must be logged in to access the page
+def expenses_document(request, pk):
+    return _line_document(request, Expenses, pk, 'expenses')
@@ -0,0 +1,32 @@
+import io
+from django.shortcuts import render
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from .forms import StatementImportForm
+from .choices import request_choices
+from .importers import StatementError, guess_format, import_statement
+
+
+# A view function that imports the lines of an uploaded bank statement (CSV or OFX file), more about it in importers.py
+@login_required  # The function is decorated - the user must be logged in to access the page
+def import_statement_by_user(request):
+    if request.method == 'POST':  # the uploaded file is in request.FILES, the other fields in request.POST
+        form = StatementImportForm(request.user, request.POST, request.FILES, choices=request_choices(request))
+        if form.is_valid():
+            statement = form.cleaned_data['statement']
+            file_format = form.cleaned_data['file_format']
+            if file_format == 'auto':
+                file_format = guess_format(statement.name)
+            # The file is decoded while it is read, row by row ('utf-8-sig' skips the byte order mark of Excel files)
+            stream = io.TextIOWrapper(statement.file, encoding='utf-8-sig', newline='')
+            try:
+                importer = import_statement(request.user, stream, file_format, form.cleaned_data['bank'])
+            except StatementError as error:
+                messages.error(request, str(error))
+            else:
+                messages.success(request, importer.summary())
+                for number, error in importer.errors:  # the first rejected rows, MAX_ERRORS at most
+                    messages.warning(request, f'Row {number}: {error}')
+    else:
+        form = StatementImportForm(request.user, choices=request_choices(request))  # initializes an empty form
+    return render(request, 'user_import_statement.html', {'form': form})
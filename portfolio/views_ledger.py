@@ -0,0 +1,471 @@
+"""
+Generic views of the ledger, shared by the Income and Expenses pages. Every view is given the side it serves in
+urls.py, e.g. LineListView.as_view(ledger=INCOME) or path(..., search_select_lines, {'ledger': EXPENSES}), and takes
+the model, forms, templates and names from it (more about the sides in ledgers.py):
+- LineListView, LineDetailView, LineCreateView, LineUpdateView and LineDeleteView - CRUD functionality of the lines,
+  the balances of the banks are changed by the balance service (balances.py);
+- LineKeywordSearchView and search_select_lines() - the two types of search, by keywords or criteria;
+- archive_report() - archival reports of the lines, of a period and by month, with the monthly trends (analytics.py);
+- breakdown_report() - the top categories and sources or sellers of a period, by the total amount of their lines;
+- CatalogueListView, CatalogueDetailView, CatalogueCreateView, CatalogueUpdateView and CatalogueDeleteView - CRUD
+  functionality of the categories, sources of income and sellers (given with catalogue=... in urls.py).
+
+The objects of the update and delete views are read once: the owner check (test_func) and the view share the object,
+and the owner is compared by its id, so the user is not read again.
+
+The details of the updated lines and of the archive reports are written to the 'portfolio.views_ledger' logger at the
+DEBUG level. The logger is silent by default (see LOGGING in settings.py) and its messages are formatted only when it
+is enabled, so the lines and related objects are not turned into text, nor read, for a message nobody sees.
+"""
+import logging
+from datetime import date
+from django.db import transaction
+from django.db.models import Q
+from django.forms import modelform_factory
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.template.defaultfilters import floatformat  # to format the floating-point number
+from django.contrib.auth.decorators import login_required
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.contrib.messages.views import SuccessMessageMixin
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from .caching import cache_per_user
+from .choices import request_choices
+from .search import keyword_filter, search_lines
+from .pagination import KeysetPaginationMixin
+from .balances import apply_delta, move_line
+from .rollups import monthly_report, breakdown
+from .analytics import AnalyticsUnavailable, trends
+from .forms import BreakdownForm
+from .stats import line_stats, subset_line_stats
+from .exports import export_lines
+
+logger = logging.getLogger(__name__)
+
+BREAKDOWN_TITLES = {'category': 'Categories', 'source': 'Sources of income', 'seller': 'Sellers'}
+
+
+def selection_query(ledger, user, category=None, source=None, bank=None, start_date=None, end_date=None):
+    # Condition of the user's lines selected in the search and archive forms, the 'source' is the party of the side
+    query = Q(client=user)
+    if category:
+        query &= Q(category=category)
+    if source:
+        query &= Q(**{ledger.party: source})  # the source of Income lines, the seller of Expenses lines
+    if bank:
+        query &= Q(bank=bank)
+    if start_date or end_date:
+        start_default = date(1, 1, 1)  # In case only end date selected
+        end_default = date.today()  # In case only start date selected
+        query &= Q(date__range=[start_date or start_default, end_date or end_default])
+    return query
+
+
+def stats_context(kind, stats, suffix=''):  # total, average, max. and min. amount, rounded to 2 decimal places
+    return {f'{name}_{kind}{suffix}': floatformat(stats[name], 2) for name in ('total', 'avg', 'max', 'min')}
+
+
+class LedgerMixin:
+    ledger = None  # INCOME or EXPENSES (ledgers.py), given to as_view() in urls.py
+    template = None  # name of the template, e.g. 'user_{kind}_lines' - 'user_income_lines.html'
+    context_name = '{kind}_lines'
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.model = self.ledger.model
+        self.template_name = self.ledger.template(self.template)
+        self.context_object_name = self.context_name.format(kind=self.ledger.kind)
+
+
+class OwnerRequiredMixin(UserPassesTestMixin):
+    owner = 'client'  # field of the user the object belongs to
+
+    def get_object(self, queryset=None):  # the object is read once, for test_func() and for the view
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_object'):
+            self._object = super().get_object()
+        return self._object
+
+    # Restricts access to views where the user isn't the owner of the item being edited (403 Forbidden error page)
+    def test_func(self):
+        return getattr(self.get_object(), f'{self.owner}_id') == self.request.user.pk
+
+
+#  A view that lists all lines for the currently logged-in user, with the ability to search by various fields
+class LineListView(LoginRequiredMixin, LedgerMixin, KeysetPaginationMixin, ListView):  # All views require logging in
+    template = 'user_{kind}_lines'
+    paginate_by = 10
+    keyword_kwarg = 'query'  # the found lines are ordered by relevance, on numbered pages (see pagination.py)
+
+    # Method to filter the list of lines based on a search query parameter
+    def get_queryset(self):
+        query = self.request.GET.get('query')
+        lines = self.model.objects.filter(client=self.request.user)
+        if query:  # To search across the category, party, amount, notes and bank of the lines in the full-text index
+            lines = search_lines(lines, [query])
+        return lines.with_related()  # the related objects shown on the page are joined in the same query
+
+
+# A view that displays the details of a single line
+@method_decorator(cache_per_user(), name='dispatch')  # the rendered page is cached for the user, see caching.py
+class LineDetailView(LoginRequiredMixin, LedgerMixin, DetailView):
+    template = 'user_{kind}_line'
+
+    def get_queryset(self):  # the category, party, bank and client shown on the page are joined in the same query
+        return self.model.objects.with_related()
+
+    # This method is used to add extra context data (PDF file) to the template context for rendering the view
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.object.pdf:  # The method checks if the pdf attribute of the line is not None
+            # The URL of the protected download of the PDF file (views_downloads.py) is added to the context
+            context['pdf_url'] = reverse(f'{self.ledger.kind}-line-pdf', args=[self.object.pk])
+        return context
+
+
+class LineFormMixin(LedgerMixin, SuccessMessageMixin):
+    template = 'user_{kind}_line_form'
+
+    def get_form_class(self):
+        return self.ledger.line_form
+
+# method is overridden to add the user object to the form's keyword arguments, so that the form can limit the choices
+    def get_form_kwargs(self):  # of the category, party and bank fields to only the ones of the current user
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        kwargs['choices'] = request_choices(self.request)  # the user's objects are read once (see choices.py)
+        return kwargs
+
+
+# A view that allows the user to create a new line
+class LineCreateView(LoginRequiredMixin, LineFormMixin, CreateView):
+    def get_success_url(self):  # the form is shown again for the next line
+        return reverse(f'{self.ledger.kind}-line-new')
+
+    def get_success_message(self, cleaned_data):
+        return f'{self.ledger.label} item was created successfully.'
+
+    # Override the form_valid method to update the balance field of the Bank model associated with the line
+    def form_valid(self, form):
+        form.instance.client = self.request.user
+        with transaction.atomic():  # the line and the balance of its bank are saved together or not at all
+            response = super().form_valid(form)
+            # The balance is increased by the amount of a new Income line and decreased by the amount of Expenses
+            apply_delta(form.cleaned_data['bank'], balance=self.ledger.sign * form.cleaned_data['amount'],
+                        reason=self.ledger.reason)
+        return response
+
+
+# A view that allows the user to update an existing line, require that the user be the owner of the object
+class LineUpdateView(LoginRequiredMixin, OwnerRequiredMixin, LineFormMixin, UpdateView):
+    def get_success_url(self):
+        return reverse(f'user-{self.ledger.kind}-lines')
+
+    def get_success_message(self, cleaned_data):
+        return f'{self.ledger.label} item was updated successfully.'
+
+    # Override the form_valid method to update the balance field of the Bank model associated with the line
+    def form_valid(self, form):
+        # The previous amount is moved out of the previous bank and the new amount into the new bank (see balances.py)
+        bank = form.cleaned_data['bank']
+        amount = form.cleaned_data['amount']
+        form.instance.client = self.request.user
+        with transaction.atomic():
+            # previous details of the line, as stored in the database (the form has already changed self.object)
+            line = self.model.objects.select_for_update().get(pk=self.object.pk)
+            # For checking the calculations; the previous line is turned into text (its category, party and bank are
+            # read) only when the logger is enabled
+            logger.debug('line_updated kind=%s id=%s previous="%s" previous_amount=%s amount=%s bank="%s"',
+                         self.ledger.kind, line.pk, line, line.amount, amount, bank)
+            move_line(self.ledger.sign, line.bank_id, line.amount, bank, amount)
+            response = super().form_valid(form)  # The function that initiates the update condition is called
+        return response
+
+
+# A view that allows the user to delete an existing line, require that the user be the owner of the object
+class LineDeleteView(LoginRequiredMixin, OwnerRequiredMixin, LedgerMixin, SuccessMessageMixin, DeleteView):
+    template = 'user_{kind}_line_delete'  # the balance of the bank is changed by the signals of the deleted line
+
+    def get_success_url(self):
+        return reverse(f'user-{self.ledger.kind}-lines')
+
+    def get_success_message(self, cleaned_data):
+        return f'{self.ledger.label} item was deleted successfully.'
+
+
+# Class-based view retrieves objects filtered by search keywords and date, user filters by the logged-in user
+class LineKeywordSearchView(LoginRequiredMixin, LedgerMixin, KeysetPaginationMixin, ListView):
+    template = 'user_search_key_{kind}'  # retrieved objects are displayed to the user at the template
+    context_name = '{kind}'
+    paginate_by = 10
+    keyword_kwarg = 'keywords'  # the found lines are ordered by relevance, on numbered pages (see pagination.py)
+
+    def get_keywords(self):  # retrieves any search keywords from the request
+        keywords = self.request.GET.get('keywords')
+        # If there are any search keywords, the method splits them into a list of strings and removes ...
+        return keywords.split(', ') if keywords else []  # ... any whitespace before or after each string
+
+    def get_search_query(self, with_keywords=True):  # builds the filter from the logged-in user, dates, and keywords
+        query = selection_query(self.ledger, self.request.user, start_date=self.request.GET.get('start_date'),
+                                end_date=self.request.GET.get('end_date'))
+        keyword_list = self.get_keywords()
+        if with_keywords and keyword_list:  # The keywords are looked up in the full-text search index of the lines,
+            query &= keyword_filter(self.model, keyword_list)  # any of the keywords must match, see search.py
+        return query
+
+    def get_queryset(self):  # filters the objects based on the logged-in user, start and end dates, and search keywords
+        # the queryset is filtered by the user and dates, the found lines are ordered by relevance and descending date
+        # (without keywords only by date, which lets the keyset pagination read the pages, see pagination.py)
+        lines = self.model.objects.filter(self.get_search_query(with_keywords=False)).with_related().order_by('-date')
+        return search_lines(lines, self.get_keywords())
+
+    def get(self, request, *args, **kwargs):
+        file_format = request.GET.get('export')  # 'csv' or 'xlsx', set by the export buttons of the search form
+        if file_format:  # the found lines are downloaded as a file instead of being shown, see exports.py
+            lines = self.model.objects.filter(self.get_search_query()).order_by('-date', '-id')
+            return export_lines(lines, file_format, f'{self.ledger.kind}_search')
+        return super().get(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):  # adds stats, number of found lines, and total number of lines to context
+        context = super().get_context_data(**kwargs)
+        kind = self.ledger.kind
+        # All numbers come from one query, found lines are a conditional subset of all the user's lines
+        stats = subset_line_stats(self.model.objects.filter(client=self.request.user), all=None,
+                                  found=self.get_search_query())
+        context.update(stats_context(kind, stats['found']))
+        context[f'num_{kind}_lines'] = stats['found']['count']  # number of found lines
+        context[f'all_{kind}_lines'] = stats['all']['count']  # number of all lines by user
+        return context
+
+
+# Function-based view retrieves lines filtered by search criteria and date, user filters by the logged-in user
+@login_required  # The function is decorated - the user must be logged in to access the page
+def search_select_lines(request, ledger):
+    user = request.user
+    kind = ledger.kind
+    choices = request_choices(request)  # both forms show the same objects, each table is read once
+    form = ledger.search_form(user, request.POST or None, choices=choices)  # filters objects based on the form data
+    second_form = ledger.compare_form(user, request.POST or None, choices=choices)  # second_form (same logic)
+    # None prevents form validation errors during the first load of page when the form data hasn't yet been submitted
+    lines = ledger.model.objects.filter(client=user).with_related().order_by('-date')  # default findings, all lines
+    lines_to_compare = lines
+    found_query = compare_query = None  # conditions of both sets for the statistics, None means all user's lines
+
+    if request.method == 'POST':  # indicating that a form has been submitted
+        if form.is_valid():
+            data = form.cleaned_data
+            found_query = selection_query(ledger, user, data['category'], data['source'], data['bank'],
+                                          data['start_date'], data['end_date'])
+            lines = ledger.model.objects.filter(found_query).with_related().order_by('-date')  # lines that match
+
+        if second_form.is_valid():  # the same logic as with the first form
+            data = second_form.cleaned_data
+            compare_query = selection_query(ledger, user, data['category_compare'], data['source_compare'],
+                                            data['bank_compare'], data['start_date_compare'], data['end_date_compare'])
+            lines_to_compare = ledger.model.objects.filter(compare_query).with_related().order_by('-date')
+
+    if request.method == 'POST' and request.POST.get('export'):  # first form's lines as a file, see exports.py
+        return export_lines(lines.order_by('-date', '-id'), request.POST['export'], f'{kind}_search')
+
+    # Number of all lines and the statistics of both sets are calculated in a single conditional aggregation query
+    stats = subset_line_stats(ledger.model.objects.filter(client=user), all=None, found=found_query,
+                              compare=compare_query)
+    amount_difference = stats['found']['total'] - stats['compare']['total']  # the difference between the two sets
+
+    context = {
+        'form': form,  # adds to the context the form
+        'second_form': second_form,  # adds the second_form
+        kind: lines,  # and data
+        f'{kind}_to_compare': lines_to_compare,  # and data to compare
+        f'all_{kind}_lines': stats['all']['count'],  # and number of all lines
+        f'num_{kind}_lines': stats['found']['count'],  # and number of found lines
+        f'num_{kind}_lines_compare': stats['compare']['count'],  # and number of found lines to compare
+        'amount_difference': floatformat(amount_difference, 2),  # and the difference between the sets of total amount
+        **stats_context(kind, stats['found']),  # total, average, max. and min. amount of both sets
+        **stats_context(kind, stats['compare'], '_compare'),
+    }
+    # retrieved objects are displayed to the user at the template
+    return render(request, ledger.template('user_search_select_{kind}'), context)
+
+
+# Function that generates a complex report of the lines for a given user
+@login_required  # The function is decorated - the user must be logged in to access the page
+def archive_report(request, ledger):
+    user = request.user  # takes a request object as its argument and uses it to retrieve the user's information
+    kind = ledger.kind
+    # creates two forms for filtering the lines:
+    choices = request_choices(request)  # both forms show the same objects, each table is read once
+    form = ledger.archive_form(user, request.POST or None, choices=choices)  # request.user intended for a form query
+    monthly_form = ledger.monthly_form(user, request.POST or None, choices=choices)
+    # variables that will be used to store info about user's lines, default values needed to load the page
+    lines = ledger.model.objects.none()
+    monthly_data = {}
+    period = {'count': 0, 'total': 0, 'avg': 0, 'max': 0, 'min': 0}  # statistics of the lines of the monthly report
+    month_totals = {'avg': 0, 'max': 0, 'min': 0}  # statistics of the monthly totals
+    trend_period = (None, None)  # all the months of the user's lines, until the period of the monthly report is set
+
+    if request.method == 'POST':  # function processes the form data to filter the lines based on the user's input
+        if form.is_valid():
+            data = form.cleaned_data
+            # if no start_date will be set default date, if no end_date will be set default date - today
+            query = selection_query(ledger, user, data['category'], data['source'],
+                                    start_date=data['start_date'] or date(1, 1, 1),
+                                    end_date=data['end_date'] or date.today())
+            lines = ledger.model.objects.filter(query).with_related()  # the related objects shown in the table
+
+        if monthly_form.is_valid():  # selection part in input mirrors the first form
+            data = monthly_form.cleaned_data
+            trend_period = (data['start_date_report'], data['end_date_report'])
+            # Statistics of each month are read from the precomputed MonthlyRollup table (see rollups.py), only the
+            # days of incomplete months at the edges of the period are calculated from the lines
+            selection = {'category': data['category_report'], ledger.party: data['source_report']}
+            lines_by_month = monthly_report(ledger.model, user, data['start_date_report'] or date(1, 1, 1),
+                                            data['end_date_report'] or date.today(), **selection)
+
+            for month in lines_by_month:  # method 'strftime' allows to format date, in this case it removes days, ...
+                monthly_data[month['month'].strftime('%Y-%m')] = {  # ... so allows to aggregate data by month
+                    f'total_{kind}': month['total'],  # the total amount for that month
+                    f'avg_{kind}': month['total'] / month['count'],  # etc.
+                    f'max_{kind}': month['max'],
+                    f'min_{kind}': month['min']
+                }
+
+            # calculates various statistics about the user's lines for month's report, the statistics of the period
+            # are combined from the monthly rows, so no further queries are needed:
+            period['count'] = sum(month['count'] for month in lines_by_month)
+            if period['count']:
+                period['total'] = sum(month['total'] for month in lines_by_month)
+                period['avg'] = period['total'] / period['count']  # average amount of the lines
+                period['max'] = max(month['max'] for month in lines_by_month)
+                period['min'] = min(month['min'] for month in lines_by_month)
+
+                monthly_totals = [month['total'] for month in lines_by_month]  # stats for whole months
+                month_totals = {'avg': sum(monthly_totals) / len(monthly_totals), 'max': max(monthly_totals),
+                                'min': min(monthly_totals)}
+
+            logger.debug('archive_report kind=%s months=%s period=%s month_totals=%s', kind, monthly_data, period,
+                         month_totals)
+
+    if request.method == 'POST' and request.POST.get('export'):  # main statement as a file, see exports.py
+        return export_lines(lines.order_by('-date', '-id'), request.POST['export'], f'{kind}_archive')
+
+    # calculates various statistics about the user's lines from form for main statement:
+    stats = line_stats(lines)  # all the statistics of the main statement are calculated in one query
+    try:  # rolling averages, year-over-year changes, savings and forecast of both sides of the ledger by month
+        monthly_trends = trends(user, *trend_period)
+    except AnalyticsUnavailable:  # NumPy is not installed, the template leaves the trends out
+        monthly_trends = None
+
+    context = {  # function passes all data to a context dictionary
+        'form': form,
+        f'monthly_{kind}_form': monthly_form,
+        kind: lines,
+        'monthly_data': monthly_data,
+
+        f'num_{kind}_lines': stats['count'],
+        **stats_context(kind, stats),  # floatformat rounds float to 2 decimal places, zero for default values
+
+        f'num_{kind}_lines_period': period['count'],
+        f'total_{kind}_period': floatformat(period['total'], 2),
+        f'avg_{kind}_month': floatformat(period['avg'], 2),
+        f'max_{kind}_month': floatformat(period['max'], 2),
+        f'min_{kind}_month': floatformat(period['min'], 2),
+
+        f'avg_{kind}_month_total': floatformat(month_totals['avg'], 2),
+        f'max_{kind}_month_total': floatformat(month_totals['max'], 2),
+        f'min_{kind}_month_total': floatformat(month_totals['min'], 2),
+
+        'trends': monthly_trends,
+    }  # dictionary is used to render a template that displays the lines for the user
+
+    return render(request, ledger.template('user_archive_report_{kind}'), context)
+
+
+# Function that shows the top categories and sources (or sellers) of the user's lines in a given period
+@login_required  # The function is decorated - the user must be logged in to access the page
+def breakdown_report(request, ledger):
+    form = BreakdownForm(request.GET or None)  # the report is a link, so the form is sent with the GET method
+    report = {}
+    if not form.is_bound or form.is_valid():  # the whole history and the top 10 objects are shown by default
+        data = form.cleaned_data if form.is_bound else {}
+        # The totals of complete months are read from the BreakdownRollup table (see rollups.py), only the days of
+        # incomplete months at the edges of the period are grouped from the lines
+        report = breakdown(ledger.model, request.user, data.get('start_date') or date(1, 1, 1),
+                           data.get('end_date') or date.today(), data.get('top') or 10)
+    context = {
+        'form': form,
+        'ledger': ledger,
+        'breakdowns': [(BREAKDOWN_TITLES[dimension], rows) for dimension, rows in report.items()],
+    }
+    return render(request, ledger.template('user_breakdown'), context)
+
+
+class CatalogueMixin:
+    catalogue = None  # INCOME_CATEGORIES, INCOME_SOURCES, EXPENSES_CATEGORIES or SELLERS (ledgers.py)
+    template = None  # e.g. 'user_{name}_form' - 'user_income_category_form.html'
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        self.model = self.catalogue.model
+        self.owner = self.catalogue.owner
+        self.context_object_name = self.catalogue.context_object_name
+        self.template_name = f'{self.template.format(name=self.catalogue.name, plural=self.catalogue.plural)}.html'
+
+
+# Like in all other views Mixin requires user to be logged-in to access the view
+@method_decorator(cache_per_user(), name='dispatch')  # the rendered page is cached for the user, see caching.py
+class CatalogueListView(LoginRequiredMixin, CatalogueMixin, ListView):
+    template = 'user_{plural}'
+    paginate_by = 10
+
+    def get_queryset(self):  # overrides the default queryset to return only objects owned by the current user
+        return self.model.objects.filter(**{self.owner: self.request.user})
+
+
+@method_decorator(cache_per_user(), name='dispatch')  # the rendered page is cached for the user, see caching.py
+class CatalogueDetailView(LoginRequiredMixin, CatalogueMixin, DetailView):
+    template = 'user_{name}'
+
+
+class CatalogueCreateView(LoginRequiredMixin, CatalogueMixin, SuccessMessageMixin, CreateView):
+    template = 'user_{name}_form'
+
+    def get_form_class(self):
+        return self.catalogue.form
+
+    def get_success_url(self):
+        return self.catalogue.new_url
+
+    def get_success_message(self, cleaned_data):
+        return f'{self.catalogue.label} item was created successfully.'
+
+    def form_valid(self, form):  # defines a method that is called when the form is valid
+        setattr(form.instance, self.owner, self.request.user)
+        return super().form_valid(form)  # calls the parent class method which saves the form data
+
+
+# TestMixin used to restrict access, the test_func checks if the user meets criteria and can access the view
+class CatalogueUpdateView(LoginRequiredMixin, CatalogueMixin, OwnerRequiredMixin, SuccessMessageMixin, UpdateView):
+    template = 'user_{name}_form'
+
+    def get_form_class(self):  # a model form with the fields of the catalogue, e.g. ['definition']
+        return modelform_factory(self.model, fields=self.catalogue.fields)
+
+    def get_success_url(self):
+        return self.catalogue.list_url
+
+    def get_success_message(self, cleaned_data):
+        return f'{self.catalogue.label} item was updated successfully.'
+
+
+# TestMixin used to restrict access, the test_func checks if the user meets criteria and can access the view
+class CatalogueDeleteView(LoginRequiredMixin, CatalogueMixin, OwnerRequiredMixin, SuccessMessageMixin, DeleteView):
+    template = 'user_{name}_delete'
+
+    def get_success_url(self):
+        return self.catalogue.list_url
+
+    def get_success_message(self, cleaned_data):
+        return f'{self.catalogue.label} item was deleted successfully.'
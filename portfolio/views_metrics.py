@@ -0,0 +1,16 @@
+from datetime import timedelta
+from django.shortcuts import render
+from django.utils import timezone
+from django.contrib.admin.views.decorators import staff_member_required
+from .metrics import report
+
+
+# A view function that shows the percentiles of the recorded request metrics per URL name, more about it in metrics.py
+@staff_member_required  # The function is decorated - only staff members can see the measurements of all users
+def request_metrics(request):
+    try:
+        days = max(int(request.GET.get('days', 7)), 1)
+    except ValueError:
+        days = 7
+    return render(request, 'request_metrics.html', {
+        'report': report(since=timezone.now() - timedelta(days=days)), 'days': days})